@@ -9,13 +9,26 @@
 ######################################################
 
 import bisect
+import math
+import numpy as np
 
 from mcp.server.fastmcp import FastMCP
 from typing import Any, Dict, List, Optional, Tuple, Union, Iterable
-from vcdvcd import VCDVCD
+from vcd_activity import bucket_activity, heat_bar
+from vcd_analysis import Operand, edge_counts, edge_times, event_arrays, find_when, match_edges, nearest_events, parse_expression, rank_activity, sample_ids, sample_operand, stable_runs, trace_levels, transition_stats
+from vcd_clocks import clock_index
+from vcd_diff import diff_waveforms
+from vcd_hierarchy import load_scope_tree
+from vcd_protocols import DECODERS, TransactionLog, decode_transactions, decoder_class
+from vcd_summary import MAX_CHARS, listing_chars, summarize, window_arrays
+from vcd_sva import check_property, parse_property
+from rtl_typedefs import RTL_DIR, ValueMap, decode_value, load_typedef_index
+from vcd_store import CACHE, NO_VALUE, SignalTrace, Waveform, build_index, load_header, load_waveform, sidecar_is_fresh, sidecar_path, time_to_ticks
 from decimal import Decimal
+from fractions import Fraction
 import re
 import os
+import time
 
 ######################################################
 # This is a MCP server code for the toolsbox needed for parsing the vcd file and log file
@@ -182,31 +195,115 @@ def get_source_snippet(file_path: str, line_number: int, context: int = 5) -> st
 ###### 1.vcd time parsing helpers ----
 ######################################################################
 
-_UNIT_TO_SEC = {
-    "s": 1.0, "ms": 1e-3, "us": 1e-6, "ns": 1e-9, "ps": 1e-12, "fs": 1e-15,
-}
-
-def _to_seconds(t: Union[str, float, int]) -> float:
-    if isinstance(t, (int, float)): return float(t)
-    s = str(t).strip()
-    m = re.match(r"^\s*([0-9]+(\.[0-9]+)?)\s*([a-zA-Z]+)\s*$", s)
-    if m:
-        val = float(m.group(1))
-        unit = m.group(3).lower()
-        if unit not in _UNIT_TO_SEC:
-            raise ValueError(f"Unknown time unit '{unit}' in '{t}'")
-        return val * _UNIT_TO_SEC[unit]
-    return float(s)  # assume seconds
-
-def _in_window(tv: List[Tuple[int, str]], start_s: Optional[float], end_s: Optional[float]) -> List[Tuple[float, str]]:
-    """Filter tv changes between start and end (given in seconds). `vcdvcd` stores times in raw units;
-       we don't know the timescale multiplier here, so treat times as seconds already.
-       If your simulator uses integer timesteps as raw units (e.g. ns), pass values consistently.
-    """
-    # vcdvcd gives times as int (raw) — we will treat them as seconds unless you rescale externally.
-    s = -float("inf") if start_s is None else start_s
-    e = float("inf") if end_s is None else end_s
-    return [(float(t), v) for (t, v) in tv if s <= float(t) <= e]
+# All trace times are integer ticks of the dump's timescale.
+# User times are either ticks (200, "200") or absolute times ("12.5ns", "3us")
+# and are converted exactly with the dump's timescale, never through float seconds.
+# They can also be clock-cycle coordinates: "clk@12" is rising edge 12 (0-based) of clk,
+# "clk@12+1.5ns" / "clk@12-300" a time relative to it (see vcd_clocks.py).
+_CYCLE = re.compile(r"^\s*([^@\s]+)@(\d+)\s*(?:([+-])\s*(\S.*?))?\s*$")
+
+def _time(wf: Waveform, t: Union[str, float, int]) -> Fraction:
+    """User time or clock-cycle coordinate -> exact ticks."""
+    m = _CYCLE.match(t) if isinstance(t, str) else None
+    if m is None:
+        return time_to_ticks(t, wf.header)
+    clock, bit = _resolve_signal(wf, m.group(1))
+    if bit is not None:
+        raise ValueError(f"'{m.group(1)}' is a bit of a bus, a clock must be a 1-bit signal")
+    base = Fraction(clock_index(wf).cycle_time(clock, int(m.group(2))))
+    if m.group(3) is None:
+        return base
+    offset = time_to_ticks(m.group(4), wf.header)
+    return base + offset if m.group(3) == "+" else base - offset
+
+def _ticks(wf: Waveform, t: Union[str, float, int], round_up: bool = False) -> int:
+    """User time -> integer ticks; a time that falls between two ticks is rounded down (or up)."""
+    exact = _time(wf, t)
+    return math.ceil(exact) if round_up else math.floor(exact)
+
+def _user_ticks(wf: Waveform, *times: Tuple[Optional[Union[str, float, int]], Optional[bool]]) -> Union[str, List[Any]]:
+    """
+    Time arguments of a tool, each given as (time, round_up), -> ticks: rounded up / down to an integer,
+    or the exact Fraction for round_up None; a None time stays None. A bad time or unit, or a clk@N
+    on an unknown clock, a bus or past the last edge gives the "error : ..." string to return instead.
+    """
+    try:
+        return [None if t is None else _time(wf, t) if up is None else _ticks(wf, t, up) for t, up in times]
+    except (KeyError, ValueError) as e:
+        return f"error : {e.args[0] if e.args else e}"
+
+def _cycle_clock(wf: Waveform, *times: Any) -> Optional[Tuple[str, str]]:
+    """(clock name, clock as written) of the first user time given as a clock-cycle coordinate."""
+    for t in times:
+        m = _CYCLE.match(t) if isinstance(t, str) else None
+        if m is not None:
+            return _resolve_signal(wf, m.group(1))[0], m.group(1)
+    return None
+
+def _cycles(wf: Waveform, clock: Optional[Tuple[str, str]], times: Iterable[int]) -> List[str]:
+    """Ticks -> 'clk@12+300' coordinates on the clock the user times were given in."""
+    return clock_index(wf).format(clock[0], list(times), clock[1])
+
+def _window_bounds(trace: SignalTrace, start_t: Optional[int], end_t: Optional[int]) -> Tuple[int, int]:
+    """Index range [lo, hi) of the trace changes between start and end ticks (inclusive).
+       The trace times are sorted, so this is two bisects instead of a scan.
+    """
+    lo = 0 if start_t is None else bisect.bisect_left(trace.times, start_t)
+    hi = len(trace) if end_t is None else bisect.bisect_right(trace.times, end_t)
+    return lo, max(lo, hi)
+
+def _in_window(trace: SignalTrace, start_t: Optional[int], end_t: Optional[int]) -> List[Tuple[int, str]]:
+    """Filter trace changes between start and end ticks."""
+    lo, hi = _window_bounds(trace, start_t, end_t)
+    return [(trace.times[i], trace.value(i)) for i in range(lo, hi)]
+
+def _window_trace(wf: Waveform, signal_name: str, start_t: Optional[int], end_t: Optional[int]) -> SignalTrace:
+    """Trace of one signal limited to [start, end] ticks (plus the value in effect at start).
+       Large text dumps only parse that part of the file. Raises KeyError for an unknown signal.
+    """
+    if signal_name not in wf:
+        raise KeyError(signal_name)
+    return wf.window([signal_name], start_t, end_t)[signal_name]
+
+def _value_at(trace: SignalTrace, t: Fraction, method: str = "previous") -> Optional[str]:
+    """Value of a trace at exact tick time t: last change at or before t, or only a change exactly at t."""
+    if method == "exact":
+        if t.denominator != 1:
+            return None
+        i = bisect.bisect_left(trace.times, t.numerator)
+        if i < len(trace) and trace.times[i] == t.numerator:
+            return trace.value(i)
+        return None
+    idx = bisect.bisect_right(trace.times, math.floor(t)) - 1
+    return trace.value(idx) if idx >= 0 else None
+
+def _count_edges(trace: SignalTrace, start_t: Optional[int], end_t: Optional[int], edge: str, bit_index: Optional[int] = None) -> int:
+    """Count the rising/falling/any 0<->1 edges between the trace changes inside [start, end], x/z breaks an edge."""
+    lo, hi = _window_bounds(trace, start_t, end_t)
+    rising, falling = edge_counts(trace_levels(trace, bit_index, lo, hi))
+    return {"rising": rising, "falling": falling, "any": rising + falling}.get(edge, 0)
+
+def _summary(wf: Waveform, traces: Dict[str, SignalTrace], start_t: Optional[int], end_t: Optional[int],
+             max_chars: Optional[int], maps: Dict[str, ValueMap], lead: bool = True) -> Optional[str]:
+    """Summary of the window changes of the traces within max_chars (default FAULTTRACE_VCD_MAX_CHARS),
+       or None when listing them all is short enough. Only the window slices of the traces are read.
+    """
+    limit = MAX_CHARS if max_chars is None else max_chars
+    if limit <= 0 or not traces:
+        return None
+    last = wf.end_time if end_t is None else end_t
+    counts = {sig: _window_bounds(tr, start_t, end_t) for sig, tr in traces.items()}
+    widths = sum(len(tr.value(lo)) if hi > lo else 1 for tr, (lo, hi) in zip(traces.values(), counts.values()))
+    if listing_chars(sum(hi - lo for lo, hi in counts.values()) + 1, last, widths) <= limit:
+        return None
+    room = max(limit // len(traces), 200)
+    temp = ""
+    for sig, tr in traces.items():
+        times, ids = window_arrays(tr, start_t, end_t, lead=lead)
+        vm = maps.get(sig)
+        lines = summarize(times, ids, tr.strings, last, room, (lambda v, vm=vm: decode_value(v, vm)) if vm else None)
+        temp = temp + f"{sig}:\t{len(times)} changes\n" + "".join(x + "\n" for x in lines)
+    return temp
 
 def _bit(value: str, size_hint: Optional[int], bit_index: Optional[int]) -> Optional[int]:
     """Return scalar bit 0/1 from a scalar ('0','1','x','z') or binary string for vectors."""
@@ -222,6 +319,46 @@ def _bit(value: str, size_hint: Optional[int], bit_index: Optional[int]) -> Opti
     if ch in ("0", "1"): return int(ch)
     return None
 
+######################################################################
+###### vcd parsed-waveform cache diagnostics
+######################################################################
+@mcp.tool()
+def vcd_cache_stats() -> str:
+    """
+    Return the hit/miss/eviction counters of the shared parsed-VCD cache
+    and the dumps currently resident in it.
+    """
+    st = CACHE.stats()
+    temp = (f"VCD cache : {st['entries']} entries, {st['resident_bytes'] / 2**20:.1f}MB resident "
+            f"of {st['budget_bytes'] / 2**20:.0f}MB budget\n"
+            f"hits={st['hits']} misses={st['misses']} evictions={st['evictions']} oversize={st['oversize']}\n")
+    for key in st["keys"]:
+        # an rtl tree is keyed by its source file count, everything else by its byte size
+        temp = temp + f"  {key[3]}\t{key[0]} ({'files' if key[3] == 'rtl' else 'size'}={key[1]})\n"
+    return temp
+
+######################################################################
+###### vcd build the on-disk waveform index (.ftidx sidecar)
+######################################################################
+@mcp.tool()
+def vcd_build_index(path: str, force: bool = False) -> str:
+    """
+    Build the .ftidx sidecar index of a vcd file (one full parse, done once).
+    All the vcd_* tools memory-map the sidecar instead of parsing the vcd while it is fresh.
+    A compressed dump (.vcd.gz, .vcd.bz2, .vcd.zst) is decompressed on the fly, with no copy on disk.
+    """
+    if not os.path.exists(path):
+        return "error : vcd File does not exist"
+    if sidecar_is_fresh(path) and not force:
+        return f"Index {sidecar_path(path)} is already up to date"
+    try:
+        t_start = time.perf_counter()
+        side = build_index(path)
+        elapsed = time.perf_counter() - t_start
+    except OSError as e:
+        return f"error : could not write the index for {path} : {e}"
+    return f"Index written to {side} ({os.path.getsize(side)} bytes) in {elapsed:.2f}s"
+
 ######################################################################
 ###### vcd get simulation time
 ######################################################################
@@ -233,20 +370,13 @@ def vcd_get_simulation_time(path: str, store_scopes: bool = False) -> str:
     Accepts a VCD file path.
     """
     if os.path.exists(path):
-        vcd = VCDVCD(path, store_tvs=True, store_scopes=store_scopes)
-        ts = vcd.timescale
-        magnitude = ts['magnitude']
-        unit = ts['unit']
-        #magnitude, unit = vcd_get_timescale(path)
+        wf = load_waveform(path)
     else:
         return 0
-    # Parse or reuse object // old function used to read the vcd file
-    # vcd = VCDVCD(vcd_input, store_tvs=True) if isinstance(vcd_input, str) else vcd_input
 
     # Timescale -> seconds per unit as Decimal
-    ts = vcd.timescale
-    magnitude = Decimal(ts["magnitude"])
-    unit = ts["unit"].lower()
+    magnitude = Decimal(wf.header.magnitude)
+    unit = wf.header.unit.lower()
     unit_to_sec = {
         "s":  Decimal("1"),
         "ms": Decimal("1e-3"),
@@ -260,14 +390,13 @@ def vcd_get_simulation_time(path: str, store_scopes: bool = False) -> str:
     seconds_per_unit = magnitude * unit_to_sec[unit]
 
     # Find the largest timestamp across all signals
-    # vcd.signals is a list of full signal names; vcd[ref].tv -> [(time_raw, value), ...]
+    # wf[ref].times is sorted, so the last change time is its last element (raw units, int)
     max_time_raw = Decimal(0)
-    for ref in getattr(vcd, "signals", []):
-        sig = vcd[ref]
-        tv = getattr(sig, "tv", [])
-        if tv:
-            # last change time (raw units, typically int)
-            last_t = Decimal(tv[-1][0])
+    wf.prefetch(wf.signals)
+    for ref in wf.signals:
+        times = wf[ref].times
+        if len(times):
+            last_t = Decimal(times[-1])
             if last_t > max_time_raw:
                 max_time_raw = last_t
 
@@ -284,10 +413,9 @@ def vcd_get_simulation_time(path: str, store_scopes: bool = False) -> str:
 def vcd_get_timescale_scal(path: str, store_scopes: bool = False) -> str:
     """ Get the magnitude and the unit of the timescale of a vcd file and output as two string format """
     if os.path.exists(path):
-        vcdobj = VCDVCD(path, store_tvs=True, store_scopes=store_scopes)
-        ts = vcdobj.timescale  # {'magnitude': 1, 'unit': 'ns'}
+        hdr = load_header(path)  # header only, value changes are never read
         #return ts['magnitude'], ts['unit']
-        return f"Simulation timescale is {ts['magnitude']}{ts['unit']}"
+        return f"Simulation timescale is {hdr.timescale_str}"
     else:
         return "VCD File does not exist"
 
@@ -295,9 +423,8 @@ def vcd_get_timescale_scal(path: str, store_scopes: bool = False) -> str:
 def vcd_get_timescale_str(path: str, store_scopes: bool = False) -> str:
     """ Get the magnitude and the unit of the timescale of a vcd file and output as two string format """
     if os.path.exists(path):
-        vcdobj = VCDVCD(path, store_tvs=True, store_scopes=store_scopes)
-        ts = vcdobj.timescale  # {'magnitude': 1, 'unit': 'ns'}
-        return f"Simulation timescale is {ts['magnitude']}{ts['unit']}"
+        hdr = load_header(path)  # header only, value changes are never read
+        return f"Simulation timescale is {hdr.timescale_str}"
     else:
         return "VCD File does not exist"
 
@@ -309,11 +436,10 @@ def list_vcd_signals(path: str, pattern: str = "", store_scopes: bool = False) -
     """Returns a list of all signals in the VCD matching a pattern (e.g., 'dut')."""
     try:
         if os.path.exists(path):
-            vcdobj = VCDVCD(path, store_tvs=True, store_scopes=store_scopes)
+            hdr = load_header(path)
         else :
             return "error : vcd File does not exist"
-        # Assuming vcdvcd, we can list the keys (signals)
-        signals = [s for s in vcdobj.signals if pattern in s]
+        signals = [s for s in hdr.signals if pattern in s]
         #return "\n".join(signals[:20]) # Limit to 20 so we don't blow the token limit
         temp = f"Simulation Signal list are \n"
         temp = temp + "\n".join(signals[:20])
@@ -330,26 +456,22 @@ def list_vcd_signals(path: str, pattern: str = "", store_scopes: bool = False) -
 def vcd_get_signal_value_at_timestamp(path: str, signal_name: str, timestamp: Union[str, float, int], method: str = "previous") -> str:
     """
     Return the value of a signal at a specific timestamp.
-    the input is the signal name and the timestamp
+    the input is the signal name and the timestamp, in vcd ticks (200) or with a unit ("12.5ns")
     """
     if os.path.exists(path):
-        vcdobj = VCDVCD(path, store_tvs=True, store_scopes=False)
+        wf = load_waveform(path)
     else:
         return "error : vcd File does not exist"
-    tv = vcdobj[signal_name].tv  # list of (time, value) tuples. [2](https://github.com/cirosantilli/vcdvcd)
-    if not tv: return None
-    t_sec = _to_seconds(timestamp)
-    times = [float(t) for (t, _) in tv]
-    idx = bisect.bisect_right(times, t_sec) - 1
-    if method == "exact":
-        i = bisect.bisect_left(times, t_sec)
-        if 0 <= i < len(times) and times[i] == t_sec:
-            return tv[i][1]
-        return None
-    if idx < 0:
-        return None
-    #return tv[idx][1]
-    return f"Signal {signal_name} value at timestamp {timestamp} is {tv[idx][1]}"
+    ticks = _user_ticks(wf, (timestamp, None))
+    if isinstance(ticks, str):
+        return ticks
+    (t_exact,) = ticks
+    trace = _window_trace(wf, signal_name, math.floor(t_exact), math.floor(t_exact))  # sorted times + values
+    if not len(trace): return None
+    val = _value_at(trace, t_exact, method)
+    if method == "exact" or val is None:
+        return val
+    return f"Signal {signal_name} value at timestamp {timestamp} is {val}"
 
 ### this version of the function return a scalar to be used by another local function so no need for a string return type
 @mcp.tool()
@@ -359,48 +481,57 @@ def vcd_get_signal_value_at_timestamp_scal(path: str, signal_name: str, timestam
         the input is the signal name and the timestamp
         """
     if os.path.exists(path):
-        vcdobj = VCDVCD(path, store_tvs=True, store_scopes=False)
+        wf = load_waveform(path)
     else:
         return 0, 0
-    tv = vcdobj[signal_name].tv  # list of (time, value) tuples. [2](https://github.com/cirosantilli/vcdvcd)
-    if not tv: return None
-    t_sec = _to_seconds(timestamp)
-    times = [float(t) for (t, _) in tv]
-    idx = bisect.bisect_right(times, t_sec) - 1
-    if method == "exact":
-        i = bisect.bisect_left(times, t_sec)
-        if 0 <= i < len(times) and times[i] == t_sec:
-            return tv[i][1]
-        return None
-    if idx < 0:
-        return None
-    return tv[idx][1]
+    ticks = _user_ticks(wf, (timestamp, None))
+    if isinstance(ticks, str):
+        return ticks
+    (t_exact,) = ticks
+    trace = _window_trace(wf, signal_name, math.floor(t_exact), math.floor(t_exact))
+    if not len(trace): return None
+    return _value_at(trace, t_exact, method)
 
 ######################################################################
 ###### vcd get signal value at a specific time frame
 ######################################################################
 @mcp.tool()
-def vcd_get_signal_values_in_timeframe(path: str, signal_name: str, start: Optional[Union[str, float, int]], end: Optional[Union[str, float, int]], include_start_prev: bool = True) -> str:
+def vcd_get_signal_values_in_timeframe(path: str, signal_name: str, start: Optional[Union[str, float, int]], end: Optional[Union[str, float, int]], include_start_prev: bool = True, rtl_path: Optional[str] = None, max_chars: Optional[int] = None) -> str:
     """
     Return the values of a signal at a specific time window.
     the input is the signal name and the time window high and low limit
+    values named in the RTL (enum / localparam / `define, see rtl_list_enums) are shown as LABEL(bits)
+    when the list would be longer than max_chars, a summary of about max_chars is returned instead:
+    periodic and regular activity as one line each, irregular changes kept around anomalies (glitches, x/z)
     """
     if os.path.exists(path):
-        vcdobj = VCDVCD(path, store_tvs=True, store_scopes=False)
+        wf = load_waveform(path)
     else:
         return "error : vcd File does not exist"
-    tv = vcdobj[signal_name].tv
-    s = None if start is None else _to_seconds(start)
-    e = None if end is None else _to_seconds(end)
-    window = _in_window(tv, s, e)
+    maps = _value_maps(path, rtl_path, [signal_name])
+    if maps is None:
+        return "error : rtl path does not exist"
+    ticks = _user_ticks(wf, (start, True), (end, False))
+    if isinstance(ticks, str):
+        return ticks
+    s, e = ticks
+    trace = _window_trace(wf, signal_name, s, e)
+    summary = _summary(wf, {signal_name: trace}, s, e, max_chars, maps, lead=include_start_prev)
+    if summary is not None:
+        return f"Signal {signal_name} values in the timewindow {start}-{end}, summarized :\n{summary}"
+    window = _in_window(trace, s, e)
     out = []
     if include_start_prev and start is not None:
-        prev = vcd_get_signal_value_at_timestamp_scal(path, signal_name, s, method="previous")
+        prev = _value_at(trace, Fraction(s), method="previous")
         if prev is not None:
             out.append((s, prev))
     out.extend(window)
+    if signal_name in maps:
+        out = list(zip([t for t, _ in out], _decode_all([v for _, v in out], maps[signal_name])))
+    clock = _cycle_clock(wf, start, end)
+    at = f"\nIn {clock[1]} cycles the change times are : {_cycles(wf, clock, [t for t, _ in out])}" if clock else ""
     #return out
-    return f"Signal {signal_name} values in the timewindow {start}-{end} are : {out}"
+    return f"Signal {signal_name} values in the timewindow {start}-{end} are : {out}{at}"
 
 ### this version of the function return a scalar to be used by another local function so no need for a string return type
 ### this is not a tool
@@ -410,16 +541,18 @@ def vcd_get_signal_values_in_timeframe_scal(path: str, signal_name: str, start:
     the input is the signal name and the time window high and low limit
     """
     if os.path.exists(path):
-        vcdobj = VCDVCD(path, store_tvs=True, store_scopes=False)
+        wf = load_waveform(path)
     else:
         return "error : vcd File does not exist"
-    tv = vcdobj[signal_name].tv
-    s = None if start is None else _to_seconds(start)
-    e = None if end is None else _to_seconds(end)
-    window = _in_window(tv, s, e)
+    ticks = _user_ticks(wf, (start, True), (end, False))
+    if isinstance(ticks, str):
+        return ticks
+    s, e = ticks
+    trace = _window_trace(wf, signal_name, s, e)
+    window = _in_window(trace, s, e)
     out = []
     if include_start_prev and start is not None:
-        prev = vcd_get_signal_value_at_timestamp_scal(path, signal_name, s, method="previous")
+        prev = _value_at(trace, Fraction(s), method="previous")
         if prev is not None:
             out.append((s, prev))
     out.extend(window)
@@ -433,32 +566,30 @@ def vcd_get_signal_values_in_timeframe_scal(path: str, signal_name: str, start:
 @mcp.tool()
 def vcd_count_signal_all_transitions(path: str, signal_name: str, edge: str, start: Optional[Union[str, float, int]], end: Optional[Union[str, float, int]], bit_index: Optional[int] = None) -> str:
     """
-    Return the count of the number of a signal edges in a time window
+    Return the count of the number of a signal edges in a time window ('rising', 'falling' or 'any')
     the input is the signal name, the edge, the start and finsh time limit of the time window and a bit index if it is a bus
+    also return the toggle rate, the duty cycle and the time spent at X/Z in the window
     """
     if os.path.exists(path):
-        vcdobj = VCDVCD(path, store_tvs=True, store_scopes=False)
+        wf = load_waveform(path)
     else:
         return 0
-    tv = vcdobj[signal_name].tv
-    s = None if start is None else _to_seconds(start)
-    e = None if end is None else _to_seconds(end)
-    window = _in_window(tv, s, e)
-    if not window: return 0
-    last = _bit(window[0][1], None, bit_index)
-    cnt = 0
-    for _, v in window[1:]:
-        cur = _bit(v, None, bit_index)
-        if last is None or cur is None:
-            last = cur
-            continue
-        if edge == "rising" and last == 0 and cur == 1:
-            cnt += 1
-        elif edge == "falling" and last == 1 and cur == 0:
-            cnt += 1
-        last = cur
+    ticks = _user_ticks(wf, (start, True), (end, False))
+    if isinstance(ticks, str):
+        return ticks
+    s, e = ticks
+    trace = _window_trace(wf, signal_name, s, e)
+    lo, hi = _window_bounds(trace, s, e)
+    if hi == lo: return 0
+    st = transition_stats(trace, 0 if s is None else s, trace.times[hi - 1] if e is None else e, bit_index)
+    cnt = {"rising": st["rising"], "falling": st["falling"], "any": st["toggles"]}.get(edge, 0)
+    seconds = st["span"] * wf.header.tick_seconds
+    rate = float(st["toggles"] / seconds) if seconds else 0.0
     #return cnt
-    return f"the count for the {edge} edges of the Signal {signal_name} in the timewindow {start}-{end} is {cnt}"
+    return (f"the count for the {edge} edges of the Signal {signal_name} in the timewindow {start}-{end} is {cnt}\n"
+            f"rising {st['rising']}, falling {st['falling']}, toggle rate {rate:.6g} toggles/s, "
+            f"duty cycle {st['duty']:.2%} (high {st['high']} / low {st['low']} ticks), "
+            f"X/Z time {st['xz']} ticks ({st['xz_frac']:.2%} of the window)")
 
 ######################################################################
 ###### vcd Get the first edge after a timestamp
@@ -471,19 +602,22 @@ def vcd_next_change_after(path: str, signal_name: str, timestamp: Union[str, flo
     the input is the signal name and the timestamp
     """
     if os.path.exists(path):
-        vcdobj = VCDVCD(path, store_tvs=True, store_scopes=False)
+        wf = load_waveform(path)
     else:
         return f"Could not open the VCD file"
-    tv = vcdobj[signal_name].tv
-    if not tv: return f"No Value change found after timestamp {signal_name} for the signal {timestamp}"
-    t_sec = _to_seconds(timestamp)
-    times = [float(t) for (t, _) in tv]
-    idx = bisect.bisect_right(times, t_sec)
-    if idx < len(tv):
-        t, v = tv[idx]
+    trace = wf[signal_name]
+    if not len(trace): return f"No Value change found after timestamp {signal_name} for the signal {timestamp}"
+    ticks = _user_ticks(wf, (timestamp, False))
+    if isinstance(ticks, str):
+        return ticks
+    idx = bisect.bisect_right(trace.times, ticks[0])
+    if idx < len(trace):
+        t, v = trace.times[idx], trace.value(idx)
         #return (float(t), v)
         #return (float(t), v)
-        return f"The next Value change of the signal {signal_name} after the timestamp {timestamp} is [time, value] = {(float(t), v)}"
+        clock = _cycle_clock(wf, timestamp)
+        at = f" ({_cycles(wf, clock, [t])[0]})" if clock else ""
+        return f"The next Value change of the signal {signal_name} after the timestamp {timestamp} is [time, value] = {(t, v)}{at}"
     return f"No Value change found after timestamp {signal_name} for the signal {timestamp}"
 
 ######################################################################
@@ -497,18 +631,21 @@ def vcd_prev_change_before(path: str, signal_name: str, timestamp: Union[str, fl
     the input is the signal name and the timestamp
     """
     if os.path.exists(path):
-        vcdobj = VCDVCD(path, store_tvs=True, store_scopes=False)
+        wf = load_waveform(path)
     else:
         return f"Could not open the VCD file"
-    tv = vcdobj[signal_name].tv
-    if not tv: return f"No Value change found before timestamp {signal_name} for the signal {timestamp}"
-    t_sec = _to_seconds(timestamp)
-    times = [float(t) for (t, _) in tv]
-    idx = bisect.bisect_left(times, t_sec) - 1
+    trace = wf[signal_name]
+    if not len(trace): return f"No Value change found before timestamp {signal_name} for the signal {timestamp}"
+    ticks = _user_ticks(wf, (timestamp, True))
+    if isinstance(ticks, str):
+        return ticks
+    idx = bisect.bisect_left(trace.times, ticks[0]) - 1
     if idx >= 0:
-        t, v = tv[idx]
+        t, v = trace.times[idx], trace.value(idx)
         #return (float(t), v)
-        return f"The next Value change of the signal {signal_name} before the timestamp {timestamp} is [time, value] = {(float(t), v)}"
+        clock = _cycle_clock(wf, timestamp)
+        at = f" ({_cycles(wf, clock, [t])[0]})" if clock else ""
+        return f"The next Value change of the signal {signal_name} before the timestamp {timestamp} is [time, value] = {(t, v)}{at}"
     return f"No Value change found before timestamp {signal_name} for the signal {timestamp}"
 
 ######################################################################
@@ -521,9 +658,7 @@ def vcd_search_value(path: str, signal_name: str, value: Any, start: Optional[Un
     Return if a signal has encountered a specific value during the simulation
     the input is the signal name and the value to be searched
     """
-    if os.path.exists(path):
-        vcdobj = VCDVCD(path, store_tvs=True, store_scopes=False)
-    else:
+    if not os.path.exists(path):
         return f"Could not open the VCD file"
     changes = vcd_get_signal_values_in_timeframe_scal(path, signal_name, start, end, include_start_prev=False)
     target = value.lower() if isinstance(value, str) else value
@@ -537,39 +672,43 @@ def vcd_search_value(path: str, signal_name: str, value: Any, start: Optional[Un
 ###### vcd get a list of signals values at a specific timestamp
 ######################################################################
 @mcp.tool()
-def vcd_get_signals_values_at_timestamp(path: str, signal_names: Iterable[str], timestamp: Union[str, float, int], method: str = "previous") -> str:
+def vcd_get_signals_values_at_timestamp(path: str, signal_names: Iterable[str], timestamp: Union[str, float, int], method: str = "previous", rtl_path: Optional[str] = None) -> str:
     """
     Return a dict {signal_name: value_at_timestamp} for multiple signals.
     - method='previous': last value at or before timestamp (step/hold semantics)
     - method='exact': only return a value if there is an event exactly at timestamp; else None
+    values named in the RTL (enum / localparam / `define, see rtl_list_enums) are shown as LABEL(bits)
     """
     if not os.path.exists(path):
         raise FileNotFoundError(path)
 
-    vcd = VCDVCD(path, store_tvs=True, store_scopes=False)
-    t_sec = _to_seconds(timestamp)
+    wf = load_waveform(path)
+    ticks = _user_ticks(wf, (timestamp, None))
+    if isinstance(ticks, str):
+        return ticks
+    (t_exact,) = ticks
+    maps = _value_maps(path, rtl_path, signal_names)
+    if maps is None:
+        return "error : rtl path does not exist"
 
     out: Dict[str, Any] = {}
 
-    for sig in signal_names:
-        if sig not in vcd.signals:
-            out[sig] = None
-            continue
+    if method != "exact":
+        # step/hold: served from the sidecar checkpoints when there is one
+        values = wf.values_at(signal_names, math.floor(t_exact))
+        for sig in signal_names:
+            out[sig] = values.get(sig)
+        _decode_dict(out, maps)
+        return f"The Values of the Signals list {signal_names} at timestamp {timestamp} are : {out}"
 
-        tv: List[Tuple[Union[int, float], Any]] = vcd[sig].tv  # [(time, value)]
-        if not tv:
+    # one pass (or one windowed read) over the dump for all the requested signals
+    traces = wf.window(signal_names, math.floor(t_exact), math.floor(t_exact))
+    for sig in signal_names:
+        if sig not in traces:
             out[sig] = None
             continue
-
-        times = [float(t) for (t, _) in tv]
-
-        if method == "exact":
-            i = bisect.bisect_left(times, t_sec)
-            out[sig] = tv[i][1] if 0 <= i < len(times) and times[i] == t_sec else None
-            continue
-
-        idx = bisect.bisect_right(times, t_sec) - 1
-        out[sig] = tv[idx][1] if idx >= 0 else None
+        out[sig] = _value_at(traces[sig], t_exact, method)
+    _decode_dict(out, maps)
     #return out
     return f"The Values of the Signals list {signal_names} at timestamp {timestamp} are : {out}"
 
@@ -577,45 +716,51 @@ def vcd_get_signals_values_at_timestamp(path: str, signal_names: Iterable[str],
 ###### vcd get a list of signals values at a specific time frame
 ######################################################################
 @mcp.tool()
-def vcd_get_signals_aligned_in_window(path: str, signal_names: Iterable[str], start: Union[str, float, int], end: Union[str, float, int]) -> str:
+def vcd_get_signals_aligned_in_window(path: str, signal_names: Iterable[str], start: Union[str, float, int], end: Union[str, float, int], rtl_path: Optional[str] = None, max_chars: Optional[int] = None) -> str:
     """
     Returns (times, values_by_signal):
     - times: sorted list including 'start' and all change times of the requested signals
              that fall within (start, end].
     - values_by_signal: {signal_name: [v0, v1, ...]} aligned to 'times'
       using step/hold semantics (previous value up to next change).
+    values named in the RTL (enum / localparam / `define, see rtl_list_enums) are shown as LABEL(bits)
+    when the table would be longer than max_chars, a summary of each signal sharing max_chars is returned instead
     """
     if not os.path.exists(path):
         raise FileNotFoundError(path)
-    vcd = VCDVCD(path, store_tvs=True, store_scopes=False)
-
-    t0 = _to_seconds(start)
-    t1 = _to_seconds(end)
+    wf = load_waveform(path)
+    maps = _value_maps(path, rtl_path, signal_names)
+    if maps is None:
+        return "error : rtl path does not exist"
+
+    ticks = _user_ticks(wf, (start, True), (end, False))
+    if isinstance(ticks, str):
+        return ticks
+    t0, t1 = ticks
     if t1 < t0:
         raise ValueError("end must be >= start")
+    # one pass (or one windowed read) over the dump for all the requested signals
+    traces = wf.window(signal_names, t0, t1)
+    summary = _summary(wf, {sig: traces[sig] for sig in signal_names if sig in traces}, t0, t1, max_chars, maps)
+    if summary is not None:
+        return f"Signals in the timewindow {start}-{end}, each summarized :\n{summary}"
 
     # Collect change times for the window
     change_times: set = {t0}
 
-    per_sig_tv: Dict[str, List[Tuple[float, Any]]] = {}
-    per_sig_times: Dict[str, List[float]] = {}
+    per_sig_trace: Dict[str, SignalTrace] = {}
 
     for sig in signal_names:
-        if sig not in vcd.signals or not vcd[sig].tv:
-            per_sig_tv[sig] = []
-            per_sig_times[sig] = []
+        trace = traces.get(sig)
+        if trace is None or not len(trace):
             continue
 
-        tv = [(float(t), v) for (t, v) in vcd[sig].tv]
-        per_sig_tv[sig] = tv
-        times = [t for (t, _) in tv]
-        per_sig_times[sig] = times
+        per_sig_trace[sig] = trace
 
         # add events strictly after start and up to end
-        i = bisect.bisect_right(times, t0)
-        while i < len(tv) and tv[i][0] <= t1:
-            change_times.add(tv[i][0])
-            i += 1
+        i = bisect.bisect_right(trace.times, t0)
+        hi = bisect.bisect_right(trace.times, t1)
+        change_times.update(trace.times[i:hi])
 
     # Build sorted timeline
     timeline = sorted(change_times)
@@ -624,40 +769,181 @@ def vcd_get_signals_aligned_in_window(path: str, signal_names: Iterable[str], st
     values_by_signal: Dict[str, List[Any]] = {}
 
     for sig in signal_names:
-        tv = per_sig_tv.get(sig, [])
-        if not tv:
+        trace = per_sig_trace.get(sig)
+        if trace is None:
             values_by_signal[sig] = [None] * len(timeline)
             continue
 
-        times = per_sig_times[sig]
+        times = trace.times
 
         # Start from last index at/before t0
         idx = bisect.bisect_right(times, t0) - 1
-        current_val = tv[idx][1] if idx >= 0 else None
+        current_val = trace.value(idx) if idx >= 0 else None
 
         vals: List[Any] = []
         j = max(idx + 1, 0)
         for t in timeline:
             # advance j to consume changes at or before t
-            while j < len(tv) and tv[j][0] <= t:
-                current_val = tv[j][1]
+            while j < len(times) and times[j] <= t:
+                current_val = trace.value(j)
                 j += 1
             vals.append(current_val)
 
-        values_by_signal[sig] = vals
+        values_by_signal[sig] = _decode_all(vals, maps[sig]) if sig in maps else vals
 
     #return timeline, values_by_signal
     temp = f"Times:\t{timeline}\n"
+    clock = _cycle_clock(wf, start, end)
+    if clock:
+        temp = temp + f"Cycles:\t{_cycles(wf, clock, timeline)}\n"
     for s, vals in values_by_signal.items():
         temp = temp + f"{s}:\t{vals}\n"
     return temp
 
+######################################################################
+###### vcd batch of heterogeneous queries in a single call
+######################################################################
+_BATCH_OPS = ("value_at", "next_change", "prev_change", "count_edges", "window")
+
+def _batch_answer(wf: Waveform, trace: SignalTrace, q: Dict[str, Any], max_changes: int) -> Any:
+    """Answer one batch query against the full trace of its signal."""
+    op = q["op"]
+    if op == "value_at":
+        return _value_at(trace, _time(wf, q["time"]), q.get("method", "previous"))
+    if op == "next_change":
+        idx = bisect.bisect_right(trace.times, _ticks(wf, q["time"]))
+        return (trace.times[idx], trace.value(idx)) if idx < len(trace) else None
+    if op == "prev_change":
+        idx = bisect.bisect_left(trace.times, _ticks(wf, q["time"], round_up=True)) - 1
+        return (trace.times[idx], trace.value(idx)) if idx >= 0 else None
+    s = None if q.get("start") is None else _ticks(wf, q["start"], round_up=True)
+    e = None if q.get("end") is None else _ticks(wf, q["end"])
+    if op == "count_edges":
+        return _count_edges(trace, s, e, q.get("edge", "rising"), q.get("bit_index"))
+    window = _in_window(trace, s, e)
+    if len(window) > max_changes:
+        return window[:max_changes] + [f"... {len(window) - max_changes} more changes"]
+    return window
+
+@mcp.tool()
+def vcd_batch_query(path: str, queries: List[Dict[str, Any]], max_changes: int = 200) -> str:
+    """
+    Answer a list of queries against one vcd in a single call, results keyed by query id.
+    Each query is a dict {"id": ..., "op": ..., "signal": ...} plus the op arguments:
+    - value_at:    "time", optional "method" ('previous' or 'exact')
+    - next_change: "time"  -> (time, value) of the first change after time
+    - prev_change: "time"  -> (time, value) of the last change before time
+    - count_edges: "edge" ('rising' or 'falling'), optional "start", "end", "bit_index"
+    - window:      optional "start", "end" -> [(time, value), ...] (at most max_changes listed)
+    All the signals are loaded in one pass over the dump (or read from the sidecar index).
+    """
+    if not os.path.exists(path):
+        return "error : vcd File does not exist"
+    wf = load_waveform(path)
+    wf.prefetch({q.get("signal") for q in queries if q.get("signal") in wf})
+
+    results: Dict[Any, Any] = {}
+    for n, q in enumerate(queries):
+        qid = q.get("id", n)
+        if q.get("op") not in _BATCH_OPS:
+            results[qid] = f"error : unknown op {q.get('op')!r}, expected one of {_BATCH_OPS}"
+            continue
+        if q.get("signal") not in wf:
+            results[qid] = f"error : signal {q.get('signal')!r} not found"
+            continue
+        try:
+            results[qid] = _batch_answer(wf, wf[q["signal"]], q, max_changes)
+        except KeyError as e:
+            results[qid] = f"error : missing query field {e}"
+        except ValueError as e:
+            results[qid] = f"error : {e}"
+    temp = f"Results of the {len(queries)} queries on {path} :\n"
+    for qid, r in results.items():
+        temp = temp + f"{qid}:\t{r}\n"
+    return temp
+
 ######################################################################
 ######  search for a state of a signal in a timeframe
 ######################################################################
-# need to implement the search for a state and values for a signal in a timeframe and get back the time
-# Logic-Based Search
-# @TODO not implemented yet
+# Logic-Based Search : time intervals where a boolean expression over several signals holds
+_BUS_RANGE = re.compile(r"\[(\d+)(?::(\d+))?\]$")
+
+def _resolve_signal(wf: Waveform, ident: str) -> Tuple[str, Optional[int]]:
+    """Expression identifier -> (signal name, bit position or None). Accepts a full name,
+    a unique short name ('valid', 'dut.valid') or one bit of a bus ('shift_reg[2]')."""
+    def matches(name: str, wanted: str) -> bool:
+        return name == wanted or name.endswith("." + wanted)
+
+    if ident in wf:
+        return ident, None
+    cands = [n for n in wf.signals if matches(n, ident) or matches(_BUS_RANGE.sub("", n), ident)]
+    m = _BUS_RANGE.search(ident)
+    if not cands and m and m.group(2) is None:
+        # bit-select of a bus declared with a range, e.g. shift_reg[2] of shift_reg[7:0]
+        n_bit, base = int(m.group(1)), ident[:m.start()]
+        for n in wf.signals:
+            r = _BUS_RANGE.search(n)
+            if r and r.group(2) is not None and matches(n[:r.start()], base):
+                msb, lsb = int(r.group(1)), int(r.group(2))
+                if min(msb, lsb) <= n_bit <= max(msb, lsb):
+                    cands.append(n)
+        if cands and len({wf.header.vars[n].code for n in cands}) == 1:
+            r = _BUS_RANGE.search(cands[0])
+            msb, lsb = int(r.group(1)), int(r.group(2))
+            return cands[0], (n_bit - lsb if msb >= lsb else lsb - n_bit)
+    if not cands:
+        raise KeyError(f"no signal matches '{ident}'")
+    # aliases (same id code) of one net are the same operand
+    if len({wf.header.vars[n].code for n in cands}) > 1:
+        raise KeyError(f"'{ident}' is ambiguous, use one of {cands[:10]}")
+    return cands[0], None
+
+@mcp.tool()
+def vcd_find_when(path: str, expression: str, start: Optional[Union[str, float, int]] = None, end: Optional[Union[str, float, int]] = None, max_intervals: int = 100) -> str:
+    """
+    Return the time intervals where a boolean expression over signals holds in a time window,
+    e.g. 'valid && !ready && state == 3' or 'top.dut.shift_reg[7:0] == 'h71 || top.intf.sda == 0'.
+    Operators with Verilog precedence: ! ~ < <= > >= == != & ^ | && || ( ), numbers as 3, 'b11, 2'h3, 0x3.
+    A signal is its full name, a unique short name, or one bit of a bus (shift_reg[2]).
+    Intervals are [from, to) in ticks; a sub-expression reading an x/z value is unknown and does not hold.
+    """
+    if not os.path.exists(path):
+        return "error : vcd File does not exist"
+    wf = load_waveform(path)
+    try:
+        tree, idents = parse_expression(expression)
+        resolved = [_resolve_signal(wf, ident) for ident in idents]
+    except ValueError as e:
+        return f"error : {e}"
+    except KeyError as e:
+        return f"error : {e.args[0]}"
+    # one pass over the dump for all the operands
+    wf.prefetch([name for name, _ in resolved])
+    operands = [Operand(wf[name], bit, wf.header.vars[name].kind == "real") for name, bit in resolved]
+
+    ticks = _user_ticks(wf, (start, True), (end, False))
+    if isinstance(ticks, str):
+        return ticks
+    s = 0 if start is None else ticks[0]
+    if end is not None:
+        e = ticks[1]
+    else:
+        e = max((op.trace.times[-1] for op in operands if len(op.trace)), default=s)
+    intervals = find_when(tree, operands, s, e)
+
+    aliases = ", ".join(f"{i} = {n}" for i, (n, _) in zip(idents, resolved) if i != n)
+    temp = f"The expression '{expression}' " + (f"({aliases}) " if aliases else "")
+    temp = temp + f"holds {len(intervals)} times for {sum(b - a for a, b in intervals)} ticks in the timewindow {s}-{e} :\n"
+    shown = intervals[:max_intervals]
+    clock = _cycle_clock(wf, start, end)
+    if clock:
+        at = _cycles(wf, clock, [t for ab in shown for t in ab])
+        temp = temp + "\n".join(f"[{a}, {b})\t[{at[2 * i]}, {at[2 * i + 1]})" for i, (a, b) in enumerate(shown))
+    else:
+        temp = temp + "\n".join(f"[{a}, {b})" for a, b in shown)
+    if len(intervals) > max_intervals:
+        temp = temp + f"\n... {len(intervals) - max_intervals} more intervals not shown"
+    return temp
 
 
 ######################################################################
@@ -665,34 +951,927 @@ def vcd_get_signals_aligned_in_window(path: str, signal_names: Iterable[str], st
 ######################################################################
 # to search for how long a signal is stable without gliches for setup and hold time
 # Protocol-Specific Analysis
-# @TODO not implemented yet
+def _duration_ticks(wf: Waveform, d: Optional[Union[str, float, int]], round_up: bool) -> Optional[int]:
+    if d is None:
+        return None
+    exact = time_to_ticks(d, wf.header)
+    return math.ceil(exact) if round_up else math.floor(exact)
+
+@mcp.tool()
+def vcd_stable_intervals(path: str, signals: str, min_duration: Optional[Union[str, float, int]] = None, max_duration: Optional[Union[str, float, int]] = None, start: Optional[Union[str, float, int]] = None, end: Optional[Union[str, float, int]] = None, max_results: int = 50) -> str:
+    """
+    Return the intervals where a signal (or bus) held a steady value for at least min_duration
+    and/or at most max_duration, in a time window.
+    'signals' is a signal name or a glob over the full names ('top.dut.*', see vcd_match_signals) to sweep many signals at once:
+    max_duration='199ps' on 'top.dut.*' lists every glitch shorter than 200ps in the dut.
+    Each interval is [from, to) in ticks with the value held; the last run of a signal lasts until the end of the dump.
+    """
+    if not os.path.exists(path):
+        return "error : vcd File does not exist"
+    wf = load_waveform(path)
+    try:
+        min_len = _duration_ticks(wf, min_duration, round_up=True)
+        max_len = _duration_ticks(wf, max_duration, round_up=False)
+    except ValueError as e:
+        return f"error : {e}"
+    ticks = _user_ticks(wf, (start, True), (end, False))
+    if isinstance(ticks, str):
+        return ticks
+    s = 0 if start is None else ticks[0]
+    e = wf.end_time if end is None else ticks[1]
+
+    names = [signals] if signals in wf else list(load_scope_tree(path).match(signals))
+    if not names:
+        return f"No signals match '{signals}'"
+    by_code: Dict[str, str] = {}
+    for n in names:
+        by_code.setdefault(wf.header.vars[n].code, n)   # aliases of one net are swept once
+
+    # the index knows every signal's shortest and longest run: skip the ones that cannot match
+    summaries = {n: wf.run_summary(n) for n in by_code.values()}
+    todo = [n for n, sm in summaries.items()
+            if sm is None or not ((max_len is not None and sm[1] > max_len) or (min_len is not None and sm[2] < min_len))]
+    wf.prefetch(todo)
+
+    found = []
+    for n in todo:
+        trace = wf[n]
+        sm = summaries[n]
+        pos, begins, lengths = stable_runs(trace, wf.end_time, s, e, min_len, max_len, None if sm is None else sm[0])
+        if len(pos):
+            found.append((n, trace, pos, begins, lengths))
+    found.sort(key=lambda f: -len(f[2]))
+
+    total = sum(len(f[2]) for f in found)
+    temp = f"{total} stable intervals (min {min_len} / max {max_len} ticks) on {len(found)} of {len(by_code)} signals in the timewindow {s}-{e}\n"
+    shown = 0
+    for n, trace, pos, begins, lengths in found:
+        temp = temp + f"{n}: {len(pos)} intervals, shortest {int(lengths.min())} ticks, longest {int(lengths.max())} ticks\n"
+        k = max(max_results - shown, 0)
+        for p, b, l in zip(pos[:k], begins[:k], lengths[:k]):
+            temp = temp + f"\t[{int(b)}, {int(b + l)})\t{trace.value(int(p))}\n"
+            shown += 1
+    if total > shown:
+        temp = temp + f"... {total - shown} more intervals not shown (raise max_results or narrow the window)\n"
+    return temp
 
 ######################################################################
 ######  map logic values to states like IDLE, ready and others with connection to a source code or a package
 ######################################################################
 # Bus & Enum Interpretation
-# @TODO not implemented yet
+# the RTL tree (rtl_path, or FAULTTRACE_RTL_DIR) is indexed once and re-indexed only for changed files
+def _value_maps(path: str, rtl_path: Optional[str], signal_names: Iterable[str]) -> Optional[Dict[str, ValueMap]]:
+    """Value maps of the signals the RTL names values for; None if an explicit rtl_path does not exist."""
+    rtl = rtl_path or RTL_DIR
+    if not rtl:
+        return {}
+    if not os.path.exists(rtl):
+        return None if rtl_path else {}
+    index = load_typedef_index(rtl)
+    tree = load_scope_tree(path)
+    maps: Dict[str, ValueMap] = {}
+    for sig in signal_names:
+        node = tree.scope_of(sig)
+        vm = index.value_map(sig, node.signals if node is not None else ())
+        if vm:
+            maps[sig] = vm
+    return maps
+
+def _decode_all(values: List[Any], vm: ValueMap) -> List[Any]:
+    # a signal only takes a few distinct values: decode each of them once
+    memo: Dict[Any, Any] = {}
+    out = []
+    for v in values:
+        if v not in memo:
+            memo[v] = decode_value(v, vm) if isinstance(v, str) else v
+        out.append(memo[v])
+    return out
+
+def _decode_dict(values: Dict[str, Any], maps: Dict[str, ValueMap]) -> None:
+    for sig, vm in maps.items():
+        if isinstance(values.get(sig), str):
+            values[sig] = decode_value(values[sig], vm)
+
+@mcp.tool()
+def rtl_list_enums(rtl_path: str, name_filter: str = "", max_results: int = 200) -> str:
+    """
+    Return the symbolic values the RTL defines for its signals (typedef enum, anonymous enum,
+    localparam and `define families bound by assignment, comparison or case label), per module.
+    rtl_path is a source directory or file; name_filter keeps the signals (or modules) containing it.
+    The window / aligned / at-timestamp tools use the same maps to show values as LABEL(bits).
+    """
+    if not os.path.exists(rtl_path):
+        return "error : rtl path does not exist"
+    index = load_typedef_index(rtl_path)
+    rows = []
+    for module, (unit, maps) in sorted(index.modules.items()):
+        for sig, vm in sorted(maps.items()):
+            if name_filter and name_filter not in sig and name_filter not in module:
+                continue
+            rows.append(f"{module}.{sig}:\t" + ", ".join(f"{v}={label}" for v, label in sorted(vm.items())))
+    if not rows:
+        return f"No named signal values found in {rtl_path}"
+    temp = f"The {len(rows)} signals with named values in {rtl_path} are :\n"
+    temp = temp + "\n".join(rows[:max_results]) + "\n"
+    if len(rows) > max_results:
+        temp = temp + f"... {len(rows) - max_results} more signals not shown (raise max_results or use name_filter)\n"
+    return temp
 
 
 ######################################################################
 ######  give the related signals in a module based on the input signal
 ######################################################################
 # Hierarchy Navigation
-# @TODO not implemented yet
+@mcp.tool()
+def vcd_list_scope(path: str, scope: str = "", max_results: int = 200) -> str:
+    """
+    Return the children of a scope of the design hierarchy ('' for the top): its sub-scopes
+    (type and number of signals below each) and the signals declared directly in it (width).
+    """
+    if not os.path.exists(path):
+        return "error : vcd File does not exist"
+    tree = load_scope_tree(path)
+    node = tree.node(scope)
+    if node is None:
+        return f"error : scope '{scope}' not found"
+    hdr = load_header(path)
+    children = list(node.children.values())
+    temp = f"Scope '{node.full}' ({node.kind}) has {len(children)} sub-scopes and {len(node.signals)} signals, {node.count} signals in total below it\n"
+    for c in children[:max_results]:
+        temp = temp + f"\t{c.full}\t{c.kind}\t{c.count} signals\n"
+    for n in node.signals[:max(max_results - len(children), 0)]:
+        temp = temp + f"\t{n}\t{hdr.vars[n].kind} [{hdr.vars[n].width}]\n"
+    if len(children) + len(node.signals) > max_results:
+        temp = temp + f"... {len(children) + len(node.signals) - max_results} more entries not shown\n"
+    return temp
+
+@mcp.tool()
+def vcd_list_sibling_signals(path: str, signal_name: str, max_results: int = 200) -> str:
+    """
+    Return the signals declared in the same scope (module instance) as the given signal.
+    """
+    if not os.path.exists(path):
+        return "error : vcd File does not exist"
+    node = load_scope_tree(path).scope_of(signal_name)
+    if node is None:
+        return f"error : signal {signal_name} not found"
+    siblings = [n for n in node.signals if n != signal_name]
+    temp = f"The signal {signal_name} has {len(siblings)} sibling signals in scope '{node.full}' :\n"
+    temp = temp + "\n".join(siblings[:max_results])
+    if len(siblings) > max_results:
+        temp = temp + f"\n... {len(siblings) - max_results} more signals not shown"
+    return temp
+
+@mcp.tool()
+def vcd_match_signals(path: str, pattern: str, scope: str = "", regex: bool = False, max_results: int = 200) -> str:
+    """
+    Return the signals under a scope whose full name matches a glob ('top.dut.*valid*', '*' spans
+    scope levels, brackets are literal) or, with regex=True, contains a match of a regular expression.
+    """
+    if not os.path.exists(path):
+        return "error : vcd File does not exist"
+    try:
+        found = list(load_scope_tree(path).match(pattern, scope, regex))
+    except re.error as e:
+        return f"error : bad regular expression : {e}"
+    temp = f"{len(found)} signals under '{scope}' match '{pattern}' :\n"
+    temp = temp + "\n".join(found[:max_results])
+    if len(found) > max_results:
+        temp = temp + f"\n... {len(found) - max_results} more signals not shown"
+    return temp
 
 
 ######################################################################
 ######  check two signals edges
 ######################################################################
 # context based to check if signal A toggle  before signal B or after in a time window
-# @TODO not implemented yet
+@mcp.tool()
+def vcd_edge_order(path: str, signal_a: str, signal_b: str, edge_a: str = "rising", edge_b: str = "rising", start: Optional[Union[str, float, int]] = None, end: Optional[Union[str, float, int]] = None, bit_a: Optional[int] = None, bit_b: Optional[int] = None, bins: int = 10) -> str:
+    """
+    For every edge of signal A in a time window, tell if it precedes, follows or coincides with
+    the matching edge of signal B, and return the B - A latency statistics (min, max, mean, histogram).
+    Edges are 'rising', 'falling', 'any' (0<->1, optional bit of a bus) or 'change' (any value change).
+    The matching B edge is the first one at or after the A edge and before the next A edge,
+    else the last B edge since the previous A edge (B came first); pairs are one-to-one and in order.
+    """
+    if not os.path.exists(path):
+        return "error : vcd File does not exist"
+    wf = load_waveform(path)
+    for sig in (signal_a, signal_b):
+        if sig not in wf:
+            return f"error : signal {sig} not found"
+    ticks = _user_ticks(wf, (start, True), (end, False))
+    if isinstance(ticks, str):
+        return ticks
+    s = 0 if start is None else ticks[0]
+    e = wf.end_time if end is None else ticks[1]
+    traces = wf.window([signal_a, signal_b], s, e)
+    a = edge_times(traces[signal_a], s, e, edge_a, bit_a)
+    b = edge_times(traces[signal_b], s, e, edge_b, bit_b)
+    match = match_edges(a, b)
+
+    ok = match >= 0
+    lat = b[match[ok]] - a[ok]
+    temp = f"{len(a)} {edge_a} edges of {signal_a} and {len(b)} {edge_b} edges of {signal_b} in the timewindow {s}-{e}\n"
+    temp = temp + f"A precedes B: {int((lat > 0).sum())}, A follows B: {int((lat < 0).sum())}, coincide: {int((lat == 0).sum())}, "
+    temp = temp + f"A edges without a matching B edge: {int((~ok).sum())}, B edges left unmatched: {len(b) - int(ok.sum())}\n"
+    if len(lat):
+        temp = temp + f"latency B - A (ticks): min {int(lat.min())}, max {int(lat.max())}, mean {float(lat.mean()):.6g}, median {float(np.median(lat)):.6g}\n"
+        counts, edges = np.histogram(lat, bins=max(1, min(bins, len(np.unique(lat)))))
+        temp = temp + "histogram :\n" + "".join(f"\t[{edges[i]:.6g}, {edges[i + 1]:.6g}{']' if i == len(counts) - 1 else ')'}\t{int(c)}\n" for i, c in enumerate(counts))
+    late = a[ok][lat < 0]
+    if len(late):
+        temp = temp + f"first A edges that follow their B edge at : {late[:10].tolist()}\n"
+    if (~ok).any():
+        temp = temp + f"first A edges without a B edge at : {a[~ok][:10].tolist()}\n"
+    return temp
 
 
 ######################################################################
 ######  multiple signals status in a single timestamp
 ######################################################################
-# timestamp value for a list of signals
-# @TODO not implemented yet
+# timestamp value for every signal under a scope (full design state at t)
+@mcp.tool()
+def vcd_get_scope_values_at_timestamp(path: str, scope: str, timestamp: Union[str, float, int], max_signals: int = 200, rtl_path: Optional[str] = None) -> str:
+    """
+    Return the value of every signal under `scope` (e.g. 'top.dut', '' for the whole design)
+    at `timestamp` with step/hold semantics (last value at or before timestamp).
+    With a sidecar index this is one checkpoint copy plus a short replay, independent of
+    how far into the dump the timestamp is. At most max_signals values are listed.
+    values named in the RTL (enum / localparam / `define, see rtl_list_enums) are shown as LABEL(bits)
+    """
+    if not os.path.exists(path):
+        return "error : vcd File does not exist"
+    wf = load_waveform(path)
+    ticks = _user_ticks(wf, (timestamp, False))
+    if isinstance(ticks, str):
+        return ticks
+    (t,) = ticks
+    node = load_scope_tree(path).node(scope)
+    names = [] if node is None else list(load_scope_tree(path).iter_signals(node))
+    if not names:
+        return f"No signals found under scope '{scope}'"
+    values = wf.values_at(names, t)
+    maps = _value_maps(path, rtl_path, names[:max_signals])
+    if maps is None:
+        return "error : rtl path does not exist"
+    _decode_dict(values, maps)
+    temp = f"The Values of the {len(names)} signals under scope '{scope}' at timestamp {timestamp} ({t} ticks) are :\n"
+    for s in names[:max_signals]:
+        temp = temp + f"{s}:\t{values.get(s)}\n"
+    if len(names) > max_signals:
+        temp = temp + f"... {len(names) - max_signals} more signals not shown (raise max_signals or narrow the scope)\n"
+    return temp
+
+######################################################################
+######  everything that changed around a timestamp
+######################################################################
+# one range read of the global event stream (sidecar slice, or a windowed parse of the vcd)
+@mcp.tool()
+def vcd_events_around(path: str, timestamp: Union[str, float, int], before: Union[str, float, int], after: Union[str, float, int] = 0, scope: str = "", max_signals: int = 50, max_events: int = 100) -> str:
+    """
+    Return every change of every signal (under `scope`, '' for the whole design) between
+    timestamp - before and timestamp + after, e.g. before="50ns" for what led to an error.
+    The signals are ranked by activity (number of changes in the window, then latest change),
+    followed by the max_events changes nearest to the timestamp in time order.
+    """
+    if not os.path.exists(path):
+        return "error : vcd File does not exist"
+    wf = load_waveform(path)
+    ticks = _user_ticks(wf, (timestamp, False))
+    if isinstance(ticks, str):
+        return ticks
+    (t,) = ticks
+    try:
+        lo = max(t - _duration_ticks(wf, before, round_up=False), 0)
+        hi = t + _duration_ticks(wf, after, round_up=False)
+    except ValueError as e:
+        return f"error : {e}"
+    events = wf.events_between(lo, hi)
+
+    codes = None
+    names: Dict[str, str] = {}
+    if scope.strip("."):
+        tree = load_scope_tree(path)
+        node = tree.node(scope)
+        if node is None:
+            return f"No signals found under scope '{scope}'"
+        for n in tree.iter_signals(node):
+            names.setdefault(wf.header.vars[n].code, n)   # aliases of one net are shown once
+        index = {code: i for i, code in enumerate(events.code_list)}
+        codes = [index[c] for c in names if c in index]
+    times, ev_codes, ids = event_arrays(events, codes)
+    ranked, counts, first, last = rank_activity(times, ev_codes)
+
+    def name(ci: int) -> str:
+        code = events.code_list[ci]
+        return names.get(code) or wf.header.codes[code][0]
+
+    temp = f"{len(times)} changes on {len(ranked)} signals" + (f" under scope '{scope}'" if codes is not None else "")
+    temp = temp + f" in {lo}-{hi} ticks around timestamp {timestamp} ({t} ticks)"
+    if not len(times):
+        return temp
+    temp = temp + " :\nSignals by activity (changes, first - last change, last value) :\n"
+    for ci, n, a, b in zip(ranked[:max_signals].tolist(), counts.tolist(), first.tolist(), last.tolist()):
+        temp = temp + f"{name(ci)}:\t{n}\t[{times[a]} - {times[b]}]\t{events.strings[int(ids[b])]}\n"
+    if len(ranked) > max_signals:
+        temp = temp + f"... {len(ranked) - max_signals} more signals not shown (raise max_signals or narrow the scope)\n"
+    near = nearest_events(times, t, max_events)
+    temp = temp + f"Changes nearest to {t} ({len(near)} of {len(times)}) :\n"
+    clock = _cycle_clock(wf, timestamp)
+    at = _cycles(wf, clock, times[near].tolist()) if clock else None
+    for k, i in enumerate(near.tolist()):
+        temp = temp + f"{times[i]}" + (f" ({at[k]})" if at else "") + f"\t{name(int(ev_codes[i]))} = {events.strings[int(ids[i])]}\n"
+    return temp
+
+######################################################################
+######  first X/Z sources of the design
+######################################################################
+# recorded per signal by vcd_build_index (one pass over the dump without a sidecar, then cached)
+@mcp.tool()
+def vcd_first_xz(path: str, scope: str = "", after: Optional[Union[str, float, int]] = None, max_results: int = 50) -> str:
+    """
+    Return the signals (under `scope`, '' for the whole design) that held an X or Z value,
+    earliest first X/Z first and grouped by scope, with their last X/Z run and the time they
+    became fully known again (or that they are still X/Z at the end of the dump).
+    after: only keep the signals whose last X/Z run starts at or after this time
+    (e.g. the end of reset, to skip the X of power-up).
+    """
+    if not os.path.exists(path):
+        return "error : vcd File does not exist"
+    wf = load_waveform(path)
+    tree = load_scope_tree(path)
+    node = tree.node(scope)
+    if node is None:
+        return f"No signals found under scope '{scope}'"
+    ticks = _user_ticks(wf, (after, True))
+    if isinstance(ticks, str):
+        return ticks
+    (a,) = ticks
+    spans = wf.xz_spans()
+
+    hits: Dict[str, Tuple[str, Tuple[int, int, int]]] = {}
+    for n in tree.iter_signals(node):
+        code = wf.header.vars[n].code
+        span = spans.get(code)
+        if span is not None and code not in hits and (a is None or span[1] >= a):
+            hits[code] = (n, span)              # aliases of one net are shown once
+    if not hits:
+        return f"No signal under scope '{scope}' held an X or Z value" + (f" after {after}" if a is not None else "")
+    ranked = sorted(hits.values(), key=lambda h: (h[1][0], h[1][1], h[0]))
+    stuck = sum(1 for _, span in ranked if span[2] < 0)
+
+    groups: Dict[str, List[Tuple[str, Tuple[int, int, int]]]] = {}
+    for n, span in ranked[:max_results]:
+        scope_node = tree.scope_of(n)
+        groups.setdefault(scope_node.full if scope_node is not None else "", []).append((n, span))
+    temp = f"{len(ranked)} signals" + (f" under scope '{scope}'" if scope.strip(".") else "")
+    temp = temp + f" held an X or Z value ({stuck} still X/Z at the end of the dump), earliest first :\n"
+    for group, rows in groups.items():     # scopes in order of their earliest X/Z
+        temp = temp + f"{group or '(root)'} :\n"
+        for n, (first, last, known) in rows:
+            leaf = n[len(group) + 1:] if group else n
+            end = f"fully known at {known}" if known >= 0 else "still X/Z at the end"
+            temp = temp + f"  {leaf}:\tfirst X/Z at {first}\tlast X/Z from {last}, {end}\n"
+    if len(ranked) > max_results:
+        temp = temp + f"... {len(ranked) - max_results} more signals not shown (raise max_results, use after or narrow the scope)\n"
+    return temp
+
+######################################################################
+######  clock-cycle coordinates
+######################################################################
+# every time input of the vcd tools also accepts "clk@12" / "clk@12+1.5ns" (see _time)
+@mcp.tool()
+def vcd_list_clocks(path: str) -> str:
+    """
+    Return the clocks of the dump (1-bit signals with a regular rising-edge period, plus the
+    FAULTTRACE_VCD_CLOCKS ones) with their period, number of cycles and first / last rising edge.
+    Any of them can be used in time coordinates like "clk@12" (rising edge 12, 0-based).
+    """
+    if not os.path.exists(path):
+        return "error : vcd File does not exist"
+    wf = load_waveform(path)
+    ci = clock_index(wf)
+    clocks = ci.clocks()
+    if not clocks:
+        return "No clock found (set FAULTTRACE_VCD_CLOCKS to name them)"
+    temp = f"The {len(clocks)} clocks of the dump (period in {wf.header.timescale_str} ticks) are :\n"
+    for n, period in sorted(clocks.items(), key=lambda c: c[1]):
+        e = ci.edges(n)
+        temp = temp + f"{n}:\tperiod {period}\t{len(e)} cycles\trising edges {int(e[0])} - {int(e[-1])}\n"
+    return temp
+
+@mcp.tool()
+def vcd_time_to_cycle(path: str, clock: str, timestamps: List[Union[str, float, int]]) -> str:
+    """
+    Return the clock-cycle coordinate of each timestamp on `clock`: 'clk@12' on rising edge 12
+    (0-based), 'clk@12+300' 300 ticks after it. Timestamps can be ticks, times with a unit
+    or coordinates on another clock.
+    """
+    if not os.path.exists(path):
+        return "error : vcd File does not exist"
+    wf = load_waveform(path)
+    try:
+        name, bit = _resolve_signal(wf, clock)
+        if bit is not None:
+            raise ValueError(f"'{clock}' is a bit of a bus, a clock must be a 1-bit signal")
+        clock_index(wf).edges(name)
+    except ValueError as e:
+        return f"error : {e}"
+    except KeyError as e:
+        return f"error : {e.args[0]}"
+    ticks = _user_ticks(wf, *((t, False) for t in timestamps))
+    if isinstance(ticks, str):
+        return ticks
+    at = _cycles(wf, (name, clock), ticks)
+    return "\n".join(f"{t} = {a}" for t, a in zip(timestamps, at))
+
+@mcp.tool()
+def vcd_sample_on_clock(path: str, clock: str, signal_names: Iterable[str], start: Optional[Union[str, float, int]] = None, end: Optional[Union[str, float, int]] = None, sample: str = "before", max_cycles: int = 100, rtl_path: Optional[str] = None) -> str:
+    """
+    Return the values of signals at every rising edge of `clock` in [start, end], one row per cycle.
+    sample='before': value just before the edge (what a flop clocked by it captures);
+    sample='at': value at the edge, after the changes it caused.
+    At most max_cycles rows are listed; values named in the RTL are shown as LABEL(bits).
+    """
+    if not os.path.exists(path):
+        return "error : vcd File does not exist"
+    if sample not in ("before", "at"):
+        return f"error : sample must be 'before' or 'at', not '{sample}'"
+    wf = load_waveform(path)
+    try:
+        clk, bit = _resolve_signal(wf, clock)
+        if bit is not None:
+            raise ValueError(f"'{clock}' is a bit of a bus, a clock must be a 1-bit signal")
+        edges = clock_index(wf).edges(clk)
+    except ValueError as e:
+        return f"error : {e}"
+    except KeyError as e:
+        return f"error : {e.args[0]}"
+    names = [n for n in signal_names]
+    missing = [n for n in names if n not in wf]
+    if missing:
+        return f"error : unknown signals {missing}"
+    maps = _value_maps(path, rtl_path, names)
+    if maps is None:
+        return "error : rtl path does not exist"
+    ticks = _user_ticks(wf, (start, True), (end, False))
+    if isinstance(ticks, str):
+        return ticks
+    lo = 0 if start is None else int(np.searchsorted(edges, ticks[0], side="left"))
+    hi = len(edges) if end is None else int(np.searchsorted(edges, ticks[1], side="right"))
+    at = edges[lo:hi][:max_cycles]
+
+    wf.prefetch(names)
+    columns = []
+    for n in names:
+        tr = wf[n]
+        ids = sample_ids(tr, at, before=(sample == "before"))
+        text = {int(v): (tr.strings[int(v)] if v >= 0 else None) for v in np.unique(ids)}
+        column = [text[int(v)] for v in ids]
+        columns.append(_decode_all(column, maps[n]) if n in maps else column)
+
+    temp = f"Values of {len(names)} signals sampled {'at' if sample == 'at' else 'just before'} the rising edges of {clk}, cycles {lo}-{hi - 1} :\n"
+    temp = temp + "cycle\ttime\t" + "\t".join(names) + "\n"
+    rows = [f"{lo + k}\t{t}\t" + "\t".join(str(c[k]) for c in columns) + "\n" for k, t in enumerate(at.tolist())]
+    temp = temp + "".join(rows)
+    if hi - lo > len(at):
+        temp = temp + f"... {hi - lo - len(at)} more cycles not shown (raise max_cycles or narrow the window)\n"
+    return temp
+
+######################################################################
+######  first divergence between a passing and a failing dump
+######################################################################
+@mcp.tool()
+def vcd_diff(path_a: str, path_b: str, scope: str = "", top_n: int = 20) -> str:
+    """
+    Compare two dumps of the same design (path_a the passing run, path_b the failing one)
+    signal by signal, matched by hierarchical name (under `scope`, '' for the whole design).
+    Return the earliest time any common signal differs and the top_n first divergent signals
+    ordered by first mismatch, with both values there. Stops reading as soon as they are known.
+    """
+    if not os.path.exists(path_a) or not os.path.exists(path_b):
+        return "error : vcd File does not exist"
+    wf_a, wf_b = load_waveform(path_a), load_waveform(path_b)
+    tree = load_scope_tree(path_a)
+    node = tree.node(scope)
+    if node is None:
+        return f"No signals found under scope '{scope}'"
+    try:
+        res = diff_waveforms(wf_a, wf_b, list(tree.iter_signals(node)), top_n)
+    except ValueError as e:
+        return f"error : {e}"
+    unit = wf_a.header.timescale_str if res.unit == wf_a.header.tick_seconds else wf_b.header.timescale_str
+
+    temp = f"Compared {res.common} common signals" + (f" under scope '{scope}'" if scope.strip(".") else "")
+    temp = temp + f" ({res.only_a} only in {path_a}, {res.only_b} only in {path_b}), times in {unit} ticks\n"
+    if not res.divergences:
+        return temp + f"No divergence up to {res.end} (end of the shorter dump)"
+    temp = temp + f"First divergence at {res.divergences[0].time}"
+    if res.compared <= res.end:
+        temp = temp + f" (stopped reading at {res.compared} of {res.end})"
+    temp = temp + f"\nFirst {len(res.divergences)} divergent signals (time, value in {path_a}, value in {path_b}) :\n"
+    for d in res.divergences:
+        temp = temp + f"{d.name}:\t{d.time}\t{d.value_a}\t{d.value_b}\n"
+    return temp
+
+######################################################################
+######  where in time a scope is busy, idle or stuck
+######################################################################
+@mcp.tool()
+def vcd_activity_heatmap(path: str, scope: str = "", start: Optional[Union[str, float, int]] = None, end: Optional[Union[str, float, int]] = None, buckets: int = 32, max_signals: int = 20) -> str:
+    """
+    Return where in time the signals under `scope` ('' for the whole design) are busy, idle or stuck,
+    over [start, end] (default the whole dump) cut into `buckets` time buckets: the changes and active
+    signals of each bucket with a heat bar, the busiest signals with their own heat bar, and the signals
+    that stopped changing with the value they are stuck at. When scope is a signal, one row per bucket
+    with its change count and lowest / highest value. Answered from the precomputed activity pyramid,
+    the cost does not depend on the dump size. Use it to find where to zoom in.
+    """
+    if not os.path.exists(path):
+        return "error : vcd File does not exist"
+    wf = load_waveform(path)
+    ticks = _user_ticks(wf, (start, True), (end, False))
+    if isinstance(ticks, str):
+        return ticks
+    t0 = 0 if start is None else ticks[0]
+    t1 = wf.end_time if end is None else ticks[1]
+    if t1 < t0:
+        return "error : end must be >= start"
+
+    if scope in wf:
+        act = bucket_activity(wf, scope, t0, t1, buckets)
+        strings = wf[scope].strings
+        source = f"pyramid level {act.level}" if act.level >= 0 else "the trace"
+        temp = f"Activity of {scope} in {t0}-{t1}, {len(act.counts)} buckets of {act.width} ticks (from {source}) :\n"
+        temp = temp + f"heat\t|{heat_bar(act.counts.tolist(), int(act.counts.max()))}|\n"
+        temp = temp + "bucket\tstart\tchanges\tlowest\thighest\n"
+        rows = [f"{k}\t{act.start + k * act.width}\t{c}\t{strings[lo] if lo >= 0 else None}\t{strings[hi] if hi >= 0 else None}\n"
+                for k, (c, lo, hi) in enumerate(zip(act.counts.tolist(), act.lo.tolist(), act.hi.tolist()))]
+        return temp + "".join(rows)
+
+    tree = load_scope_tree(path)
+    node = tree.node(scope)
+    if node is None:
+        return f"No signals found under scope '{scope}'"
+    names: Dict[str, str] = {}
+    for n in tree.iter_signals(node):
+        names.setdefault(wf.header.vars[n].code, n)         # aliases of one net are counted once
+    wf.prefetch(names.values())
+    acts = {n: bucket_activity(wf, n, t0, t1, buckets) for n in names.values()}
+    if not acts:
+        return f"No signals found under scope '{scope}'"
+    first = next(iter(acts.values()))
+    total = np.sum([a.counts for a in acts.values()], axis=0)
+    active = np.sum([a.counts > 0 for a in acts.values()], axis=0)
+    peak = int(total.max())
+    source = f"pyramid level {first.level}" if first.level >= 0 else "the traces"
+
+    temp = f"Activity of {len(acts)} signals" + (f" under scope '{scope}'" if scope.strip(".") else "")
+    temp = temp + f" in {t0}-{t1}, {len(total)} buckets of {first.width} ticks (from {source}) :\n"
+    temp = temp + f"heat\t|{heat_bar(total.tolist(), peak)}|\n"
+    temp = temp + "bucket\tstart\tchanges\tactive signals\n"
+    for k, (c, na) in enumerate(zip(total.tolist(), active.tolist())):
+        state = "\tidle" if c == 0 else "\tbusy" if 2 * c >= peak else ""
+        temp = temp + f"{k}\t{first.start + k * first.width}\t{c}\t{na}{state}\n"
+
+    busy = sorted((n for n in acts if acts[n].counts.any()), key=lambda n: -int(acts[n].counts.sum()))
+    sig_peak = max((int(acts[n].counts.max()) for n in busy), default=0)
+    temp = temp + f"Busiest signals (changes in the window, heat per bucket) :\n"
+    for n in busy[:max_signals]:
+        temp = temp + f"{n}:\t{int(acts[n].counts.sum())}\t|{heat_bar(acts[n].counts.tolist(), sig_peak)}|\n"
+    if len(busy) > max_signals:
+        temp = temp + f"... {len(busy) - max_signals} more active signals not shown (raise max_signals or narrow the scope)\n"
+
+    # stuck: kept changing for a while in the window, then nothing over its last quarter
+    quiet = max(len(total) // 4, 1)
+    stuck = [n for n in busy if len(total) > quiet and not acts[n].counts[-quiet:].any()
+             and np.count_nonzero(acts[n].counts) >= quiet]
+    if stuck:
+        temp = temp + f"Stuck signals (no change over the last {quiet} buckets) :\n"
+        for n in stuck[:max_signals]:
+            tr = wf[n]
+            i = bisect.bisect_right(tr.times, t1) - 1
+            temp = temp + f"{n}:\tstuck at {tr.value(i)} since {tr.times[i]}\n"
+        if len(stuck) > max_signals:
+            temp = temp + f"... {len(stuck) - max_signals} more stuck signals not shown\n"
+    still = [n for n in acts if not acts[n].counts.any()]
+    if still:
+        shown = ", ".join(f"{n}={wf[n].strings[acts[n].hi[0]] if acts[n].hi[0] >= 0 else None}" for n in still[:max_signals])
+        temp = temp + f"{len(still)} signals did not change in the window : {shown}" + (" ..." if len(still) > max_signals else "") + "\n"
+    return temp
+
+######################################################################
+######  protocol transactions decoded from the bus signals
+######################################################################
+# decoded once per dump and binding (one pass over the bound signals), then paged from the cache
+def _bus_log(wf: Waveform, path: str, protocol: str, signals: Optional[Dict[str, str]], scope: str) -> TransactionLog:
+    """Decoded transactions of a protocol; KeyError / ValueError with the message for the agent."""
+    try:
+        cls = decoder_class(protocol)
+    except KeyError:
+        raise KeyError(f"unknown protocol '{protocol}', the decoders are {sorted(DECODERS)}") from None
+    explicit = {role: _resolve_signal(wf, name)[0] for role, name in (signals or {}).items()}
+    tree = load_scope_tree(path)
+    node = tree.node(scope)
+    if node is None:
+        raise KeyError(f"no signals found under scope '{scope}'")
+    candidates: Dict[str, str] = {}
+    for n in tree.iter_signals(node):
+        candidates.setdefault(wf.header.vars[n].code, n)     # aliases of one net are one candidate
+    return decode_transactions(wf, cls.name, cls.bind(explicit, candidates.values()))
+
+def _bus_desc(log: TransactionLog) -> str:
+    roles = decoder_class(log.protocol).roles
+    more = len(log.bindings) - len(roles)
+    return ", ".join(f"{r}={log.bindings[r]}" for r in roles) + (f" (and {more} more signals)" if more > 0 else "")
+
+def _tx_row(log: TransactionLog, i: int) -> str:
+    tx = log.items[i]
+    return f"#{i}\t{tx.start}-{tx.end}\t" + " ".join(f"{k}=" + (f"[{v}]" if " " in v else v or "-") for k, v in tx.fields.items()) + "\n"
+
+@mcp.tool()
+def vcd_transactions(path: str, protocol: str = "i2c", signals: Optional[Dict[str, str]] = None, scope: str = "", start: Optional[Union[str, float, int]] = None, end: Optional[Union[str, float, int]] = None, where: str = "", offset: int = 0, max_results: int = 50) -> str:
+    """
+    Return the transactions of a bus protocol (i2c, mesi) decoded from the dump: start / end time and
+    fields (i2c: addr, rw, ack, data, data_ack, nack, end; mesi: event, line, addr, cache, snoop, data,
+    and the cache line state changes: event=state, line, cache, from, to). The bus signals are bound by
+    role, explicitly with signals (e.g. {"scl": "top.intf.scl", "sda": "top.intf.sda"}) or found by name under scope.
+    start / end: only the transactions starting in this window.
+    where: field filter "field=value,field=value" (e.g. "nack=yes" or "addr=0x50,rw=R"), numbers compare by value.
+    offset / max_results: page through the matching transactions.
+    """
+    if not os.path.exists(path):
+        return "error : vcd File does not exist"
+    filters = []
+    for term in where.split(","):
+        if term.strip():
+            field, eq, value = term.partition("=")
+            if not eq:
+                return f"error : where term '{term.strip()}' is not field=value"
+            filters.append((field.strip(), value.strip()))
+    wf = load_waveform(path)
+    try:
+        t0 = None if start is None else _ticks(wf, start, round_up=True)
+        t1 = None if end is None else _ticks(wf, end)
+        log = _bus_log(wf, path, protocol, signals, scope)
+    except (KeyError, ValueError) as e:
+        return f"error : {e.args[0] if e.args else e}"
+
+    hits = log.select(t0, t1, filters)
+    temp = f"{len(log)} {log.protocol} transactions on {_bus_desc(log)}"
+    if t0 is not None or t1 is not None or filters:
+        window = f" starting in {t0 if t0 is not None else 0}-{t1 if t1 is not None else wf.end_time}" if t0 is not None or t1 is not None else ""
+        temp = temp + f", {len(hits)}{window}" + (f" match '{where}'" if filters else "")
+    page = hits[offset:offset + max_results]
+    if not page:
+        return temp + ", none to show"
+    temp = temp + f" (showing {offset + 1}-{offset + len(page)}) :\n"
+    temp = temp + "".join(_tx_row(log, i) for i in page)
+    if offset + len(page) < len(hits):
+        temp = temp + f"... {len(hits) - offset - len(page)} more transactions not shown (offset={offset + len(page)} for the next page)\n"
+    return temp
+
+@mcp.tool()
+def vcd_cache_line_history(path: str, line: Union[str, int], signals: Optional[Dict[str, str]] = None, scope: str = "", start: Optional[Union[str, float, int]] = None, end: Optional[Union[str, float, int]] = None, max_results: int = 100) -> str:
+    """
+    Return the history of one cache line of a snooping MESI system across all caches: every bus
+    transaction on the line (BusRd / BusInv / BusWB, master, snoop response, who supplied the data)
+    and every MESI state change of each cache, in time order, with the state of each cache at the
+    start and at the end of [start, end]. line: any address inside the line (e.g. "0x44").
+    The bus and the caches' mesi[] / tag[] arrays are found by name under scope, or the bus
+    roles (clk, grant, valid, cmd, addr, shared, dirty) are given in signals.
+    """
+    if not os.path.exists(path):
+        return "error : vcd File does not exist"
+    wf = load_waveform(path)
+    try:
+        addr = line if isinstance(line, int) else int(str(line).strip(), 0)
+    except ValueError:
+        return f"error : line must be an address like 0x40, not '{line}'"
+    try:
+        log = _bus_log(wf, path, "mesi", signals, scope)
+    except (KeyError, ValueError) as e:
+        return f"error : {e.args[0] if e.args else e}"
+    ticks = _user_ticks(wf, (start, True), (end, False))
+    if isinstance(ticks, str):
+        return ticks
+    t0 = 0 if ticks[0] is None else ticks[0]
+    t1 = wf.end_time if ticks[1] is None else ticks[1]
+    off = int(log.notes.get("offset_bits", "0"))
+    key = addr >> off << off
+
+    hits = log.lookup("line", key)
+    caches = [c for c in log.notes.get("caches", "").split(", ") if c]
+    before: Dict[str, str] = {c: "I" for c in caches}
+    after: Dict[str, str] = dict(before)
+    shown = []
+    for i in hits:
+        tx = log.items[i]
+        if tx.fields["event"] == "state" and tx.start <= t1:
+            after[tx.fields["cache"]] = tx.fields["to"]
+            if tx.start < t0:
+                before[tx.fields["cache"]] = tx.fields["to"]
+        if t0 <= tx.start <= t1:
+            shown.append(i)
+    temp = f"History of line 0x{key:02x} ({1 << off} addresses) in {t0}-{t1}"
+    temp = temp + (f" across caches {', '.join(caches)}" if caches else " (no cache state arrays found, bus transactions only)")
+    temp = temp + f", {len(shown)} events :\n"
+    if caches:
+        temp = temp + "states at start : " + ", ".join(f"{c}={s}" for c, s in before.items()) + "\n"
+    rows = []
+    for i in shown[:max_results]:
+        f = log.items[i].fields
+        if f["event"] == "state":
+            rows.append(f"{log.items[i].start}\t{f['cache']}\t{f['from']} -> {f['to']}\n")
+        else:
+            rest = " ".join(f"{k}={v}" for k, v in f.items() if k not in ("event", "line", "cache"))
+            rows.append(f"{log.items[i].start}\t{f['cache']}\t{f['event']} {rest} (until {log.items[i].end})\n")
+    temp = temp + "".join(rows)
+    if len(shown) > max_results:
+        temp = temp + f"... {len(shown) - max_results} more events not shown (raise max_results or narrow the window)\n"
+    if caches:
+        temp = temp + "states at end : " + ", ".join(f"{c}={s}" for c, s in after.items()) + "\n"
+    return temp
+
+######################################################################
+######  temporal properties (SVA subset) checked over the dump
+######################################################################
+# every property shares one pass over the dump and, per clock, one sampling of each signal
+@mcp.tool()
+def vcd_check_properties(path: str, properties: List[str], clock: Optional[str] = None, start: Optional[Union[str, float, int]] = None, end: Optional[Union[str, float, int]] = None, max_failures: int = 10) -> str:
+    """
+    Check clocked temporal properties (a SystemVerilog Assertions subset) over the dump and return, for
+    each, its attempts / passes / failures and the first failures with their time and clock cycle.
+    e.g. "req |-> ##[1:4] ack", "$rose(a) |=> b", "!(x && y)", "@(posedge clk) disable iff (!rst_n) valid |-> ready".
+    Sequences: expr ##N expr, expr ##[M:N] expr ($ for an open end); implications |-> (same cycle) and |=> (next cycle);
+    expressions as in vcd_find_when plus $rose, $fell, $stable, $changed and $past(e, n). Signals are sampled just
+    before each edge of the clock (clock, or @(posedge ...) in the property, default the only clock of the dump);
+    x/z is false, like in SVA. An attempt whose window runs past the end of the dump is pending, not failed.
+    """
+    if not os.path.exists(path):
+        return "error : vcd File does not exist"
+    wf = load_waveform(path)
+    try:
+        props = [parse_property(p) for p in properties]
+        names: Dict[str, Tuple[str, Optional[int]]] = {}
+        for p in props:
+            for ident in p.signals() + ([p.clock] if p.clock else []) + ([clock] if clock else []):
+                if ident not in names:
+                    names[ident] = _resolve_signal(wf, ident)
+    except ValueError as e:
+        return f"error : {e}"
+    except KeyError as e:
+        return f"error : {e.args[0]}"
+    if not props:
+        return "error : no property given"
+    default = clock
+    if default is None and any(p.clock is None for p in props):
+        found = sorted(clock_index(wf).clocks())
+        if len(found) != 1:
+            return f"error : {'several clocks ' + str(found[:10]) if found else 'no clock found'}, pass clock or write @(posedge clk) in the property"
+        default = found[0]
+        names[default] = (default, None)
+    for p in props:
+        if names[p.clock or default][1] is not None:
+            return f"error : '{p.clock or default}' is a bit of a bus, a clock must be a 1-bit signal"
+    ticks = _user_ticks(wf, (start, True), (end, False))
+    if isinstance(ticks, str):
+        return ticks
+    t0 = 0 if start is None else ticks[0]
+    t1 = wf.end_time if end is None else ticks[1]
+    wf.prefetch({name for name, _ in names.values()})       # one pass over the dump for every property
+
+    ci = clock_index(wf)
+    groups: Dict[Tuple[str, str], List[int]] = {}
+    for k, p in enumerate(props):
+        groups.setdefault((p.clock or default, p.edge), []).append(k)
+    rows: List[str] = [""] * len(props)
+    failing = 0
+    for (label, edge), members in groups.items():
+        clk = names[label][0]
+        edges = edge_times(wf[clk], t0, t1, edge)
+        samples: Dict[str, Tuple[np.ndarray, np.ndarray, int]] = {}
+
+        def sample(ident: str) -> Tuple[np.ndarray, np.ndarray, int]:
+            if ident not in samples:
+                name, bit = names[ident]
+                op = Operand(wf[name], bit, wf.header.vars[name].kind == "real")
+                samples[ident] = (*sample_operand(op, edges), 1 if bit is not None else op.trace.width)
+            return samples[ident]
+
+        for k in members:
+            r = check_property(props[k], sample, len(edges), max_failures)
+            failing += r.failed > 0
+            verdict = f"FAILED {r.failed} times" if r.failed else "holds" if r.attempts > r.disabled else "never attempted"
+            temp = f"P{k + 1} '{props[k].text}' on {len(edges)} {edge} edges of {clk} : {verdict}\n"
+            temp = temp + f"   {r.attempts} attempts : {r.passed} passed, {r.failed} failed, {r.pending} pending at the end of the dump, {r.disabled} disabled\n"
+            if r.failures:
+                at = [int(edges[c]) for pair in r.failures for c in pair]
+                where = [f"{t} ({c})" for t, c in zip(at, ci.format(clk, at, label.split(".")[-1]))] if edge == "rising" else [str(t) for t in at]
+                temp = temp + "   first failures (attempt -> end of its window) : " + ", ".join(
+                    where[2 * i] if at[2 * i] == at[2 * i + 1] else f"{where[2 * i]} -> {where[2 * i + 1]}" for i in range(len(r.failures))) + "\n"
+            rows[k] = temp
+    head = f"{len(props)} propert{'y' if len(props) == 1 else 'ies'} checked in {t0}-{t1} (signals sampled just before each clock edge), {failing} failing :\n"
+    return head + "".join(rows)
+
+######################################################################
+######  per-signal activity table of the whole design
+######################################################################
+# recorded per signal by vcd_build_index (one pass over the dump without a sidecar, then cached)
+_STATS_SORT = {"changes": True, "values": True, "xz": True, "width": True, "last": True, "first": False, "name": False}
+_STATS_OPS = {"=": lambda a, b: a == b, "!=": lambda a, b: a != b, "<": lambda a, b: a < b,
+              "<=": lambda a, b: a <= b, ">": lambda a, b: a > b, ">=": lambda a, b: a >= b}
+_STATS_TERM = re.compile(r"^\s*(\w+)\s*(<=|>=|!=|<|>|=)\s*(\S.*?)\s*$")
+
+def _final_is(value: str, want: str) -> bool:
+    """Final value against a where value: 'x' / 'z' match any value with an x / z bit, numbers compare by value."""
+    if want in ("x", "z"):
+        return want in value.lower()
+    if value and all(ch in "01" for ch in value):
+        try:
+            return int(value, 2) == int(want, 0)
+        except ValueError:
+            pass
+    return value.lower() == want
+
+@mcp.tool()
+def vcd_signal_stats(path: str, scope: str = "", sort: str = "changes", where: str = "", max_results: int = 50) -> str:
+    """
+    Return the activity table of the signals under `scope` ('' for the whole design): per signal its width,
+    value changes over the whole dump, first and last change, distinct values, time spent at X/Z and final value.
+    sort: changes, values, xz, width, last (largest first), first or name (smallest first); a leading '-' reverses it.
+    where: filter "field<op>value,..." with op in = != < <= > >= over changes, first, last, values, xz, width
+    (first / last accept units and clk@N, xz a duration with units) and final (= or != only), e.g. "changes=0" for the signals that never
+    toggled, "xz>0,last<10us", "final=x". Read from the sidecar index, so its cost does not depend on the dump size.
+    """
+    if not os.path.exists(path):
+        return "error : vcd File does not exist"
+    key = sort.strip().lstrip("-")
+    if key not in _STATS_SORT:
+        return f"error : sort must be one of {', '.join(_STATS_SORT)}, not '{sort}'"
+    wf = load_waveform(path)
+    filters = []
+    for term in where.split(","):
+        if not term.strip():
+            continue
+        m = _STATS_TERM.match(term)
+        if m is None or m.group(1) not in _STATS_SORT and m.group(1) != "final" or m.group(1) == "name":
+            return f"error : where term '{term.strip()}' is not field<op>value over changes, first, last, values, xz, width or final"
+        field, op, value = m.groups()
+        if field == "final":
+            if op not in ("=", "!="):
+                return f"error : final only compares with = or !=, not '{op}'"
+            filters.append((field, op, value.lower()))
+            continue
+        try:
+            if field in ("first", "last"):
+                filters.append((field, op, _ticks(wf, value)))
+            elif field == "xz":
+                filters.append((field, op, _duration_ticks(wf, value, False)))
+            else:
+                filters.append((field, op, int(value, 0)))
+        except (KeyError, ValueError):
+            kind = "time" if field in ("first", "last") else "duration" if field == "xz" else "number"
+            return f"error : where term '{term.strip()}' needs a {kind}, not '{value}'"
+    tree = load_scope_tree(path)
+    node = tree.node(scope)
+    if node is None:
+        return f"No signals found under scope '{scope}'"
+    table = wf.signal_stats()
+
+    def final(n: str, vid: int) -> str:
+        return "-" if vid == NO_VALUE else wf[n].strings[vid]
+
+    rows: Dict[str, Tuple[str, int, Any]] = {}
+    for n in tree.iter_signals(node):
+        var = wf.header.vars[n]
+        rows.setdefault(var.code, (n, var.width, table[var.code]))      # aliases of one net are shown once
+    hits = []
+    for n, width, st in rows.values():
+        fields = {"changes": st.changes, "first": st.first, "last": st.last, "values": st.values, "xz": st.xz, "width": width}
+        if all(_final_is(final(n, st.final), value) == (op == "=") if field == "final" else _STATS_OPS[op](fields[field], value)
+               for field, op, value in filters):
+            hits.append((n, width, st, fields))
+    hits.sort(key=lambda h: h[0])
+    if key != "name":
+        hits.sort(key=lambda h: h[3][key], reverse=_STATS_SORT[key] != sort.strip().startswith("-"))
+    elif sort.strip().startswith("-"):
+        hits.reverse()
+
+    temp = f"{len(rows)} signals" + (f" under scope '{scope}'" if scope.strip(".") else "")
+    temp = temp + (f", {len(hits)} match '{where}'" if filters else "") + f", by {sort.strip()}"
+    temp = temp + (" (from the sidecar index)" if sidecar_is_fresh(path) else " (from every trace, vcd_build_index makes it a table read)")
+    if not hits:
+        return temp + ", none to show"
+    temp = temp + " :\n"
+    temp = temp + "signal\twidth\tchanges\tfirst\tlast\tvalues\txz\tfinal\n"
+    for n, width, st, _ in hits[:max_results]:
+        first, last = (t if t >= 0 else "-" for t in (st.first, st.last))
+        temp = temp + f"{n}\t{width}\t{st.changes}\t{first}\t{last}\t{st.values}\t{st.xz}\t{final(n, st.final)}\n"
+    if len(hits) > max_results:
+        temp = temp + f"... {len(hits) - max_results} more signals not shown (raise max_results, use where or narrow the scope)\n"
+    return temp
 
 if __name__ == "__main__":
     mcp.run()
@@ -0,0 +1,283 @@
+"""
+rtl_typedefs.py
+───────────────
+Symbolic decoding of waveform values from the RTL sources of the design.
+
+THE PROBLEM
+───────────
+A VCD only holds bits: a cache controller state reads as `10`, a bus command
+as `11`.  To tell ST_MISS_ARB from ST_WB_TX the agent had to fetch source
+snippets and decode every value by hand, one tool call per question.
+
+THIS SOLUTION
+─────────────
+The RTL tree is scanned once for value names and the signals they belong to:
+
+  typedef enum {IDLE, READ = 3, ...} state_t;   + `state_t state;`
+  enum logic [1:0] {A, B} mode;                  anonymous enum on a variable
+  localparam ST_IDLE = 3'd0; ...                 + `state <= ST_IDLE;`
+  `define BUS_READ 2'b01 ...                     + `case (bus_cmd) `BUS_READ: ...`
+
+A constant that is assigned to, compared with or used as a case label of a
+signal binds that signal to the whole constant family (same name prefix up to
+the first '_'), so every ST_* state decodes even if only some are assigned.
+
+A VCD signal is matched by its leaf name ('top.u_cache0.state' -> 'state').
+When several modules define that name, the module whose identifiers overlap
+most with the signals of the same VCD scope wins.
+
+CACHING
+───────
+Each source file is parsed once per (size, mtime) and the merged index of a
+tree is kept under a key made of the stamps of every source file, both in the
+shared waveform cache (within FAULTTRACE_VCD_CACHE_MB), so touching one file
+re-parses that file only.
+
+CONFIGURATION
+─────────────
+  FAULTTRACE_RTL_DIR   default RTL directory (or file) used for decoding when a
+                       tool is not given one (default: no decoding)
+"""
+
+from __future__ import annotations
+
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from vcd_analysis import parse_number
+from vcd_store import CACHE
+
+
+RTL_DIR = os.getenv("FAULTTRACE_RTL_DIR", "")
+RTL_SUFFIXES = (".v", ".sv", ".vh", ".svh")
+
+ValueMap = Dict[int, str]
+
+
+# ── Source scanning ───────────────────────────────────────────────────────────
+
+_COMMENT   = re.compile(r"//[^\n]*|/\*.*?\*/", re.S)
+_DEFINE    = re.compile(r"^[ \t]*`define[ \t]+(\w+)[ \t]+([^\s]+)", re.M)
+_UNIT      = re.compile(r"\b(module|package|interface)\s+(?:automatic\s+|static\s+)?(\w+)(.*?)\bend(?:module|package|interface)\b", re.S)
+_ENUM      = re.compile(r"(\btypedef\s+)?\benum\b[^{;]*\{([^}]*)\}\s*([\w\s,]+?)\s*;", re.S)
+_PARAM     = re.compile(r"\b(?:localparam|parameter)\b([^;]*);")
+_PARAM_ONE = re.compile(r"^\s*(?:(?:localparam|parameter)\s+)?(?:\w+\s+)?(?:\[[^\]]*\]\s*)?(\w+)\s*=\s*(\d*'[sS]?[bBoOdDhH][0-9a-fA-F_]+|0[xX][0-9a-fA-F_]+|\d+)\s*$")
+_USE       = re.compile(r"\b(\w+)\s*(?:\[[^\]:]*\]\s*)?(?:<=|==|!=|=)\s*(`?\w+)")    # x[i] yes, x[a:b] / x[a+:w] no
+_CASE      = re.compile(r"\bcase[zx]?\s*\(\s*((?:[^()]|\([^()]*\))*?)\s*\)|\b(endcase)\b|(\?\s*)?(`?[A-Za-z_]\w*)\s*:(?!:)")
+_WORD      = re.compile(r"\b[A-Za-z_]\w*\b")
+_DECL      = re.compile(r"\b([A-Za-z_]\w*)\s+(?:\[[^\]]*\]\s*)?([A-Za-z_]\w*(?:\s*,\s*[A-Za-z_]\w*)*)\s*[;,)=]")
+
+
+def _number(text: str) -> Optional[int]:
+    try:
+        v = parse_number(text)
+    except ValueError:
+        return None
+    return v if isinstance(v, int) else None
+
+
+def _enum_items(body: str) -> ValueMap:
+    out: ValueMap = {}
+    nxt = 0
+    for item in body.split(","):
+        name, _, value = item.partition("=")
+        name = name.strip()
+        if not re.fullmatch(r"[A-Za-z_]\w*", name):
+            continue
+        if value.strip():
+            v = _number(value.strip())
+            nxt = v if v is not None else nxt
+        out[nxt] = name
+        nxt += 1
+    return out
+
+
+@dataclass
+class UnitDefs:
+    """What one module / package / interface declares and uses."""
+    name:     str
+    path:     str
+    consts:   Dict[str, int]      = field(default_factory=dict)   # localparam / parameter literals
+    typed:    Dict[str, str]      = field(default_factory=dict)   # variable -> declared type (kept if an enum)
+    anon:     Dict[str, ValueMap] = field(default_factory=dict)   # variable -> anonymous enum
+    uses:     Dict[str, Set[str]] = field(default_factory=dict)   # variable -> constants it meets
+    params:   Set[str]            = field(default_factory=set)    # every localparam / parameter name
+    idents:   Set[str]            = field(default_factory=set)
+
+
+@dataclass
+class FileDefs:
+    defines: Dict[str, int]      = field(default_factory=dict)
+    enums:   Dict[str, ValueMap] = field(default_factory=dict)   # typedef name -> values
+    units:   List[UnitDefs]      = field(default_factory=list)
+
+    def nbytes(self) -> int:
+        return (1024 + 100 * (len(self.defines) + sum(len(vm) for vm in self.enums.values()))
+                + sum(200 * (len(u.idents) + len(u.consts) + sum(len(c) for c in u.uses.values())) for u in self.units))
+
+
+def scan_source(path: str) -> FileDefs:
+    """Parse one RTL file for defines, enum typedefs, literal localparams and their uses."""
+    with open(path, "r", errors="replace") as f:
+        text = _COMMENT.sub("", f.read())
+    out = FileDefs()
+    for name, value in _DEFINE.findall(text):
+        v = _number(value)
+        if v is not None:
+            out.defines[name] = v
+    for m in _ENUM.finditer(text):
+        if m.group(1):
+            out.enums[m.group(3).strip()] = _enum_items(m.group(2))
+    for kind, name, body in _UNIT.findall(text):
+        unit = UnitDefs(name, path)
+        for m in _ENUM.finditer(body):
+            if not m.group(1):
+                values = _enum_items(m.group(2))
+                for var in m.group(3).split(","):
+                    unit.anon[var.strip()] = values
+        for stmt in _PARAM.findall(body):
+            for item in stmt.split(","):
+                lhs = re.findall(r"\w+", item.partition("=")[0])
+                if lhs and "=" in item:
+                    unit.params.add(lhs[-1])
+                pm = _PARAM_ONE.match(item)
+                if pm:
+                    v = _number(pm.group(2))
+                    if v is not None:
+                        unit.consts[pm.group(1)] = v
+        for tname, names in _DECL.findall(body):
+            for var in names.split(","):
+                unit.typed.setdefault(var.strip(), tname)
+        for var, const in _USE.findall(body):
+            unit.uses.setdefault(var, set()).add(const)
+        selectors: List[str] = []           # nested case statements: labels go to the innermost
+        for sel, end, ternary, label in _CASE.findall(body):
+            if end:
+                if selectors:
+                    selectors.pop()
+            elif label:
+                if not ternary and selectors and re.fullmatch(r"\w+", selectors[-1]):
+                    unit.uses.setdefault(selectors[-1], set()).add(label)
+            else:
+                selectors.append(re.sub(r"\[[^\]:]*\]$", "", sel))
+        unit.idents = set(_WORD.findall(body))
+        out.units.append(unit)
+    return out
+
+
+# ── Index ─────────────────────────────────────────────────────────────────────
+
+class TypedefIndex:
+    """Value maps of every signal of an RTL tree, by module and signal name."""
+
+    def __init__(self, files: Dict[str, FileDefs]) -> None:
+        defines: Dict[str, int] = {}
+        enums: Dict[str, ValueMap] = {}
+        for fd in files.values():
+            defines.update(fd.defines)
+            enums.update(fd.enums)
+        label_enum = {label: name for name, values in enums.items() for label in values.values()}
+        package_consts: Dict[str, int] = {}
+        for fd in files.values():
+            for u in fd.units:
+                package_consts.update(u.consts)
+
+        self.enums = enums
+        self.modules: Dict[str, Tuple[UnitDefs, Dict[str, ValueMap]]] = {}
+        self._by_signal: Dict[str, List[str]] = {}
+        for fd in files.values():
+            for u in fd.units:
+                maps: Dict[str, ValueMap] = {}
+                for var, tname in u.typed.items():
+                    if tname in enums:
+                        maps[var] = enums[tname]
+                maps.update(u.anon)
+                for var, used in u.uses.items():
+                    if var in maps or var in u.params:
+                        continue
+                    vm = self._family_map(used, u.consts, package_consts, defines, enums, label_enum)
+                    if vm:
+                        maps[var] = vm
+                self.modules[u.name] = (u, maps)
+                for var in maps:
+                    self._by_signal.setdefault(var, []).append(u.name)
+
+    @staticmethod
+    def _family_map(used: Iterable[str], consts: Dict[str, int], package_consts: Dict[str, int],
+                    defines: Dict[str, int], enums: Dict[str, ValueMap], label_enum: Dict[str, str]) -> ValueMap:
+        out: ValueMap = {}
+        for c in used:
+            if c.startswith("`"):
+                pool, name = defines, c[1:]
+            elif c in label_enum:
+                for v, label in enums[label_enum[c]].items():
+                    out.setdefault(v, label)
+                continue
+            else:
+                pool, name = (consts if c in consts else package_consts), c
+            if name not in pool:
+                continue
+            prefix = name.split("_", 1)[0] + "_" if "_" in name else name
+            for other, v in pool.items():
+                if other == name or ("_" in name and other.startswith(prefix)):
+                    prev = out.get(v)
+                    if prev is None:
+                        out[v] = other
+                    elif other not in prev.split("|"):
+                        out[v] = f"{prev}|{other}"
+        return out
+
+    def value_map(self, signal: str, scope_signals: Iterable[str] = ()) -> Optional[ValueMap]:
+        """Value map for a VCD signal (full name), or None when the RTL does not name its values."""
+        leaf = re.sub(r"\[[^\]]*\]$", "", signal.rpartition(".")[2])
+        mods = self._by_signal.get(leaf)
+        if not mods:
+            return None
+        if len(mods) > 1:
+            near = {re.sub(r"\[[^\]]*\]$", "", s.rpartition(".")[2]) for s in scope_signals}
+            mods = sorted(mods, key=lambda m: -len(near & self.modules[m][0].idents))
+        return self.modules[mods[0]][1][leaf]
+
+    def nbytes(self) -> int:
+        return 2048 + sum(200 * (len(u.idents) + sum(len(vm) for vm in maps.values()))
+                          for u, maps in self.modules.values())
+
+
+def decode_value(value: str, vm: ValueMap) -> str:
+    """'010' -> 'ST_MISS_ARB(010)' when the value has a name, the value itself otherwise."""
+    if value and all(ch in "01" for ch in value):
+        label = vm.get(int(value, 2))
+        if label is not None:
+            return f"{label}({value})"
+    return value
+
+
+# ── Loader ────────────────────────────────────────────────────────────────────
+
+def _source_files(root: str) -> List[str]:
+    if os.path.isfile(root):
+        return [root]
+    out = []
+    for d, dirs, files in os.walk(root):
+        dirs[:] = sorted(x for x in dirs if not x.startswith("."))
+        out.extend(os.path.join(d, f) for f in sorted(files) if f.endswith(RTL_SUFFIXES))
+    return out
+
+
+def _file_defs(path: str, st: os.stat_result) -> FileDefs:
+    key = (path, st.st_size, st.st_mtime_ns, "rtl-file")
+    return CACHE.get_or_load(key, lambda: scan_source(path), lambda fd: fd.nbytes())
+
+
+def load_typedef_index(rtl_path: str) -> TypedefIndex:
+    """Cached `TypedefIndex` of an RTL directory (or single file); stale when any source file changes."""
+    root = os.path.abspath(rtl_path)
+    stamps = []
+    for p in _source_files(root):
+        st = os.stat(p)
+        stamps.append((p, st.st_mtime_ns, st.st_size, st))
+    key = (root, len(stamps), hash(tuple(s[:3] for s in stamps)), "rtl")
+    return CACHE.get_or_load(key, lambda: TypedefIndex({p: _file_defs(p, st) for p, _, _, st in stamps}),
+                             lambda ix: ix.nbytes())
@@ -0,0 +1,111 @@
+"""
+vcd_activity.py
+───────────────
+Activity heatmaps for the `vcd_*` tools of the RTL_Toolbox server.
+
+THE PROBLEM
+───────────
+Before zooming in, the agent needs to know where in time a block does
+anything: where it is busy, where it sits idle, where a signal stopped
+moving.  The only way was to pull windows of changes or to count edges
+window by window, each one a pass over the data.
+
+THIS SOLUTION
+─────────────
+`bucket_activity` answers one signal over a window cut into n buckets from
+the activity pyramid of `vcd_store`, at the coarsest level that still
+resolves the buckets.  The window is snapped to that level's bucket grid, so
+every output bucket sums whole pyramid buckets and the counts are exact.  The
+cost is the number of non-empty pyramid buckets in the window, at most about
+4 x n, whatever the dump size.  A window narrower than the finest level is
+computed from the window slice of the trace instead.
+
+HEAT
+────
+`heat_bar` draws counts as one character per bucket on a log scale shared by
+every row, ' ' for no change up to '@' for the busiest bucket.
+"""
+
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass
+from typing import Dict, Sequence
+
+import numpy as np
+
+from vcd_store import PYRAMID_FANOUT, Waveform, build_pyramid, value_key
+
+
+_HEAT = " .:-=+*#%@"
+
+
+@dataclass
+class Activity:
+    start:  int                 # tick of the first bucket
+    width:  int                 # ticks per bucket
+    counts: np.ndarray          # changes per bucket
+    lo:     np.ndarray          # lowest value id held in each bucket (-1: no value yet)
+    hi:     np.ndarray          # highest value id held in each bucket
+    level:  int                 # pyramid level used, -1 when computed from the trace
+
+
+def bucket_activity(wf: Waveform, name: str, start: int, end: int, buckets: int) -> Activity:
+    """
+    Changes and lowest / highest value of a signal per bucket of about
+    [start, end]: the buckets are whole pyramid buckets, so the first one may
+    start a little before `start` and the last one end a little after `end`.
+    """
+    want = max(1, -(-(end - start + 1) // max(buckets, 1)))
+    pyr = wf.pyramid(name)
+    held = -1
+    if pyr.width > want:
+        # finer than the finest level: one exact level from the window slice
+        tr = wf.window([name], start, end)[name]
+        if len(tr) and tr.times[0] < start:
+            held = int(tr.ids[0])
+        n = -(-(end + 1 - start) // want)
+        pyr = build_pyramid(tr.times, tr.ids, tr.strings, want, start + n * want - 1, origin=start)
+        level, lw, width, first = -1, want, want, start
+    else:
+        level = 0
+        while level + 1 < len(pyr.levels) and pyr.width * PYRAMID_FANOUT ** (level + 1) <= want:
+            level += 1
+        lw = pyr.width * PYRAMID_FANOUT ** level
+        width = -(-want // lw) * lw
+        first = pyr.origin + (start - pyr.origin) // lw * lw
+        n = max(1, -(-(end + 1 - first) // width))
+
+    idx, cnt, lo, hi, last = (np.asarray(col, dtype=np.int64) for col in pyr.levels[max(level, 0)])
+    bt = pyr.origin + idx * lw
+    a, b = int(np.searchsorted(bt, first, side="left")), int(np.searchsorted(bt, first + n * width, side="left"))
+    out = (bt[a:b] - first) // width
+    counts = np.bincount(out, weights=cnt[a:b], minlength=n).astype(np.int64)
+
+    # value entering each bucket: last value of the latest pyramid bucket before it
+    j = np.searchsorted(bt, first + np.arange(n) * width, side="left") - 1
+    entering = np.where(j >= 0, last[np.maximum(j, 0)] if len(last) else held, held)
+
+    pool = np.unique(np.concatenate((lo[a:b], hi[a:b], entering[entering >= 0])))
+    order = sorted(pool.tolist(), key=lambda v: value_key(pyr.strings[v]))
+    rank: Dict[int, int] = {v: r for r, v in enumerate(order)}
+    to_rank = np.vectorize(rank.__getitem__, otypes=[np.int64]) if order else None
+    lo_r = np.full(n, len(order), dtype=np.int64)
+    hi_r = np.full(n, -1, dtype=np.int64)
+    has = entering >= 0
+    if has.any():
+        lo_r[has] = hi_r[has] = to_rank(entering[has])
+    if b > a:
+        np.minimum.at(lo_r, out, to_rank(lo[a:b]))
+        np.maximum.at(hi_r, out, to_rank(hi[a:b]))
+    ids = np.asarray(order + [-1], dtype=np.int64)
+    return Activity(first, width, counts, ids[np.where(lo_r < len(order), lo_r, -1)], ids[hi_r], level)
+
+
+def heat_bar(counts: Sequence[int], peak: int) -> str:
+    """One character per bucket, log scale up to `peak` changes."""
+    if peak <= 0:
+        return " " * len(counts)
+    top = math.log(peak + 1)
+    return "".join(_HEAT[0] if c <= 0 else _HEAT[max(1, min(len(_HEAT) - 1, round(math.log(c + 1) / top * (len(_HEAT) - 1))))]
+                   for c in counts)
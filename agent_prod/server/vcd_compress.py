@@ -0,0 +1,273 @@
+"""
+vcd_compress.py
+───────────────
+Compressed dumps (.vcd.gz, .vcd.bz2, .vcd.zst) for the `vcd_*` tools of the
+RTL_Toolbox server.
+
+THE PROBLEM
+───────────
+Regression farms keep their dumps compressed, about ten times smaller than the
+text.  Every tool needed a plain-text path, so a dump had to be decompressed
+to scratch space before the first question could be asked about it.
+
+THIS SOLUTION
+─────────────
+`open_dump` recognises a compressed dump by its magic bytes, whatever its
+name, and returns a stream of the decompressed text.  The header scan, the
+selective parse and `build_index` read it the way they read a plain dump,
+front to back, without a decompressed copy on disk.  The sidecar of
+`sim.vcd.gz` is `sim.vcd.gz.ftidx`; once it is built nothing is decompressed
+again.
+
+SEEKABLE FRAMES
+───────────────
+A stream compressed in one piece can only be read from its start.  Two
+formats cut it into independent frames and record where each one is:
+
+  BGZF           gzip members of at most 64 KiB that carry their own size in
+                 a header field (bgzip, htslib); they are walked without
+                 inflating anything
+  zstd seekable  zstd frames followed by a seek table in a skippable frame
+                 (zstd contrib/seekable_format, t2sz)
+
+For those, `frame_index` maps offsets of the text to frames and `FrameReader`
+decompresses only the frames a window query touches, so a window late in a
+large dump costs about what it costs on the plain text.  Other gzip, bzip2
+and zstd files are read front to back.
+
+CONFIGURATION
+─────────────
+  FAULTTRACE_VCD_FRAME_CACHE   decompressed frames kept per framed dump (default 64)
+
+zstd dumps need the `zstandard` package; gzip and bzip2 use the standard
+library.
+"""
+
+from __future__ import annotations
+
+import bisect
+import bz2
+import gzip
+import io
+import mmap
+import os
+import struct
+import zlib
+from array import array
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, BinaryIO, Optional
+
+
+VCD_FRAME_CACHE = int(os.getenv("FAULTTRACE_VCD_FRAME_CACHE", "64"))
+
+_MAGIC = ((b"\x1f\x8b", "gzip"), (b"BZh", "bzip2"), (b"\x28\xb5\x2f\xfd", "zstd"))
+_BGZF_HEADER = b"\x1f\x8b\x08\x04"          # gzip, deflate, FEXTRA
+_SEEK_TABLE_MAGIC = 0x184D2A5E              # skippable frame holding the seek table
+_SEEKABLE_MAGIC = 0x8F92EAB1                # last 4 bytes of a zstd seekable file
+
+
+# ── Streams ───────────────────────────────────────────────────────────────────
+
+def compression(path: str) -> Optional[str]:
+    """'gzip', 'bzip2' or 'zstd' for a compressed dump, None for plain text."""
+    with open(path, "rb") as f:
+        head = f.read(4)
+    for magic, kind in _MAGIC:
+        if head.startswith(magic):
+            return kind
+    return None
+
+
+def _zstandard() -> Any:
+    try:
+        import zstandard
+    except ImportError:
+        raise OSError("reading a zstd-compressed dump needs the zstandard package (pip install zstandard)") from None
+    return zstandard
+
+
+def open_dump(path: str, offset: int = 0) -> BinaryIO:
+    """Binary stream of the (decompressed) text of a dump, positioned at `offset` of the text."""
+    kind = compression(path)
+    if kind is None:
+        f = open(path, "rb")
+        f.seek(offset)
+        return f
+    if kind == "gzip":
+        f = gzip.open(path, "rb")
+    elif kind == "bzip2":
+        f = bz2.open(path, "rb")
+    else:
+        reader = _zstandard().ZstdDecompressor().stream_reader(open(path, "rb"), read_across_frames=True)
+        f = io.BufferedReader(reader)
+    # compressed streams only move forwards: decompress up to the offset and drop it
+    while offset > 0:
+        skipped = len(f.read(min(offset, 1 << 20)))
+        if not skipped:
+            break
+        offset -= skipped
+    return f
+
+
+# ── Seekable frames ───────────────────────────────────────────────────────────
+
+@dataclass
+class Frames:
+    """
+    Independent frames of a compressed dump: frame k is the compressed bytes
+    starts[k]:ends[k] and holds the text raw[k]:raw[k + 1].
+    """
+    kind:   str
+    starts: array
+    ends:   array
+    raw:    array               # len(starts) + 1 offsets, the last one is the size of the text
+
+
+def frame_index(path: str) -> Optional[Frames]:
+    """Frames of a BGZF or zstd seekable dump; None for plain text and unframed streams."""
+    kind = compression(path)
+    if kind == "gzip":
+        return _bgzf_frames(path)
+    if kind == "zstd":
+        return _zstd_seek_table(path)
+    return None
+
+
+def _bgzf_block_size(mm: mmap.mmap, pos: int) -> Optional[int]:
+    """Size of the BGZF block at `pos` from its BC extra subfield, None for a plain gzip member."""
+    if mm[pos:pos + 4] != _BGZF_HEADER or pos + 12 > len(mm):
+        return None
+    (xlen,) = struct.unpack_from("<H", mm, pos + 10)
+    p, end = pos + 12, min(pos + 12 + xlen, len(mm))
+    while p + 4 <= end:
+        (slen,) = struct.unpack_from("<H", mm, p + 2)
+        if mm[p:p + 2] == b"BC" and slen == 2 and p + 6 <= end:
+            return struct.unpack_from("<H", mm, p + 4)[0] + 1
+        p += 4 + slen
+    return None
+
+
+def _bgzf_frames(path: str) -> Optional[Frames]:
+    frames = Frames("gzip", array("Q"), array("Q"), array("Q", [0]))
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        pos = 0
+        while pos < len(mm):
+            size = _bgzf_block_size(mm, pos)
+            if size is None or pos + size > len(mm):
+                return None
+            (isize,) = struct.unpack_from("<I", mm, pos + size - 4)
+            if isize:                   # skip empty blocks (the BGZF end-of-file marker)
+                frames.starts.append(pos)
+                frames.ends.append(pos + size)
+                frames.raw.append(frames.raw[-1] + isize)
+            pos += size
+    return frames
+
+
+def _zstd_seek_table(path: str) -> Optional[Frames]:
+    """Frames from the seek table at the end of a zstd seekable file (read without decompressing)."""
+    with open(path, "rb") as f:
+        size = f.seek(0, os.SEEK_END)
+        if size < 17:
+            return None
+        f.seek(size - 9)
+        count, descriptor, magic = struct.unpack("<IBI", f.read(9))
+        if magic != _SEEKABLE_MAGIC:
+            return None
+        entry = 12 if descriptor & 0x80 else 8          # with a checksum per frame
+        table = 8 + count * entry + 9
+        if table > size:
+            return None
+        f.seek(size - table)
+        head, frame_size = struct.unpack("<II", f.read(8))
+        if head != _SEEK_TABLE_MAGIC or frame_size != table - 8:
+            return None
+        data = f.read(count * entry)
+    frames = Frames("zstd", array("Q"), array("Q"), array("Q", [0]))
+    pos = 0
+    for k in range(count):
+        csize, dsize = struct.unpack_from("<II", data, k * entry)
+        if dsize:
+            frames.starts.append(pos)
+            frames.ends.append(pos + csize)
+            frames.raw.append(frames.raw[-1] + dsize)
+        pos += csize
+    return frames
+
+
+class FrameReader:
+    """
+    The text of a framed dump with the parts of the mmap interface the
+    store uses (len, slicing, find, rfind); only the frames that are touched
+    are decompressed, the last FAULTTRACE_VCD_FRAME_CACHE of them are kept.
+    """
+
+    def __init__(self, path: str, frames: Frames) -> None:
+        self.frames = frames
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._dctx = _zstandard().ZstdDecompressor() if frames.kind == "zstd" else None
+        self._cache: "OrderedDict[int, bytes]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return self.frames.raw[-1]
+
+    def _frame(self, k: int) -> bytes:
+        text = self._cache.get(k)
+        if text is not None:
+            self._cache.move_to_end(k)
+            return text
+        data = self._mm[self.frames.starts[k]:self.frames.ends[k]]
+        text = zlib.decompress(data, 31) if self._dctx is None else self._dctx.decompressobj().decompress(data)
+        self._cache[k] = text
+        if len(self._cache) > max(VCD_FRAME_CACHE, 2):
+            self._cache.popitem(last=False)
+        return text
+
+    def _frame_at(self, pos: int) -> int:
+        return bisect.bisect_right(self.frames.raw, pos) - 1
+
+    def read(self, lo: int, hi: int) -> bytes:
+        """Text bytes [lo, hi)."""
+        raw = self.frames.raw
+        lo, hi = max(lo, 0), min(hi, len(self))
+        parts = []
+        k = self._frame_at(lo)
+        while lo < hi:
+            parts.append(self._frame(k)[lo - raw[k]:min(hi, raw[k + 1]) - raw[k]])
+            lo = raw[k + 1]
+            k += 1
+        return b"".join(parts)
+
+    def __getitem__(self, key: slice) -> bytes:
+        start, stop, _ = key.indices(len(self))
+        return self.read(start, stop)
+
+    def find(self, sub: bytes, start: int = 0, end: Optional[int] = None) -> int:
+        raw = self.frames.raw
+        end = len(self) if end is None else min(end, len(self))
+        k = self._frame_at(max(start, 0))
+        while 0 <= k < len(self.frames.starts) and raw[k] < end:
+            # a match may run into the next frame
+            lo = max(start, raw[k])
+            i = self.read(lo, min(raw[k + 1] + len(sub) - 1, end)).find(sub)
+            if i >= 0:
+                return lo + i
+            k += 1
+        return -1
+
+    def rfind(self, sub: bytes, start: int = 0, end: Optional[int] = None) -> int:
+        raw = self.frames.raw
+        end = len(self) if end is None else min(end, len(self))
+        k = self._frame_at(end - 1)
+        while k >= 0 and raw[k + 1] > start:
+            lo = max(start, raw[k])
+            i = self.read(lo, min(raw[k + 1] + len(sub) - 1, end)).rfind(sub)
+            if i >= 0:
+                return lo + i
+            k -= 1
+        return -1
+
+    def close(self) -> None:
+        self._mm.close()
@@ -0,0 +1,216 @@
+"""
+vcd_diff.py
+───────────
+First-divergence diff of two dumps of the same design (golden run vs failing run).
+
+THE PROBLEM
+───────────
+A failing regression always has a passing run next to it, and the first
+question is "where do they start to differ".  Answering it signal by signal
+means loading every trace of both dumps and comparing them in full, even when
+the runs split a few microseconds into a multi-GB dump.
+
+THIS SOLUTION
+─────────────
+Signals are aligned by hierarchical name.  Both global change streams are
+read in step, one time chunk at a time, with the value of every common signal
+carried from chunk to chunk.  Inside a chunk the changes of both dumps are
+merged per signal and step-held with array passes, so the first tick where
+the two values differ is found for every signal at once.  Values are compared
+as text, with leading zeros of binary vectors and the x/z case ignored.
+
+EARLY EXIT
+──────────
+Chunks start at 1/256 of the common time range and double in size.  Once
+`top_n` signals have diverged before the end of a chunk, the answer is final:
+a signal that still matches can only diverge later.  A sidecar chunk is one
+slice of its event stream; a text dump parses only up to the end of the last
+chunk.  The cost follows how far into the run the divergence is, not the
+size of the dumps.
+
+TIMESCALES
+──────────
+Times are compared in the finer of the two timescales; the coarser one must
+be a whole multiple of it.
+"""
+
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass, field
+from fractions import Fraction
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from vcd_analysis import event_arrays
+from vcd_store import Waveform
+
+
+_NONE = -1        # no value yet (before the first change)
+_HOLD = -2        # merged row that does not update this side
+
+_FIRST_CHUNKS = 256
+
+
+@dataclass
+class Divergence:
+    name:    str
+    time:    int                  # in ticks of DiffResult.unit
+    value_a: Optional[str]
+    value_b: Optional[str]
+
+
+@dataclass
+class DiffResult:
+    unit:      Fraction           # seconds per tick of every reported time
+    common:    int
+    only_a:    int
+    only_b:    int
+    end:       int                # last tick present in both dumps
+    compared:  int                # the dumps were compared over [0, compared)
+    divergences: List[Divergence] = field(default_factory=list)
+
+
+class _Values:
+    """Value strings of both dumps interned into one id space."""
+
+    def __init__(self) -> None:
+        self._ids: Dict[str, int] = {}
+        self.strings: List[str] = []
+
+    def id(self, value: str) -> int:
+        v = value.lower()
+        if len(v) > 1 and v[0] == "0" and all(ch in "01" for ch in v):
+            v = v.lstrip("0") or "0"
+        vid = self._ids.get(v)
+        if vid is None:
+            vid = self._ids[v] = len(self.strings)
+            self.strings.append(v)
+        return vid
+
+    def text(self, vid: int) -> Optional[str]:
+        return None if vid < 0 else self.strings[vid]
+
+
+class _Side:
+    """One dump: its change stream mapped onto the common signals and the common tick."""
+
+    def __init__(self, wf: Waveform, names: Sequence[str], factor: int) -> None:
+        self.wf = wf
+        self.factor = factor
+        self._names = names
+        self._ptr: Optional[np.ndarray] = None
+        self._sigs: Optional[np.ndarray] = None
+
+    def _map_codes(self, code_list: List[str]) -> None:
+        # code index -> common signal ids (CSR: an aliased code feeds several names)
+        by_code: Dict[str, List[int]] = {}
+        for sig, name in enumerate(self._names):
+            by_code.setdefault(self.wf.header.vars[name].code, []).append(sig)
+        counts = np.array([len(by_code.get(c, ())) for c in code_list], dtype=np.int64)
+        self._ptr = np.concatenate(([0], np.cumsum(counts)))
+        self._sigs = np.array([s for c in code_list for s in by_code.get(c, ())], dtype=np.int64)
+
+    def chunk(self, t0: int, t1: int, values: _Values) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(common times, signal ids, value ids) of the changes in [t0, t1) common ticks."""
+        lo, hi = -(-t0 // self.factor), -(-t1 // self.factor) - 1
+        empty = np.zeros(0, dtype=np.int64)
+        if hi < lo:
+            return empty, empty, empty
+        ev = self.wf.events_between(lo, hi)
+        if self._ptr is None:
+            self._map_codes(ev.code_list)
+        times, codes, ids = event_arrays(ev)
+        per = self._ptr[codes + 1] - self._ptr[codes]
+        rows = np.repeat(np.arange(len(codes)), per)
+        if not len(rows):
+            return empty, empty, empty
+        within = np.arange(len(rows)) - np.repeat(np.cumsum(per) - per, per)
+        sigs = self._sigs[self._ptr[codes[rows]] + within]
+        uniq, inv = np.unique(ids[rows], return_inverse=True)
+        lut = np.array([values.id(ev.strings[int(u)]) for u in uniq], dtype=np.int64)
+        return times[rows] * self.factor, sigs, lut[inv]
+
+
+def _first_mismatches(t0: int, a: Tuple[np.ndarray, ...], b: Tuple[np.ndarray, ...],
+                      state_a: np.ndarray, state_b: np.ndarray) -> Tuple[np.ndarray, ...]:
+    """
+    (signals, times, value a, value b) of the first mismatch inside a chunk of
+    every signal that has one; `state_a` / `state_b` are advanced to the chunk end.
+    """
+    ta, sa, va = a
+    tb, sb, vb = b
+    active = np.unique(np.concatenate((sa, sb)))
+    if not len(active):
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, empty, empty
+    # one seed row per signal with the values carried in, then the changes of both sides
+    t = np.concatenate((np.full(len(active), t0 - 1), ta, tb))
+    s = np.concatenate((active, sa, sb))
+    va_rows = np.concatenate((state_a[active], va, np.full(len(tb), _HOLD)))
+    vb_rows = np.concatenate((state_b[active], np.full(len(ta), _HOLD), vb))
+    order = np.lexsort((t, s))
+    t, s, va_rows, vb_rows = t[order], s[order], va_rows[order], vb_rows[order]
+
+    # step/hold both sides; every signal group starts with its seed row
+    pos = np.arange(len(t))
+    fill_a = np.maximum.accumulate(np.where(va_rows != _HOLD, pos, 0))
+    fill_b = np.maximum.accumulate(np.where(vb_rows != _HOLD, pos, 0))
+    va_rows, vb_rows = va_rows[fill_a], vb_rows[fill_b]
+
+    # compare after all the changes of one tick are applied
+    settled = np.ones(len(t), dtype=bool)
+    settled[:-1] = (s[1:] != s[:-1]) | (t[1:] != t[:-1])
+    hits = np.flatnonzero(settled & (va_rows != vb_rows))
+    first = hits[np.unique(s[hits], return_index=True)[1]]
+
+    last = np.flatnonzero(np.append(s[1:] != s[:-1], True))
+    state_a[s[last]] = va_rows[last]
+    state_b[s[last]] = vb_rows[last]
+    return s[first], t[first], va_rows[first], vb_rows[first]
+
+
+def diff_waveforms(wf_a: Waveform, wf_b: Waveform, names_a: Sequence[str], top_n: int = 20) -> DiffResult:
+    """
+    Earliest mismatches between two dumps over the signals of `names_a` that
+    both dumps declare, at most `top_n` of them, ordered by first mismatch.
+    """
+    tick_a, tick_b = wf_a.header.tick_seconds, wf_b.header.tick_seconds
+    unit = min(tick_a, tick_b)
+    fa, fb = tick_a / unit, tick_b / unit
+    if fa.denominator != 1 or fb.denominator != 1:
+        raise ValueError(f"timescales {wf_a.header.timescale_str} and {wf_b.header.timescale_str} are not multiples of each other")
+
+    names = [n for n in names_a if n in wf_b.header.vars]
+    only_a = len(set(names_a)) - len(set(names))
+    only_b = sum(1 for n in wf_b.header.vars if n not in wf_a.header.vars)
+    end = min(wf_a.end_time * int(fa), wf_b.end_time * int(fb))
+    result = DiffResult(unit, len(names), only_a, only_b, end, 0)
+    if not names:
+        return result
+
+    side_a, side_b = _Side(wf_a, names, int(fa)), _Side(wf_b, names, int(fb))
+    values = _Values()
+    state_a = np.full(len(names), _NONE, dtype=np.int64)
+    state_b = np.full(len(names), _NONE, dtype=np.int64)
+    alive = np.ones(len(names), dtype=bool)
+    found: List[Tuple[int, int, int, int]] = []
+
+    t0, size = 0, max(math.ceil((end + 1) / _FIRST_CHUNKS), 1)
+    while t0 <= end and len(found) < top_n and alive.any():
+        t1 = min(t0 + size, end + 1)
+        a = side_a.chunk(t0, t1, values)
+        b = side_b.chunk(t0, t1, values)
+        # a signal that already diverged is left out of every later chunk
+        a = tuple(x[alive[a[1]]] for x in a)
+        b = tuple(x[alive[b[1]]] for x in b)
+        sigs, times, fa_vals, fb_vals = _first_mismatches(t0, a, b, state_a, state_b)
+        alive[sigs] = False
+        found.extend(zip(times.tolist(), sigs.tolist(), fa_vals.tolist(), fb_vals.tolist()))
+        t0, size = t1, size * 2
+    result.compared = t0
+
+    found.sort(key=lambda f: (f[0], names[f[1]]))
+    result.divergences = [Divergence(names[s], t, values.text(x), values.text(y)) for t, s, x, y in found[:top_n]]
+    return result
@@ -0,0 +1,493 @@
+"""
+vcd_protocols.py
+────────────────
+Streaming protocol decoders for the `vcd_*` tools of the RTL_Toolbox server.
+
+THE PROBLEM
+───────────
+"Which I2C transfer got NACKed" meant pulling the scl/sda windows and having
+the agent replay the bus bit by bit: thousands of changes in the context for
+one answer, redone for every question about the same traffic.
+
+THIS SOLUTION
+─────────────
+A decoder is a small state machine fed the settled values of the signals it
+needs (its roles, e.g. scl and sda) at every time one of them changes.  The
+traces of the bound signals are read together (one pass over a text dump, a
+zero-copy merge with a sidecar) and the decoder turns them into
+`Transaction`s: a start and end tick plus named fields (address, R/W, data,
+ack, ...).  The decoded `TransactionLog` is kept with the cached waveform, so
+every later question is a lookup: by time with a bisect over the start
+times, by field through an index built on first use of that field.
+
+DECODERS
+────────
+  i2c   scl, sda     START / repeated START / STOP, 7-bit address + R/W,
+                     data bytes, ACK/NACK of every byte; a bit is sampled
+                     on the rising scl edge and counts once scl falls; 'z'
+                     on the open-drain lines reads as released (high)
+  mesi  clk, grant, valid, cmd, addr, shared, dirty
+                     snooping MESI bus: BusRd / BusInv / BusWB with master,
+                     snoop response and data supplier; with the mesi[i] /
+                     tag[i] arrays of the caches in the dump, every state
+                     change of every line of every cache, by line address
+
+A decoder is a `ProtocolDecoder` subclass registered with
+`@register_decoder`; modules listed in FAULTTRACE_VCD_DECODERS are imported
+on first use so site-specific decoders plug in without touching this file.
+Roles are bound explicitly ({"scl": "top.intf.scl", ...}) or found by leaf
+name under a scope.
+
+CONFIGURATION
+─────────────
+  FAULTTRACE_VCD_DECODERS        comma separated modules defining extra decoders
+                                 (default: none)
+  FAULTTRACE_VCD_MESI_STATES     encoding of the MESI state arrays
+                                 (default: M=3,E=2,S=1,I=0)
+  FAULTTRACE_VCD_MESI_COMMANDS   encoding of the bus command
+                                 (default: BusRd=1,BusInv=2,BusWB=3)
+"""
+
+from __future__ import annotations
+
+import bisect
+import importlib
+import os
+import re
+from array import array
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Type
+
+import numpy as np
+
+from vcd_store import Waveform
+
+
+VCD_DECODERS = [m.strip() for m in os.getenv("FAULTTRACE_VCD_DECODERS", "").split(",") if m.strip()]
+
+
+@dataclass
+class Transaction:
+    start:  int
+    end:    int
+    fields: Dict[str, str]      # printable values, in display order
+
+
+# ── Framework ─────────────────────────────────────────────────────────────────
+
+class ProtocolDecoder:
+    """
+    Base of the decoders.  `step` is called once per change time with the
+    settled value of every bound role, in binding order (None before its first
+    change), and which roles changed at that time; decoded events go to
+    `transactions`, in any order.
+    """
+
+    name: str = ""
+    roles: Tuple[str, ...] = ()
+    aliases: Dict[str, Tuple[str, ...]] = {}      # role -> leaf names it is found by
+
+    def __init__(self, bindings: Dict[str, str], widths: Dict[str, int]) -> None:
+        self.bindings = bindings                  # role -> signal, roles beyond `roles` allowed
+        self.widths = widths                      # role -> bit width
+        self.transactions: List[Transaction] = []
+        self.notes: Dict[str, str] = {}           # facts about the decoded bus, kept with the log
+
+    @classmethod
+    def bind(cls, signals: Optional[Dict[str, str]], candidates: Iterable[str]) -> Dict[str, str]:
+        """{role: signal} to decode; a decoder with a variable number of signals adds its own roles."""
+        return bind_roles(cls, signals, candidates)
+
+    def step(self, t: int, values: List[Optional[str]], changed: List[bool]) -> None:
+        raise NotImplementedError
+
+    def finish(self, end: int) -> None:
+        """Called once after the last change; `end` is the last tick of the dump."""
+
+
+DECODERS: Dict[str, Type[ProtocolDecoder]] = {}
+_PLUGINS_LOADED = False
+
+
+def register_decoder(cls: Type[ProtocolDecoder]) -> Type[ProtocolDecoder]:
+    """Class decorator making a decoder available by its `name`."""
+    DECODERS[cls.name] = cls
+    return cls
+
+
+def decoder_class(protocol: str) -> Type[ProtocolDecoder]:
+    """Registered decoder of a protocol; KeyError when there is none."""
+    global _PLUGINS_LOADED
+    if not _PLUGINS_LOADED:
+        for module in VCD_DECODERS:
+            importlib.import_module(module)
+        _PLUGINS_LOADED = True
+    return DECODERS[protocol.lower()]
+
+
+def bind_roles(cls: Type[ProtocolDecoder], signals: Optional[Dict[str, str]], candidates: Iterable[str]) -> Dict[str, str]:
+    """
+    {role: signal} of a decoder: the explicit `signals` first, the other roles
+    by leaf name among `candidates`.  ValueError when a role is missing or ambiguous.
+    """
+    bound = {r: s for r, s in (signals or {}).items() if r in cls.roles}
+    unknown = sorted(set(signals or {}) - set(cls.roles))
+    if unknown:
+        raise ValueError(f"{cls.name} has no role {unknown}, its roles are {list(cls.roles)}")
+    missing = [r for r in cls.roles if r not in bound]
+    if missing:
+        by_leaf: Dict[str, List[str]] = {}
+        for n in candidates:
+            by_leaf.setdefault(re.sub(r"\[[^\]]*\]$", "", n.rpartition(".")[2]).lower(), []).append(n)
+        for role in missing:
+            found = [n for leaf in cls.aliases.get(role, (role,)) for n in by_leaf.get(leaf, ())]
+            if len(found) > 1:
+                # the same name at several levels: the bus is the one nearest the top
+                depth = min(n.count(".") for n in found)
+                if sum(1 for n in found if n.count(".") == depth) == 1:
+                    found = [n for n in found if n.count(".") == depth]
+            if len(found) != 1:
+                what = "no signal" if not found else f"several signals {found[:5]}"
+                raise ValueError(f"{what} for the {cls.name} role '{role}', pass it in signals or narrow the scope")
+            bound[role] = found[0]
+    return {r: bound[r] for r in cls.roles}
+
+
+def _key(value: Any) -> Any:
+    """Comparison key of a field value: numbers by value (0x50 == 80), text without case."""
+    text = str(value).strip()
+    try:
+        return int(text, 0)
+    except ValueError:
+        return text.lower()
+
+
+class TransactionLog:
+    """Decoded transactions of one dump, by start time, with lazy per-field indexes."""
+
+    def __init__(self, protocol: str, bindings: Dict[str, str], items: List[Transaction],
+                 notes: Optional[Dict[str, str]] = None) -> None:
+        self.protocol = protocol
+        self.bindings = bindings
+        self.items = items
+        self.notes = notes or {}
+        self.starts = array("q", [tx.start for tx in items])
+        self._index: Dict[str, Dict[Any, List[int]]] = {}
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def lookup(self, field: str, value: Any) -> List[int]:
+        """Positions of the transactions whose `field` equals `value`."""
+        idx = self._index.get(field)
+        if idx is None:
+            idx = {}
+            for i, tx in enumerate(self.items):
+                if field in tx.fields:
+                    idx.setdefault(_key(tx.fields[field]), []).append(i)
+            self._index[field] = idx
+        return idx.get(_key(value), [])
+
+    def select(self, start: Optional[int] = None, end: Optional[int] = None,
+               where: Sequence[Tuple[str, str]] = ()) -> List[int]:
+        """Positions of the transactions starting in [start, end] that match every (field, value)."""
+        lo = 0 if start is None else bisect.bisect_left(self.starts, start)
+        hi = len(self.items) if end is None else bisect.bisect_right(self.starts, end)
+        if not where:
+            return list(range(lo, hi))
+        hits = None
+        for field, value in where:
+            pos = set(self.lookup(field, value))
+            hits = pos if hits is None else hits & pos
+        return sorted(i for i in hits if lo <= i < hi)
+
+
+def decode_transactions(wf: Waveform, protocol: str, bindings: Dict[str, str]) -> TransactionLog:
+    """Transactions of a protocol on the bound signals, decoded once per dump and binding."""
+    cls = decoder_class(protocol)
+    key = "transactions:" + cls.name + ":" + ",".join(f"{r}={n}" for r, n in bindings.items())
+    log = wf.memo.get(key)
+    if log is not None:
+        return log
+
+    names = list(bindings.values())
+    wf.prefetch(names)
+    traces = [wf[n] for n in names]
+    times = np.concatenate([np.asarray(tr.times, dtype=np.int64) for tr in traces])
+    roles = np.repeat(np.arange(len(traces)), [len(tr) for tr in traces])
+    ids = np.concatenate([np.asarray(tr.ids, dtype=np.int64) for tr in traces])
+    order = np.argsort(times, kind="stable")
+
+    dec = cls(dict(bindings), {r: wf.header.vars[n].width for r, n in bindings.items()})
+    values: List[Optional[str]] = [None] * len(traces)
+    changed = [False] * len(traces)
+    cur = None
+    for t, r, v in zip(times[order].tolist(), roles[order].tolist(), ids[order].tolist()):
+        if t != cur:
+            if cur is not None:
+                dec.step(cur, values, changed)
+                changed = [False] * len(traces)
+            cur = t
+        values[r] = traces[r].strings[v]
+        changed[r] = True
+    if cur is not None:
+        dec.step(cur, values, changed)
+    dec.finish(wf.end_time)
+    items = sorted(dec.transactions, key=lambda tx: tx.start)
+    return wf.memo.setdefault(key, TransactionLog(cls.name, dict(bindings), items, dec.notes))
+
+
+# ── I2C ───────────────────────────────────────────────────────────────────────
+
+def _line(value: Optional[str]) -> Optional[int]:
+    """Open-drain line level: '0' low, '1' or 'z' (released) high, None unknown."""
+    if value is None:
+        return None
+    v = value.lower()
+    return 0 if v == "0" else 1 if v in ("1", "z") else None
+
+
+@register_decoder
+class I2CDecoder(ProtocolDecoder):
+    """
+    I2C transfers: fields addr, rw (W/R), ack (of the address byte), data
+    (hex bytes), data_ack (A/N per byte), nack (yes when the address or a
+    written byte was not acknowledged; the master NACK ending a read is
+    normal) and end (stop, restart, or none when the dump ends first).
+    """
+
+    name = "i2c"
+    roles = ("scl", "sda")
+    aliases = {"scl": ("scl", "i2c_scl", "scl_io", "scl_i", "scl_pad"),
+               "sda": ("sda", "i2c_sda", "sda_io", "sda_i", "sda_pad")}
+
+    def __init__(self, bindings: Dict[str, str], widths: Dict[str, int]) -> None:
+        super().__init__(bindings, widths)
+        self._scl: Optional[int] = None
+        self._sda: Optional[int] = None
+        self._open: Optional[int] = None        # start tick of the transfer in progress
+        self._bit: Optional[int] = -1           # sda sampled on the last rising scl, -1 none
+        self._bits: List[Optional[int]] = []
+        self._bytes: List[Optional[int]] = []
+        self._acks: List[Optional[int]] = []
+
+    def step(self, t: int, values: List[Optional[str]], changed: List[bool]) -> None:
+        scl, sda = _line(values[0]), _line(values[1])
+        if self._scl == 1 and scl == 1 and changed[1] and not changed[0]:
+            if self._sda == 1 and sda == 0:
+                if self._open is not None:
+                    self._close(t, "restart")
+                self._open = t
+            elif self._sda == 0 and sda == 1 and self._open is not None:
+                self._close(t, "stop")
+        elif self._scl == 0 and scl == 1 and self._open is not None:
+            self._bit = sda
+        elif self._scl == 1 and scl == 0 and self._bit != -1:
+            # a bit counts once scl falls again: the high phase before a STOP / repeated START is not one
+            if len(self._bits) < 8:
+                self._bits.append(self._bit)
+            else:
+                bits = self._bits
+                self._bytes.append(None if None in bits else int("".join(map(str, bits)), 2))
+                self._acks.append(self._bit)
+                self._bits = []
+            self._bit = -1
+        self._scl, self._sda = scl, sda
+
+    def finish(self, end: int) -> None:
+        if self._open is not None:
+            self._close(end, "none")
+
+    def _close(self, t: int, how: str) -> None:
+        f: Dict[str, str] = {}
+        data, acks = self._bytes, self._acks
+
+        def ack(a: Optional[int]) -> str:
+            return "ACK" if a == 0 else "NACK" if a == 1 else "X"
+
+        if data:
+            first = data[0]
+            f["addr"] = "0x??" if first is None else f"0x{first >> 1:02x}"
+            f["rw"] = "?" if first is None else "R" if first & 1 else "W"
+            f["ack"] = ack(acks[0])
+            f["data"] = " ".join("??" if b is None else f"{b:02x}" for b in data[1:])
+            f["data_ack"] = " ".join(ack(a)[0] for a in acks[1:])
+            written = acks[1:] if f["rw"] != "R" else []
+            f["nack"] = "yes" if acks[0] != 0 or any(a != 0 for a in written) else "no"
+        else:
+            f["addr"] = "-"
+            f["nack"] = "no"
+        if self._bits:
+            f["partial"] = f"{len(self._bits)} bits"
+        f["end"] = how
+        self.transactions.append(Transaction(self._open, t, f))
+        self._open = None
+        self._bit = -1
+        self._bits, self._bytes, self._acks = [], [], []
+
+
+# ── MESI snooping bus ─────────────────────────────────────────────────────────
+
+def _encoding(spec: str) -> Dict[int, str]:
+    """'M=3,E=2' -> {3: 'M', 2: 'E'}."""
+    out: Dict[int, str] = {}
+    for item in spec.split(","):
+        label, _, value = item.partition("=")
+        if value.strip():
+            out[int(value.strip(), 0)] = label.strip()
+    return out
+
+
+MESI_STATES = _encoding(os.getenv("FAULTTRACE_VCD_MESI_STATES", "M=3,E=2,S=1,I=0"))
+MESI_COMMANDS = _encoding(os.getenv("FAULTTRACE_VCD_MESI_COMMANDS", "BusRd=1,BusInv=2,BusWB=3"))
+
+_ELEMENT = re.compile(r"(\w+)(?:\[(\d+)\]|\((\d+)\))(?:\[\d+:\d+\])?")     # mesi[3][1:0], mesi(3)
+_STATE_ARRAYS = ("mesi", "mesi_state", "coh_state", "line_state")
+
+
+def _int(value: Optional[str]) -> Optional[int]:
+    """Integer of a binary VCD value, None when it holds x/z or is not set yet."""
+    try:
+        return None if value is None else int(value, 2)
+    except ValueError:
+        return None
+
+
+def _natural(text: str) -> List[Any]:
+    return [int(p) if p.isdigit() else p for p in re.split(r"(\d+)", text)]
+
+
+@register_decoder
+class MESIDecoder(ProtocolDecoder):
+    """
+    Transactions of a snooping MESI bus and the coherence state of every
+    cache line.  A command is sampled on the rising clock edge (the values
+    just before it), where its transaction starts, and its snoop response,
+    the merged shared / dirty lines, one edge later, where it ends.  Bus
+    fields: event (BusRd, BusInv, BusWB), line, addr, cache (the granted
+    master), snoop (none, shared, dirty) and, for a read, data (memory or
+    the cache that held the line Modified).  With the state and tag arrays
+    of the caches in the dump (mesi[i] and tag[i] under each cache scope)
+    every state change is an event too: event=state, line, cache, from,
+    to; a line replaced without a bus transaction shows as its silent
+    eviction to I.
+    """
+
+    name = "mesi"
+    roles = ("clk", "grant", "valid", "cmd", "addr", "shared", "dirty")
+    aliases = {"clk": ("clk", "clock"),
+               "grant": ("bus_grant", "grant", "gnt"),
+               "valid": ("bus_valid", "bus_valid_w"),
+               "cmd": ("bus_cmd", "bus_cmd_w"),
+               "addr": ("bus_addr", "bus_addr_w"),
+               "shared": ("snoop_shared_any", "bus_shared_any", "shared_any"),
+               "dirty": ("snoop_dirty_any", "bus_dirty_any", "dirty_any")}
+
+    @classmethod
+    def bind(cls, signals: Optional[Dict[str, str]], candidates: Iterable[str]) -> Dict[str, str]:
+        """The bus roles, plus 'state:<cache scope>:<i>' / 'tag:<cache scope>:<i>' for every line found."""
+        candidates = list(candidates)
+        bound = bind_roles(cls, signals, candidates)
+        arrays: Dict[Tuple[str, str], Dict[int, str]] = {}
+        for n in candidates:
+            scope, _, leaf = n.rpartition(".")
+            m = _ELEMENT.fullmatch(leaf)
+            if m:
+                arrays.setdefault((scope, m.group(1).lower()), {})[int(m.group(2) or m.group(3))] = n
+        for (scope, kind), states in sorted(arrays.items(), key=lambda a: _natural(a[0][0])):
+            tags = arrays.get((scope, "tag"))
+            if kind in _STATE_ARRAYS and tags and set(tags) == set(states):
+                for i in sorted(states):
+                    bound[f"state:{scope}:{i}"] = states[i]
+                    bound[f"tag:{scope}:{i}"] = tags[i]
+        return bound
+
+    def __init__(self, bindings: Dict[str, str], widths: Dict[str, int]) -> None:
+        super().__init__(bindings, widths)
+        roles = list(bindings)
+        self._pos = {r: k for k, r in enumerate(roles)}
+        scopes: List[str] = []
+        lines: Dict[int, Tuple[str, int, int]] = {}         # state role position -> (scope, index, tag position)
+        for k, r in enumerate(roles):
+            kind, _, rest = r.partition(":")
+            if kind == "state":
+                scope, _, i = rest.rpartition(":")
+                if scope not in scopes:
+                    scopes.append(scope)
+                lines[k] = (scope, int(i), self._pos["tag:" + rest])
+        leaves = [sc.rpartition(".")[2] for sc in scopes]
+        label = dict(zip(scopes, leaves if len(set(leaves)) == len(leaves) else scopes))
+        self._lines = {k: (label[sc], i, tp) for k, (sc, i, tp) in lines.items()}
+        caches = [label[sc] for sc in scopes]
+        # grant bit k is the k-th cache when there is one cache scope per grant bit
+        self._masters = caches if len(caches) == widths["grant"] else [f"master{k}" for k in range(widths["grant"])]
+
+        self._index_bits = max((i for _, i, _ in self._lines.values()), default=0).bit_length()
+        tag_bits = next((widths[roles[tp]] for _, _, tp in self._lines.values()), 0)
+        self._offset = max(widths["addr"] - tag_bits - self._index_bits, 0) if self._lines else 0
+        self.notes = {"caches": ", ".join(caches), "offset_bits": str(self._offset)}
+
+        self._held: Dict[Tuple[str, int], Tuple[Optional[str], Optional[int]]] = {}   # (cache, index) -> (state, tag)
+        self._prev: List[Optional[str]] = [None] * len(roles)
+        self._pending: Optional[Tuple[Transaction, List[str]]] = None     # command waiting for its response
+
+    def _line(self, index: int, tag: Optional[int]) -> str:
+        if tag is None:
+            return "?"
+        return f"0x{(tag << self._index_bits | index) << self._offset:02x}"
+
+    def step(self, t: int, values: List[Optional[str]], changed: List[bool]) -> None:
+        pos, prev = self._pos, self._prev
+        if changed[pos["clk"]] and prev[pos["clk"]] == "0" and values[pos["clk"]] == "1":
+            self._edge(t, prev)
+        for k, (cache, i, tp) in self._lines.items():
+            if changed[k] or changed[tp]:
+                self._state_change(t, cache, i, MESI_STATES.get(_int(values[k])), _int(values[tp]))
+        self._prev = list(values)
+
+    def _edge(self, t: int, prev: List[Optional[str]]) -> None:
+        pos = self._pos
+        if self._pending is not None:
+            tx, owners = self._pending
+            f = tx.fields
+            shared, dirty = _int(prev[pos["shared"]]), _int(prev[pos["dirty"]])
+            f["snoop"] = "dirty" if dirty else "shared" if shared else "none" if shared == 0 else "?"
+            if f["event"] == MESI_COMMANDS.get(1, "BusRd"):
+                f["data"] = ("/".join(owners) or "a cache") if dirty else "memory"
+            tx.end = t
+            self._pending = None
+        if _int(prev[pos["valid"]]) == 1:
+            code, addr, grant = _int(prev[pos["cmd"]]), _int(prev[pos["addr"]]), _int(prev[pos["grant"]])
+            line = "?" if addr is None else f"0x{addr >> self._offset << self._offset:02x}"
+            if grant and grant & (grant - 1) == 0 and grant.bit_length() <= len(self._masters):
+                master = self._masters[grant.bit_length() - 1]
+            else:
+                master = "none" if grant == 0 else "?"
+            f = {"event": MESI_COMMANDS.get(code, f"cmd {prev[pos['cmd']]}") if code is not None else "?",
+                 "line": line, "addr": "?" if addr is None else f"0x{addr:02x}", "cache": master}
+            # the caches holding the line Modified before this edge supply its data
+            owners = [c for (c, i), (st, tag) in self._held.items() if st == "M" and c != master and self._line(i, tag) == line]
+            # logged at the sampling edge, ahead of the state changes it causes there
+            self._pending = (Transaction(t, t, f), owners)
+            self.transactions.append(self._pending[0])
+
+    def _state_change(self, t: int, cache: str, i: int, state: Optional[str], tag: Optional[int]) -> None:
+        old, old_tag = self._held.get((cache, i), (None, None))
+        self._held[(cache, i)] = (state, tag if state != "I" or old_tag is None else old_tag)
+        if old is None or state is None:
+            return
+        if old != "I" and state != "I" and tag != old_tag:
+            # another line took the place: the old one left without a bus transaction
+            self._event(t, cache, self._line(i, old_tag), old, "I")
+            self._event(t, cache, self._line(i, tag), "I", state)
+        elif state != old:
+            self._event(t, cache, self._line(i, tag if state != "I" else old_tag), old, state)
+
+    def _event(self, t: int, cache: str, line: str, old: str, new: str) -> None:
+        self.transactions.append(Transaction(t, t, {"event": "state", "line": line, "cache": cache, "from": old, "to": new}))
+
+    def finish(self, end: int) -> None:
+        if self._pending is not None:
+            tx, _ = self._pending
+            tx.fields["snoop"] = "?"
+            tx.end = end
@@ -0,0 +1,1369 @@
+"""
+vcd_store.py
+────────────
+Parsed-waveform store shared by every `vcd_*` tool of the RTL_Toolbox server.
+
+THE PROBLEM
+───────────
+Each tool used to build a fresh `VCDVCD(path, store_tvs=True)` on every call,
+loading the value changes of every signal in the design.
+A debug session issues dozens of waveform queries against the same dump, so a
+multi-GB VCD was re-parsed once per question.
+
+THIS SOLUTION
+─────────────
+A process-wide LRU cache of parsed waveforms keyed by (path, size, mtime, kind).
+Only the first call for a given dump pays the parse cost; a rewritten dump
+gets a new key and the stale entry is dropped.  Entries are evicted, least
+recently used first, once the estimated resident size goes over a memory
+budget.
+
+SELECTIVE PARSING
+─────────────────
+Without a sidecar, a dump is opened header-first and a signal's changes are
+only read when a tool asks for it, in one streaming pass that keeps just the
+requested identifier codes.
+
+HEADER FAST PATH
+────────────────
+Metadata tools (timescale, signal lists) only need the declaration section.
+`scan_header` reads up to `$enddefinitions` and stops, so their cost does not
+depend on how many value changes follow.
+
+SIDECAR INDEX
+─────────────
+`build_index` turns a VCD into a `<dump>.vcd.ftidx` sidecar: per-signal sorted
+int64 timestamp arrays and compact value-id arrays, plus a global event stream
+with periodic full-state checkpoints for "every signal at time t" lookups,
+the X/Z history of every signal (first X/Z, last X/Z run) for
+uninitialised-state questions, an activity pyramid per signal and a
+per-signal statistics table.
+When a fresh sidecar is present, `load_waveform` memory-maps it instead of
+parsing the VCD, so a re-opened debug session starts in milliseconds with
+almost no RSS.
+
+RANDOM TIME ACCESS
+──────────────────
+Point and window queries on a large text dump (no sidecar, trace not yet
+loaded) do not read the whole file: the VCD is memory-mapped and a sparse
+`#<time>` -> byte offset index lets the parser seek straight to the window.
+`events_between` reads every change of a time range the same way, or as one
+slice of the sidecar event stream.
+
+ACTIVITY PYRAMID
+────────────────
+The time range of a dump is cut into FAULTTRACE_VCD_PYRAMID_BUCKETS buckets,
+and each coarser level merges 4 buckets of the one below, up to a single
+bucket.  Per signal and level only the buckets where the signal changed are
+kept: change count, lowest and highest value and last value (a bucket
+without changes holds the last value of the one before).  "Where is this
+scope busy" is then answered from a few thousand numbers per signal whatever
+the dump size.  The sidecar stores it; a text dump builds it per signal on
+first use.
+
+COMPRESSED DUMPS
+────────────────
+A .vcd.gz / .vcd.bz2 / .vcd.zst dump is read through `vcd_compress`: the
+header scan, the selective parse and the indexer stream its decompressed text
+and its sidecar is built next to it.  Random time access needs a framed dump
+(BGZF or zstd seekable); other compressed dumps are read front to back.
+
+SIGNAL STATISTICS
+─────────────────
+The indexer also records one row per signal: value changes, first and last
+change, distinct values, time spent at X/Z and final value.  "The busiest
+signals of a scope" or "the signals that never toggled" is then a read of the
+sidecar meta, not a parse of every trace.  Without a sidecar the table is
+computed once per dump, from every trace, on first use.
+
+CONFIGURATION
+─────────────
+  FAULTTRACE_VCD_CACHE_MB          memory budget of the cache in MB (default 2048)
+  FAULTTRACE_VCD_WINDOW_MB         text dumps above this size use windowed reads (default 256)
+  FAULTTRACE_VCD_OFFSET_STRIDE_KB  spacing of the time -> offset index probes (default 1024)
+  FAULTTRACE_VCD_CHECKPOINT_TICKS  sidecar full-state checkpoint interval (default 0 = automatic)
+  FAULTTRACE_VCD_PYRAMID_BUCKETS   finest level of the activity pyramid, in buckets (default 4096)
+"""
+
+from __future__ import annotations
+
+import bisect
+import io
+import json
+import mmap
+import os
+import re
+import struct
+import sys
+import threading
+from array import array
+from collections import OrderedDict
+from dataclasses import astuple, dataclass, field
+from fractions import Fraction
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+from vcd_compress import FrameReader, compression, frame_index, open_dump
+
+
+# ── Configuration ──────────────────────────────────────────────────────────────
+
+VCD_CACHE_MB = int(os.getenv("FAULTTRACE_VCD_CACHE_MB", "2048"))
+VCD_WINDOW_MB = int(os.getenv("FAULTTRACE_VCD_WINDOW_MB", "256"))
+VCD_OFFSET_STRIDE_KB = int(os.getenv("FAULTTRACE_VCD_OFFSET_STRIDE_KB", "1024"))
+VCD_CHECKPOINT_TICKS = int(os.getenv("FAULTTRACE_VCD_CHECKPOINT_TICKS", "0"))
+VCD_PYRAMID_BUCKETS = int(os.getenv("FAULTTRACE_VCD_PYRAMID_BUCKETS", "4096"))
+
+# Below this many signals, per-signal bisects beat a full-state checkpoint lookup
+_STATE_LOOKUP_MIN = 64
+
+
+# ── Cache keys ─────────────────────────────────────────────────────────────────
+
+FileKey = Tuple[str, int, int]
+
+
+def file_key(path: str) -> FileKey:
+    """Identity of a dump on disk: (absolute path, size, mtime in ns)."""
+    st = os.stat(path)
+    return os.path.abspath(path), st.st_size, st.st_mtime_ns
+
+
+# ── LRU cache ──────────────────────────────────────────────────────────────────
+
+class WaveformCache:
+    """
+    LRU cache of parsed waveforms bounded by an estimated memory budget.
+
+    `get_or_load` is the only entry point tools need: it returns the cached
+    object for `key` or calls `loader()` and keeps the result if it fits.
+    """
+
+    def __init__(self, budget_bytes: int) -> None:
+        self.budget_bytes = budget_bytes
+        self._entries: "OrderedDict[Any, Tuple[Any, int]]" = OrderedDict()
+        self._lock = threading.RLock()
+        self.resident_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.oversize = 0
+
+    def get_or_load(self, key: Any, loader: Callable[[], Any], sizer: Callable[[Any], int]) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+            self._drop_stale(key)
+
+        obj = loader()
+        nbytes = sizer(obj)
+
+        with self._lock:
+            if nbytes > self.budget_bytes:
+                # Would evict everything and still not fit: serve it uncached
+                self.oversize += 1
+                return obj
+            self._entries[key] = (obj, nbytes)
+            self.resident_bytes += nbytes
+            self._evict()
+        return obj
+
+    def resize(self, key: Any, nbytes: int) -> None:
+        """Record that a cached entry grew (lazily loaded waveforms) and evict if needed."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+            self._entries[key] = (entry[0], nbytes)
+            self.resident_bytes += nbytes - entry[1]
+            self._entries.move_to_end(key)
+            self._evict()
+
+    def drop_path(self, path: str) -> None:
+        """Forget every entry derived from `path` (e.g. after re-indexing it)."""
+        path = os.path.abspath(path)
+        with self._lock:
+            for k in [k for k in self._entries if isinstance(k, tuple) and k[0] == path]:
+                _, nbytes = self._entries.pop(k)
+                self.resident_bytes -= nbytes
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.resident_bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries":        len(self._entries),
+                "resident_bytes": self.resident_bytes,
+                "budget_bytes":   self.budget_bytes,
+                "hits":           self.hits,
+                "misses":         self.misses,
+                "evictions":      self.evictions,
+                "oversize":       self.oversize,
+                "keys":           [k for k in self._entries],
+            }
+
+    def _drop_stale(self, key: Any) -> None:
+        """A dump that was rewritten on disk keeps its path but not its (size, mtime)."""
+        if not isinstance(key, tuple) or len(key) < 3:
+            return
+        path, stamp = key[0], key[1:3]
+        for k in [k for k in self._entries if isinstance(k, tuple) and k[0] == path and k[1:3] != stamp]:
+            _, nbytes = self._entries.pop(k)
+            self.resident_bytes -= nbytes
+
+    def _evict(self) -> None:
+        while self.resident_bytes > self.budget_bytes and self._entries:
+            _, (_, nbytes) = self._entries.popitem(last=False)
+            self.resident_bytes -= nbytes
+            self.evictions += 1
+
+
+CACHE = WaveformCache(VCD_CACHE_MB * 1024 * 1024)
+
+
+# ── Header scanner ─────────────────────────────────────────────────────────────
+
+@dataclass
+class VarDef:
+    """One `$var` declaration, named the way vcdvcd names it (scope.path.ref)."""
+    name:  str
+    code:  str
+    width: int
+    kind:  str
+
+
+@dataclass
+class VcdHeader:
+    """Everything declared before `$enddefinitions`."""
+    magnitude:   int = 1
+    unit:        str = "s"
+    scopes:      Dict[str, str]       = field(default_factory=dict)   # full name -> scope type
+    vars:        Dict[str, VarDef]    = field(default_factory=dict)   # in declaration order
+    codes:       Dict[str, List[str]] = field(default_factory=dict)   # id code -> aliased names
+    data_offset: int = 0                                              # first byte after the header
+
+    @property
+    def signals(self) -> List[str]:
+        return list(self.vars)
+
+    @property
+    def timescale_str(self) -> str:
+        return f"{self.magnitude}{self.unit}"
+
+    @property
+    def tick_seconds(self) -> Fraction:
+        return self.magnitude * Fraction(10) ** (_UNIT_EXP[self.unit] - 15)
+
+
+def _parse_timescale(text: str) -> Tuple[int, str]:
+    m = re.match(r"^\s*(\d+)\s*([a-z]+)\s*$", text.lower())
+    if not m or m.group(2) not in ("s", "ms", "us", "ns", "ps", "fs"):
+        raise ValueError(f"Unsupported VCD timescale: '{text}'")
+    return int(m.group(1)), m.group(2)
+
+
+def scan_header(path: str) -> VcdHeader:
+    """
+    Parse the declaration section of a VCD and stop at `$enddefinitions`.
+
+    Declarations may span several lines (`$timescale`, `1ps` and `$end` on
+    lines of their own), so tokens are grouped per `$keyword ... $end` block
+    rather than per line.
+    """
+    hdr = VcdHeader()
+    hier: List[str] = []
+    block: List[str] = []
+    offset = 0
+    with open_dump(path) as f:
+        for raw in f:
+            offset += len(raw)
+            for tok in raw.decode("ascii", "replace").split():
+                if not block:
+                    if tok.startswith("$"):
+                        block.append(tok)
+                    continue
+                if tok != "$end":
+                    block.append(tok)
+                    continue
+                cmd, args = block[0], block[1:]
+                block = []
+                if cmd == "$var" and len(args) >= 4:
+                    ref = "".join(args[3:])
+                    name = ".".join(hier + [ref]) if hier else ref
+                    hdr.vars[name] = VarDef(name, args[2], int(args[1]), args[0])
+                    hdr.codes.setdefault(args[2], []).append(name)
+                elif cmd == "$scope" and len(args) >= 2:
+                    hier.append(args[1])
+                    hdr.scopes[".".join(hier)] = args[0]
+                elif cmd == "$upscope":
+                    if hier:
+                        hier.pop()
+                elif cmd == "$timescale":
+                    hdr.magnitude, hdr.unit = _parse_timescale("".join(args))
+                elif cmd == "$enddefinitions":
+                    hdr.data_offset = offset
+                    return hdr
+    hdr.data_offset = offset
+    return hdr
+
+
+# ── Time engine ────────────────────────────────────────────────────────────────
+#
+# Every trace stores integer ticks of the dump's timescale.  User times are
+# converted to ticks once per query with exact rational arithmetic, so
+# "12.5ns" on a 1ps dump is exactly 12500 ticks, never 12499.999...
+
+_UNIT_EXP = {"s": 15, "ms": 12, "us": 9, "ns": 6, "ps": 3, "fs": 0}   # power of ten of 1fs
+_TIME_RE  = re.compile(r"^\s*([0-9]*\.?[0-9]+(?:[eE][-+]?[0-9]+)?)\s*([a-zA-Z]*)\s*$")
+
+
+def time_to_ticks(t: Union[str, float, int], header: VcdHeader) -> Fraction:
+    """
+    Exact tick count of a user time in the timescale of `header`.
+
+    Bare numbers (1200, 1200.0, "1200") are already ticks; a value with a
+    unit ("12.5ns", "3us", "1e-9s") is an absolute time.
+    """
+    if isinstance(t, bool):
+        raise ValueError(f"Invalid time '{t}'")
+    if isinstance(t, int):
+        return Fraction(t)
+    if isinstance(t, float):
+        return Fraction(repr(t))
+    m = _TIME_RE.match(str(t))
+    if not m:
+        raise ValueError(f"Invalid time '{t}'")
+    val, unit = Fraction(m.group(1)), m.group(2).lower()
+    if not unit:
+        return val
+    if unit not in _UNIT_EXP:
+        raise ValueError(f"Unknown time unit '{unit}' in '{t}'")
+    return val * Fraction(10) ** (_UNIT_EXP[unit] - _UNIT_EXP[header.unit]) / header.magnitude
+
+
+# ── Signal traces ──────────────────────────────────────────────────────────────
+
+class SignalTrace:
+    """
+    Value changes of one signal as two parallel arrays.
+
+    `times` holds integer ticks in ascending order and supports `bisect`;
+    `ids[i]` indexes `strings`, the value table shared by the whole dump.
+    Both arrays are either in-memory `array`s or memoryviews over a sidecar.
+    """
+
+    __slots__ = ("times", "ids", "strings", "width")
+
+    def __init__(self, times: Sequence[int], ids: Sequence[int], strings: Sequence[str], width: int = 1) -> None:
+        self.times   = times
+        self.ids     = ids
+        self.strings = strings
+        self.width   = width
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    def value(self, i: int) -> str:
+        return self.strings[self.ids[i]]
+
+    @property
+    def tv(self) -> List[Tuple[int, str]]:
+        """vcdvcd-style [(time, value), ...]; materialises the whole trace."""
+        return [(self.times[i], self.value(i)) for i in range(len(self.times))]
+
+
+def _trace_from_pairs(pairs: List[Tuple[int, str]], width: int) -> SignalTrace:
+    pool: Dict[str, int] = {}
+    strings: List[str] = []
+    ids = array("I")
+    for _, v in pairs:
+        vid = pool.get(v)
+        if vid is None:
+            vid = pool[v] = len(strings)
+            strings.append(v)
+        ids.append(vid)
+    return SignalTrace(array("q", [t for t, _ in pairs]), ids, strings, width)
+
+
+def _lead_index(times: Sequence[int], start: int) -> int:
+    """Index of the last change strictly before `start`, or of the first change if there is none."""
+    return max(bisect.bisect_left(times, start) - 1, 0)
+
+
+def _slice_trace(tr: SignalTrace, start: Optional[int], end: Optional[int]) -> SignalTrace:
+    """Changes in [start, end], led by the last change before `start` (if any)."""
+    lo = 0 if start is None else _lead_index(tr.times, start)
+    hi = len(tr) if end is None else bisect.bisect_right(tr.times, end)
+    hi = max(lo, hi)
+    if lo == 0 and hi == len(tr):
+        return tr
+    return SignalTrace(tr.times[lo:hi], tr.ids[lo:hi], tr.strings, tr.width)
+
+
+class Waveform:
+    """
+    Read-only view of a dump shared by all `vcd_*` tools.
+
+    Subclasses provide `_load_trace(code)`; traces are built once per
+    identifier code and shared by every aliased name.
+    """
+
+    def __init__(self, header: VcdHeader) -> None:
+        self.header = header
+        self._traces: Dict[str, SignalTrace] = {}
+        self._xz: Optional[Dict[str, Tuple[int, int, int]]] = None
+        self._stats: Optional[Dict[str, SignalStats]] = None
+        self._pyramids: Dict[str, Pyramid] = {}
+        # results derived from this dump by the analysis modules, dropped with it
+        self.memo: Dict[str, Any] = {}
+
+    @property
+    def signals(self) -> List[str]:
+        return self.header.signals
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.header.vars
+
+    def __getitem__(self, name: str) -> SignalTrace:
+        var = self.header.vars.get(name)
+        if var is None:
+            raise KeyError(name)
+        tr = self._traces.get(var.code)
+        if tr is None:
+            tr = self._traces[var.code] = self._load_trace(var.code)
+        return tr
+
+    def prefetch(self, names: Iterable[str]) -> None:
+        """Hint that `names` are about to be read; backends may load them together."""
+
+    def window(self, names: Iterable[str], start: Optional[int], end: Optional[int]) -> Dict[str, SignalTrace]:
+        """
+        Traces of `names` restricted to [start, end] ticks (None = unbounded).
+
+        Each trace is led by the last change before `start`, so value-at and
+        step/hold lookups inside the window behave as on the full trace.
+        Unknown names are left out of the result.
+        """
+        names = [n for n in names if n in self.header.vars]
+        self.prefetch(names)
+        return {n: _slice_trace(self[n], start, end) for n in names}
+
+    def values_at(self, names: Iterable[str], t: int) -> Dict[str, Optional[str]]:
+        """Value in effect at tick t (last change at or before t) of every known name."""
+        out: Dict[str, Optional[str]] = {}
+        for n, tr in self.window(names, t, t).items():
+            idx = bisect.bisect_right(tr.times, t) - 1
+            out[n] = tr.value(idx) if idx >= 0 else None
+        return out
+
+    def run_summary(self, name: str) -> Optional[Tuple[Sequence[int], int, int]]:
+        """Precomputed (run start positions, shortest run, longest run) of a signal, if indexed."""
+        return None
+
+    def events_between(self, start: int, end: int) -> EventSlice:
+        """Every change of every signal in [start, end] ticks, in time order."""
+        raise NotImplementedError
+
+    def signal_stats(self) -> Dict[str, SignalStats]:
+        """{code: SignalStats} of every identifier code.  Loads every trace once."""
+        if self._stats is None:
+            self.prefetch(self.signals)
+            xz_by_table: Dict[int, set] = {}
+            stats = {}
+            for code, names in self.header.codes.items():
+                tr = self[names[0]]
+                xz = xz_by_table.get(id(tr.strings))
+                if xz is None:
+                    xz = xz_by_table[id(tr.strings)] = _xz_ids(tr.strings)
+                stats[code] = _signal_stats(tr.times, tr.ids, xz, self.end_time)
+            self._stats = stats
+        return self._stats
+
+    def xz_spans(self) -> Dict[str, Tuple[int, int, int]]:
+        """
+        {code: (first X/Z time, start of the last X/Z run, time it became fully known or -1)}
+        of every identifier code that ever held an X or Z.  Loads every trace once.
+        """
+        if self._xz is None:
+            self.prefetch(self.signals)
+            xz_by_table: Dict[int, set] = {}
+            spans = {}
+            for code, names in self.header.codes.items():
+                tr = self[names[0]]
+                xz = xz_by_table.get(id(tr.strings))
+                if xz is None:
+                    xz = xz_by_table[id(tr.strings)] = _xz_ids(tr.strings)
+                span = _xz_span(tr.times, tr.ids, xz)
+                if span[0] >= 0:
+                    spans[code] = span
+            self._xz = spans
+        return self._xz
+
+    def pyramid(self, name: str) -> Pyramid:
+        """Activity pyramid of a signal over the whole dump (built from its trace on first use)."""
+        code = self.header.vars[name].code
+        pyr = self._pyramids.get(code)
+        if pyr is None:
+            tr = self[name]
+            pyr = self._pyramids[code] = build_pyramid(tr.times, tr.ids, tr.strings, pyramid_width(self.end_time), self.end_time)
+        return pyr
+
+    def _load_trace(self, code: str) -> SignalTrace:
+        raise NotImplementedError
+
+
+# ── Signal statistics ──────────────────────────────────────────────────────────
+
+@dataclass
+class SignalStats:
+    """
+    Activity of one signal over the whole dump.  Repeated writes of the same
+    value are not changes; the first value a signal takes is not one either.
+    """
+    changes: int        # value changes
+    first:   int        # time of the first change, -1 for none
+    last:    int        # time of the last change, -1 for none
+    values:  int        # distinct values held
+    xz:      int        # ticks spent holding a value with an x or z in it
+    final:   int        # value id held at the end, NO_VALUE for a signal never assigned
+
+
+def _signal_stats(times: Sequence[int], ids: Sequence[int], xz: set, end_time: int,
+                  runs: Optional[Sequence[int]] = None) -> SignalStats:
+    """SignalStats of one trace; `runs` are its run start positions when already known."""
+    if runs is None:
+        runs, _, _ = _run_positions(times, ids, end_time)
+    xz_ticks = 0
+    if xz and not xz.isdisjoint(ids):
+        bounds = [times[i] for i in runs] + [max(end_time, times[-1])]
+        xz_ticks = sum(bounds[r + 1] - bounds[r] for r, i in enumerate(runs) if ids[i] in xz)
+    return SignalStats(max(len(runs) - 1, 0), times[runs[1]] if len(runs) > 1 else -1,
+                       times[runs[-1]] if len(runs) > 1 else -1, len(set(ids)), xz_ticks,
+                       ids[-1] if len(ids) else NO_VALUE)
+
+
+# ── Activity pyramid ───────────────────────────────────────────────────────────
+
+PYRAMID_FANOUT = 4
+
+# One level: the buckets where the signal changed, as parallel arrays
+PyramidLevel = Tuple[Sequence[int], Sequence[int], Sequence[int], Sequence[int], Sequence[int]]
+
+
+@dataclass
+class Pyramid:
+    """
+    Activity of one signal at several time resolutions, finest level first.
+
+    Level L buckets are `width * PYRAMID_FANOUT**L` ticks wide, counted from
+    `origin`.  Each level is (bucket, changes, lowest value id, highest value
+    id, last value id) of its non-empty buckets, bucket numbers ascending.
+    The lowest / highest values include the value held when the bucket
+    starts; an x/z value ranks above every known value.
+    """
+    width:   int
+    origin:  int
+    levels:  List[PyramidLevel]
+    strings: Sequence[str]
+
+
+def pyramid_width(end_time: int) -> int:
+    """Level-0 bucket width of a dump ending at `end_time`."""
+    return max(1, -(-(end_time + 1) // max(VCD_PYRAMID_BUCKETS, 1)))
+
+
+def value_key(value: str) -> Tuple[int, Union[int, float, str]]:
+    """Sort key of a value string: numeric order, x/z (by text) above every known value."""
+    if value and all(ch in "01" for ch in value):
+        return 0, int(value, 2)
+    try:
+        return 0, float(value)
+    except ValueError:
+        return 1, value
+
+
+def build_pyramid(times: Sequence[int], ids: Sequence[int], strings: Sequence[str], width: int, end: int,
+                  origin: int = 0, held: Optional[int] = None) -> Pyramid:
+    """
+    Pyramid of the changes in [origin, end]; `held` is the value id in effect
+    at `origin` (None when the signal has no value yet).  Earlier changes only
+    update the held value.
+    """
+    pool = set(ids)
+    if held is not None:
+        pool.add(held)
+    rank = {vid: r for r, vid in enumerate(sorted(pool, key=lambda i: value_key(strings[i])))}
+    level = tuple(array("I") for _ in range(5))
+    b_idx, b_cnt, b_lo, b_hi, b_last = level
+    cur = -1
+    for t, vid in zip(times, ids):
+        if t < origin:
+            held = vid
+            continue
+        if t > end:
+            break
+        b = (t - origin) // width
+        if b != cur:
+            first = vid if held is None else held
+            b_idx.append(b); b_cnt.append(0); b_lo.append(first); b_hi.append(first); b_last.append(first)
+            cur = b
+        b_cnt[-1] += 1
+        r = rank[vid]
+        if r < rank[b_lo[-1]]:
+            b_lo[-1] = vid
+        if r > rank[b_hi[-1]]:
+            b_hi[-1] = vid
+        b_last[-1] = vid
+        held = vid
+    levels: List[PyramidLevel] = [level]
+    top = max(-(-(end - origin + 1) // width), 1)
+    while top > 1:
+        below = levels[-1]
+        level = tuple(array("I") for _ in range(5))
+        b_idx, b_cnt, b_lo, b_hi, b_last = level
+        for b, c, lo, hi, last in zip(*below):
+            b //= PYRAMID_FANOUT
+            if not b_idx or b_idx[-1] != b:
+                b_idx.append(b); b_cnt.append(0); b_lo.append(lo); b_hi.append(hi); b_last.append(last)
+            b_cnt[-1] += c
+            if rank[lo] < rank[b_lo[-1]]:
+                b_lo[-1] = lo
+            if rank[hi] > rank[b_hi[-1]]:
+                b_hi[-1] = hi
+            b_last[-1] = last
+        levels.append(level)
+        top = -(-top // PYRAMID_FANOUT)
+    return Pyramid(width, origin, levels, strings)
+
+
+def _pyramid_blob(pyr: Pyramid) -> bytes:
+    """uint32 [levels, size of each level, then bucket | changes | lowest | highest | last of each level]."""
+    out = array("I", [len(pyr.levels)] + [len(level[0]) for level in pyr.levels])
+    for level in pyr.levels:
+        for col in level:
+            out.extend(col)
+    return out.tobytes()
+
+
+# ── Value-change parser ────────────────────────────────────────────────────────
+
+@dataclass
+class EventLog:
+    """Global, time-ordered change stream of a dump: (time, code index, value id)."""
+    code_index: Dict[str, int]
+    times: array = field(default_factory=lambda: array("q"))
+    codes: array = field(default_factory=lambda: array("I"))
+    ids:   array = field(default_factory=lambda: array("I"))
+
+
+@dataclass
+class EventSlice:
+    """A time range of the global change stream; codes index `code_list`, ids index `strings`."""
+    times:     Sequence[int]
+    codes:     Sequence[int]
+    ids:       Sequence[int]
+    code_list: List[str]
+    strings:   Sequence[str]
+
+
+_SCALAR_CHARS = frozenset("01xXzZ")
+_VECTOR_CHARS = frozenset("bBrR")
+
+
+def parse_changes(f: Iterable[str], keep: Optional[set] = None, until: Optional[int] = None,
+                  events: Optional[EventLog] = None) -> Tuple[Dict[str, Tuple[array, array]], List[str], int]:
+    """
+    Stream the value-change section of a VCD (text lines after the header).
+
+    Returns ({code: (times, ids)}, strings, last_time).  Value strings are
+    interned into one table so a scalar change costs 12 bytes, not a tuple.
+    Codes outside `keep` (when given) are skipped without being stored, and
+    parsing stops at the first timestamp past `until` (when given).  When an
+    `events` log is given, every change of a declared code is also appended
+    to it in file order.
+    """
+    traces: Dict[str, Tuple[array, array]] = {}
+    pool: Dict[str, int] = {}
+    strings: List[str] = []
+    t = 0
+    in_comment = False
+
+    def add(code: str, val: str) -> None:
+        vid = pool.get(val)
+        if vid is None:
+            vid = pool[val] = len(strings)
+            strings.append(val)
+        tr = traces.get(code)
+        if tr is None:
+            tr = traces[code] = (array("q"), array("I"))
+        tr[0].append(t)
+        tr[1].append(vid)
+        if events is not None:
+            ci = events.code_index.get(code)
+            if ci is not None:
+                events.times.append(t)
+                events.codes.append(ci)
+                events.ids.append(vid)
+
+    for line in f:
+        line = line.strip()
+        if not line:
+            continue
+        c = line[0]
+        if in_comment:
+            in_comment = "$end" not in line
+        elif c == "#":
+            parts = line.split()
+            t = int(parts[0][1:])
+            if until is not None and t > until:
+                break
+            for tok in parts[1:]:
+                if tok[0] in _SCALAR_CHARS and (keep is None or tok[1:] in keep):
+                    add(tok[1:], tok[0])
+        elif c in _SCALAR_CHARS:
+            # Filter before anything else: most lines are dropped in selective mode
+            code = line[1:]
+            if keep is None or code in keep:
+                add(code, c)
+        elif c in _VECTOR_CHARS:
+            val, code = line[1:].split(None, 1)
+            if keep is None or code in keep:
+                add(code, val)
+        elif c == "$" and line.startswith("$comment"):
+            in_comment = "$end" not in line
+    return traces, strings, t
+
+
+def _iter_lines(mm: Union[mmap.mmap, FrameReader], start: int, stop: Optional[int] = None, chunk: int = 1 << 22) -> Iterable[str]:
+    """Decoded lines of mm[start:stop], read in newline-aligned chunks."""
+    stop = len(mm) if stop is None else stop
+    pos = start
+    while pos < stop:
+        end = min(pos + chunk, stop)
+        if end < stop:
+            nl = mm.rfind(b"\n", pos, end)
+            end = nl + 1 if nl >= pos else stop
+        yield from mm[pos:end].decode("ascii", "replace").splitlines()
+        pos = end
+
+
+def build_offset_index(mm: mmap.mmap, data_offset: int, stride: int) -> Tuple[array, array]:
+    """
+    Sparse (time, byte offset) index of the `#<time>` markers of a mapped VCD.
+
+    Probes one marker every `stride` bytes with `mmap.find`, so only a page
+    per probe is touched; VCD time never decreases, so both arrays are sorted.
+    """
+    times, offsets = array("q"), array("Q")
+    pos = data_offset
+    while True:
+        if mm[pos:pos + 1] == b"#":
+            i = pos
+        else:
+            i = mm.find(b"\n#", pos)
+            if i < 0:
+                break
+            i += 1
+        eol = mm.find(b"\n", i)
+        tok = mm[i + 1:eol if eol >= 0 else len(mm)].split()
+        if tok and tok[0].isdigit():
+            times.append(int(tok[0]))
+            offsets.append(i)
+        pos = i + max(stride, 1)
+    return times, offsets
+
+
+def _last_timestamp(path: str, data_offset: int, chunk: int = 64 * 1024) -> int:
+    """Scan back from the end of the file for the last `#<time>` line."""
+    with open(path, "rb") as f:
+        hi = f.seek(0, os.SEEK_END)
+        while hi > data_offset:
+            lo = max(data_offset, hi - chunk)
+            f.seek(lo)
+            # overlap the next block a little so a marker cut at `hi` is seen whole
+            block = f.read(hi - lo + 64)
+            if lo == data_offset:
+                block = b"\n" + block
+            found = re.findall(rb"\n#(\d+)", block)
+            if found:
+                return int(found[-1])
+            hi = lo
+    return 0
+
+
+def _last_timestamp_framed(reader: FrameReader, data_offset: int) -> int:
+    """`_last_timestamp` of a framed dump: scan back one frame at a time."""
+    raw = reader.frames.raw
+    hi = len(reader)
+    while hi > data_offset:
+        lo = max(data_offset, raw[bisect.bisect_left(raw, hi) - 1])
+        block = reader[lo:hi + 64]
+        if lo == data_offset:
+            block = b"\n" + block
+        found = re.findall(rb"\n#(\d+)", block)
+        if found:
+            return int(found[-1])
+        hi = lo
+    return 0
+
+
+def _last_timestamp_stream(path: str, data_offset: int, chunk: int = 1 << 22) -> int:
+    """`_last_timestamp` of an unframed compressed dump: its whole text is decompressed once."""
+    last, tail = 0, b"\n"
+    with open_dump(path, data_offset) as f:
+        while True:
+            data = f.read(chunk)
+            if not data:
+                return last
+            block = tail + data
+            found = re.findall(rb"\n#(\d+)", block)
+            if found:
+                last = int(found[-1])
+            tail = block[block.rfind(b"\n"):]
+
+
+def _open_data_section(path: str, header: VcdHeader) -> io.TextIOWrapper:
+    return io.TextIOWrapper(open_dump(path, header.data_offset), encoding="ascii", errors="replace")
+
+
+class _TextWaveform(Waveform):
+    """
+    Waveform read straight from the VCD text when there is no sidecar.
+
+    Nothing but the header is loaded up front.  Asking for a signal streams
+    the value-change section once and keeps only the identifier codes that
+    were requested, so memory scales with the queried signals rather than
+    with the design.  `prefetch` batches several signals into one pass.
+    A compressed dump is read the same way through its decompressed text;
+    windowed reads need a framed one.
+    """
+
+    def __init__(self, path: str, header: VcdHeader, key: Any) -> None:
+        super().__init__(header)
+        self._path = path
+        self._key  = key
+        self._size = key[1]
+        self._nbytes = _header_nbytes(header)
+        self._mm: Optional[Union[mmap.mmap, FrameReader]] = None
+        self._offsets: Optional[Tuple[array, array]] = None
+        self._end_time: Optional[int] = None
+        self._compressed = compression(path)
+        self._frames = frame_index(path) if self._compressed else None
+        if self._frames is not None:
+            self._size = self._frames.raw[-1]
+        # random time access: plain text or seekable frames
+        self._seekable = self._compressed is None or self._frames is not None
+
+    def window(self, names: Iterable[str], start: Optional[int], end: Optional[int]) -> Dict[str, SignalTrace]:
+        names = [n for n in names if n in self.header.vars]
+        codes = {self.header.vars[n].code for n in names}
+        if (start is None or not self._seekable or self._size < VCD_WINDOW_MB * 1024 * 1024
+                or codes <= self._traces.keys()):
+            return super().window(names, start, end)
+        by_code = self._window_from_text(codes, start, end)
+        return {n: by_code[self.header.vars[n].code] for n in names}
+
+    @property
+    def end_time(self) -> int:
+        """Last `#<time>` of the dump, read from the tail of the file."""
+        if self._end_time is None:
+            if self._compressed is None:
+                self._end_time = _last_timestamp(self._path, self.header.data_offset)
+            elif self._frames is not None:
+                self._end_time = _last_timestamp_framed(self._text(), self.header.data_offset)
+            else:
+                self._end_time = _last_timestamp_stream(self._path, self.header.data_offset)
+        return self._end_time
+
+    def _text(self) -> Union[mmap.mmap, FrameReader]:
+        """The dump text for random access: the mapped file, or the frames of a framed dump."""
+        if self._mm is None:
+            if self._frames is not None:
+                self._mm = FrameReader(self._path, self._frames)
+            else:
+                with open(self._path, "rb") as f:
+                    self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._mm
+
+    def _lines(self, start: int, stop: Optional[int] = None) -> Iterable[str]:
+        # frames are decompressed per chunk: keep the read-ahead past `until` small
+        return _iter_lines(self._text(), start, stop, 1 << 22 if self._frames is None else 1 << 18)
+
+    def _offset_index(self) -> Tuple[Union[mmap.mmap, FrameReader], array, array]:
+        if self._offsets is None:
+            self._text()
+            self._offsets = build_offset_index(self._mm, self.header.data_offset, VCD_OFFSET_STRIDE_KB * 1024)
+            self._nbytes += 16 * len(self._offsets[0])
+            CACHE.resize(self._key, self._nbytes)
+        return self._mm, self._offsets[0], self._offsets[1]
+
+    def _window_from_text(self, codes: set, start: int, end: Optional[int]) -> Dict[str, SignalTrace]:
+        """Parse only the bytes of [start, end], then walk back for the values in effect at `start`."""
+        _, idx_t, idx_o = self._offset_index()
+        # Last indexed marker strictly before `start`: every change at >= start follows it
+        k = bisect.bisect_left(idx_t, start) - 1
+        off = idx_o[k] if k >= 0 else self.header.data_offset
+        traces, strings, _ = parse_changes(self._lines(off), keep=codes, until=end)
+
+        out: Dict[str, List[Tuple[int, str]]] = {}
+        missing = set()
+        for code in codes:
+            times, ids = traces.get(code) or (array("q"), array("I"))
+            lo = _lead_index(times, start)
+            out[code] = [(times[i], strings[ids[i]]) for i in range(lo, len(times))]
+            if not out[code] or out[code][0][0] >= start:
+                missing.add(code)
+
+        # Signals that did not change between the marker and `start`: scan earlier blocks, newest first
+        j = k
+        while missing and j >= 0:
+            lo_off = idx_o[j - 1] if j >= 1 else self.header.data_offset
+            prev, pstrings, _ = parse_changes(self._lines(lo_off, idx_o[j]), keep=missing)
+            for code in [c for c in missing if c in prev]:
+                times, ids = prev[code]
+                out[code].insert(0, (times[-1], pstrings[ids[-1]]))
+                missing.discard(code)
+            j -= 1
+
+        return {code: _trace_from_pairs(pairs, self.header.vars[self.header.codes[code][0]].width)
+                for code, pairs in out.items()}
+
+    def events_between(self, start: int, end: int) -> EventSlice:
+        code_list = list(self.header.codes)
+        log = EventLog({code: i for i, code in enumerate(code_list)})
+        if self._seekable:
+            _, idx_t, idx_o = self._offset_index()
+            k = bisect.bisect_left(idx_t, start) - 1
+            off = idx_o[k] if k >= 0 else self.header.data_offset
+            _, strings, _ = parse_changes(self._lines(off), until=end, events=log)
+        else:
+            # an unframed compressed dump can only be read from its start
+            with _open_data_section(self._path, self.header) as f:
+                _, strings, _ = parse_changes(f, until=end, events=log)
+        lo = bisect.bisect_left(log.times, start)
+        return EventSlice(log.times[lo:], log.codes[lo:], log.ids[lo:], code_list, strings)
+
+    def prefetch(self, names: Iterable[str]) -> None:
+        codes = {self.header.vars[n].code for n in names if n in self.header.vars}
+        codes -= self._traces.keys()
+        if codes:
+            self._parse(codes)
+
+    def _load_trace(self, code: str) -> SignalTrace:
+        self._parse({code})
+        return self._traces[code]
+
+    def _parse(self, codes: set) -> None:
+        keep = None if len(codes) == len(self.header.codes) else codes
+        with _open_data_section(self._path, self.header) as f:
+            traces, strings, last = parse_changes(f, keep)
+        if self._end_time is None:
+            self._end_time = last           # the whole dump was read, its last #time is known
+        for code in codes:
+            times, ids = traces.get(code) or (array("q"), array("I"))
+            var = self.header.vars[self.header.codes[code][0]]
+            self._traces[code] = SignalTrace(times, ids, strings, var.width)
+            self._nbytes += 12 * len(times) + 64
+        self._nbytes += sum(len(v) + 56 for v in strings)
+        CACHE.resize(self._key, self._nbytes)
+
+    def nbytes(self) -> int:
+        return self._nbytes
+
+
+# ── Sidecar index (.ftidx) ─────────────────────────────────────────────────────
+#
+# Layout (native byte order, every blob 8-byte aligned):
+#
+#   b"FTIDX\x00\x00\x06"                               magic + version
+#   per code:  int64 times[n] | uint8/16/32 ids[n]        columnar value changes
+#              uint32 runs[r]                             positions where the value differs
+#              uint32 pyramid[...]                        activity pyramid (see _pyramid_blob)
+#   events:    int64 times[N] | uint32 codes[N] | uint32 ids[N]
+#                                                         all changes in time order
+#   checkpoints: int64 times[K] | uint64 event_pos[K] | uint32 state[K * C]
+#                                                         full state every `interval` ticks
+#   strings:   uint64 offsets[count + 1] | utf-8 bytes    shared value table
+#   json meta: source stamp, header, {code: [n, t_off, v_off, v_type, runs..., x/z..., p_off, stats...]},
+#              pyramid bucket width, offsets
+#   uint64 meta_off | uint64 meta_len                     trailer
+#
+# The source (size, mtime) is stored in the meta; a sidecar whose stamp no
+# longer matches its VCD is ignored and the tools fall back to the VCD.
+#
+# Checkpoint k holds, for each of the C codes, the value id in effect at
+# times[k] (NO_VALUE before the first change) and the position of the first
+# event after it.  The state at any t is one checkpoint copy plus a replay of
+# at most `interval` ticks of events.  The interval is chosen so that the
+# checkpoint states take about half the space of the event stream.
+#
+# Run r of a signal is the stretch from change runs[r] to change runs[r + 1]
+# (or to the end of the dump) during which the value did not change; repeated
+# writes of the same value do not start a new run.  The shortest and longest
+# run of each signal are kept in the meta so that a "glitches shorter than X"
+# sweep over many signals skips those that cannot match without reading them.
+#
+# The meta also holds, per signal, the time of its first X/Z value and the
+# start and end of its last X/Z run (-1 when there is none, or when the last
+# run lasts to the end of the dump), so "which signals went X first" is a
+# lookup, not a scan of every trace.
+#
+# The pyramid of every signal uses the same level-0 width, stored in the meta.
+#
+# The last fields of a trace entry are its SignalStats, in field order.
+
+FTIDX_SUFFIX = ".ftidx"
+_FTIDX_MAGIC = b"FTIDX\x00\x00\x06"
+_FTIDX_VERSION = 6
+NO_VALUE = 0xFFFFFFFF
+_MAX_CHECKPOINTS = 4096
+
+
+def sidecar_path(path: str) -> str:
+    return path + FTIDX_SUFFIX
+
+
+def _id_typecode(ids: array) -> str:
+    top = max(ids) if len(ids) else 0
+    return "B" if top < 1 << 8 else "H" if top < 1 << 16 else "I"
+
+
+def _write_blob(f: io.BufferedWriter, data: bytes) -> int:
+    off = f.tell()
+    f.write(data)
+    pad = -len(data) % 8
+    if pad:
+        f.write(b"\0" * pad)
+    return off
+
+
+def build_index(path: str) -> str:
+    """
+    Parse `path` once and write its `.ftidx` sidecar next to it.
+
+    Returns the sidecar path.  The file is written to a temporary name and
+    renamed into place, so a concurrent reader never sees a partial index.
+    """
+    st = os.stat(path)
+    header = scan_header(path)
+    code_list = list(header.codes)
+    events = EventLog({code: i for i, code in enumerate(code_list)})
+    with _open_data_section(path, header) as f:
+        traces, strings, end_time = parse_changes(f, events=events)
+    xz = _xz_ids(strings)
+    interval, cp_times, cp_pos, cp_state = _build_checkpoints(events, len(code_list), end_time)
+
+    out = sidecar_path(path)
+    tmp = f"{out}.tmp{os.getpid()}"
+    meta: Dict[str, Any] = {
+        "version":     _FTIDX_VERSION,
+        "byteorder":   sys.byteorder,
+        "source":      {"size": st.st_size, "mtime_ns": st.st_mtime_ns},
+        "magnitude":   header.magnitude,
+        "unit":        header.unit,
+        "data_offset": header.data_offset,
+        "end_time":    end_time,
+        "scopes":      header.scopes,
+        "vars":        [[v.name, v.code, v.width, v.kind] for v in header.vars.values()],
+        "codes":       code_list,
+        "traces":      {},
+        "pyramid":     pyramid_width(end_time),
+    }
+    with open(tmp, "wb") as f:
+        f.write(_FTIDX_MAGIC)
+        for code, (times, ids) in traces.items():
+            tc = _id_typecode(ids)
+            t_off = _write_blob(f, times.tobytes())
+            v_off = _write_blob(f, array(tc, ids).tobytes())
+            runs, shortest, longest = _run_positions(times, ids, end_time)
+            meta["traces"][code] = [len(times), t_off, v_off, tc,
+                                    len(runs), _write_blob(f, runs.tobytes()), shortest, longest,
+                                    *_xz_span(times, ids, xz, runs),
+                                    _write_blob(f, _pyramid_blob(build_pyramid(times, ids, strings, meta["pyramid"], end_time))),
+                                    *astuple(_signal_stats(times, ids, xz, end_time, runs))]
+        meta["events"] = [len(events.times), _write_blob(f, events.times.tobytes()),
+                          _write_blob(f, events.codes.tobytes()), _write_blob(f, events.ids.tobytes())]
+        meta["checkpoints"] = [len(cp_times), interval, _write_blob(f, cp_times.tobytes()),
+                               _write_blob(f, cp_pos.tobytes()), _write_blob(f, cp_state.tobytes())]
+        encoded = [s.encode("utf-8") for s in strings]
+        offsets = array("Q", [0])
+        for b in encoded:
+            offsets.append(offsets[-1] + len(b))
+        meta["strings"] = [len(strings), _write_blob(f, offsets.tobytes()), _write_blob(f, b"".join(encoded))]
+        blob = json.dumps(meta, separators=(",", ":")).encode("utf-8")
+        meta_off = _write_blob(f, blob)
+        f.write(struct.pack("=QQ", meta_off, len(blob)))
+    os.replace(tmp, out)
+    CACHE.drop_path(path)
+    return out
+
+
+def _run_positions(times: array, ids: array, end_time: int) -> Tuple[array, int, int]:
+    """Start positions of the runs of equal values, and the shortest / longest run length."""
+    runs = array("I")
+    last = None
+    for i, vid in enumerate(ids):
+        if vid != last:
+            runs.append(i)
+            last = vid
+    bounds = [times[i] for i in runs] + [end_time]
+    lengths = [b - a for a, b in zip(bounds, bounds[1:])]
+    return runs, min(lengths, default=0), max(lengths, default=0)
+
+
+def _xz_ids(strings: Sequence[str]) -> set:
+    """Ids of the values with an x or z in them (scalar or any bit of a vector)."""
+    return {i for i, v in enumerate(strings) if "x" in v or "z" in v or "X" in v or "Z" in v}
+
+
+def _xz_span(times: Sequence[int], ids: Sequence[int], xz: set, runs: Optional[Sequence[int]] = None) -> Tuple[int, int, int]:
+    """
+    (first X/Z time, start of the last X/Z run, time that run became fully known)
+    of one trace; -1 for none, and for a last X/Z run that lasts to the end.
+    """
+    if not xz or xz.isdisjoint(ids):
+        return -1, -1, -1
+    first = last = known = -1
+    prev_x = False
+    for i in (range(len(ids)) if runs is None else runs):
+        is_x = ids[i] in xz
+        if is_x and not prev_x:
+            last, known = times[i], -1
+            if first < 0:
+                first = last
+        elif prev_x and not is_x:
+            known = times[i]
+        prev_x = is_x
+    return first, last, known
+
+
+def _build_checkpoints(events: EventLog, ncodes: int, end_time: int) -> Tuple[int, array, array, array]:
+    """Full-state snapshots every `interval` ticks over the event stream."""
+    n = len(events.times)
+    count = max(1, min(_MAX_CHECKPOINTS, n // (2 * max(ncodes, 1))))
+    interval = VCD_CHECKPOINT_TICKS or max(1, -(-max(end_time, 1) // count))
+    cp_times, cp_pos, cp_state = array("q"), array("Q"), array("I")
+    state = array("I", [NO_VALUE]) * ncodes
+    next_cp = 0
+    ev_t, ev_c, ev_v = events.times, events.codes, events.ids
+    for i in range(n):
+        t = ev_t[i]
+        while t > next_cp:
+            cp_times.append(next_cp)
+            cp_pos.append(i)
+            cp_state.extend(state)
+            next_cp += interval
+        state[ev_c[i]] = ev_v[i]
+    while next_cp <= end_time:
+        cp_times.append(next_cp)
+        cp_pos.append(n)
+        cp_state.extend(state)
+        next_cp += interval
+    return interval, cp_times, cp_pos, cp_state
+
+
+def _read_sidecar_meta(side: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(side, "rb") as f:
+            if f.read(len(_FTIDX_MAGIC)) != _FTIDX_MAGIC:
+                return None
+            f.seek(-16, os.SEEK_END)
+            meta_off, meta_len = struct.unpack("=QQ", f.read(16))
+            f.seek(meta_off)
+            meta = json.loads(f.read(meta_len))
+    except (OSError, ValueError, struct.error):
+        return None
+    if meta.get("version") != _FTIDX_VERSION or meta.get("byteorder") != sys.byteorder:
+        return None
+    return meta
+
+
+def _fresh_sidecar_meta(path: str) -> Optional[Dict[str, Any]]:
+    meta = _read_sidecar_meta(sidecar_path(path))
+    if meta is None:
+        return None
+    st = os.stat(path)
+    if meta["source"] != {"size": st.st_size, "mtime_ns": st.st_mtime_ns}:
+        return None
+    return meta
+
+
+def sidecar_is_fresh(path: str) -> bool:
+    """True when `path` has a sidecar built from its current contents."""
+    return _fresh_sidecar_meta(path) is not None
+
+
+class _StringTable:
+    """Lazy view of the sidecar value table; decodes each entry once."""
+
+    def __init__(self, mm: memoryview, count: int, off_off: int, data_off: int) -> None:
+        self._offsets = mm[off_off:off_off + 8 * (count + 1)].cast("Q")
+        self._data    = mm[data_off:]
+        self._count   = count
+        self._memo: Dict[int, str] = {}
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, i: int) -> str:
+        s = self._memo.get(i)
+        if s is None:
+            s = self._memo[i] = bytes(self._data[self._offsets[i]:self._offsets[i + 1]]).decode("utf-8")
+        return s
+
+
+class IndexWaveform(Waveform):
+    """Waveform memory-mapped from a `.ftidx` sidecar; nothing is parsed."""
+
+    def __init__(self, side: str, meta: Dict[str, Any]) -> None:
+        header = VcdHeader(
+            magnitude=meta["magnitude"],
+            unit=meta["unit"],
+            scopes=meta["scopes"],
+            data_offset=meta["data_offset"],
+        )
+        for name, code, width, kind in meta["vars"]:
+            header.vars[name] = VarDef(name, code, width, kind)
+            header.codes.setdefault(code, []).append(name)
+        super().__init__(header)
+        self.end_time = meta["end_time"]
+        self._meta = meta["traces"]
+        self._pyramid_width = meta["pyramid"]
+        self._codes = meta["codes"]
+        self._code_index = {code: i for i, code in enumerate(self._codes)}
+        with open(side, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._mv = memoryview(self._mmap)
+        self._strings = _StringTable(self._mv, *meta["strings"])
+
+        n, t_off, c_off, v_off = meta["events"]
+        self._ev_times = self._mv[t_off:t_off + 8 * n].cast("q")
+        self._ev_codes = self._mv[c_off:c_off + 4 * n].cast("I")
+        self._ev_ids   = self._mv[v_off:v_off + 4 * n].cast("I")
+        k, self.checkpoint_interval, t_off, p_off, s_off = meta["checkpoints"]
+        self._cp_times = self._mv[t_off:t_off + 8 * k].cast("q")
+        self._cp_pos   = self._mv[p_off:p_off + 8 * k].cast("Q")
+        self._cp_state = self._mv[s_off:s_off + 4 * k * len(self._codes)].cast("I")
+
+    def state_at(self, t: int) -> array:
+        """Value id of every code at tick t: nearest checkpoint plus a short event replay."""
+        ncodes = len(self._codes)
+        k = bisect.bisect_right(self._cp_times, t) - 1
+        if k < 0:
+            state, pos = array("I", [NO_VALUE]) * ncodes, 0
+        else:
+            state, pos = array("I", self._cp_state[k * ncodes:(k + 1) * ncodes]), self._cp_pos[k]
+        end = bisect.bisect_right(self._ev_times, t, pos)
+        ev_c, ev_v = self._ev_codes, self._ev_ids
+        for i in range(pos, end):
+            state[ev_c[i]] = ev_v[i]
+        return state
+
+    def values_at(self, names: Iterable[str], t: int) -> Dict[str, Optional[str]]:
+        names = [n for n in names if n in self.header.vars]
+        if len(names) < _STATE_LOOKUP_MIN:
+            return super().values_at(names, t)
+        state = self.state_at(t)
+        out: Dict[str, Optional[str]] = {}
+        for n in names:
+            vid = state[self._code_index[self.header.vars[n].code]]
+            out[n] = None if vid == NO_VALUE else self._strings[vid]
+        return out
+
+    def _load_trace(self, code: str) -> SignalTrace:
+        entry = self._meta.get(code)
+        var = self.header.vars[self.header.codes[code][0]]
+        if entry is None:
+            return SignalTrace(array("q"), array("I"), self._strings, var.width)
+        n, t_off, v_off, tc = entry[:4]
+        isz = array(tc).itemsize
+        times = self._mv[t_off:t_off + 8 * n].cast("q")
+        ids = self._mv[v_off:v_off + isz * n].cast(tc)
+        return SignalTrace(times, ids, self._strings, var.width)
+
+    def events_between(self, start: int, end: int) -> EventSlice:
+        lo = bisect.bisect_left(self._ev_times, start)
+        hi = bisect.bisect_right(self._ev_times, end, lo)
+        return EventSlice(self._ev_times[lo:hi], self._ev_codes[lo:hi], self._ev_ids[lo:hi], self._codes, self._strings)
+
+    def xz_spans(self) -> Dict[str, Tuple[int, int, int]]:
+        return {code: tuple(entry[8:11]) for code, entry in self._meta.items() if entry[8] >= 0}
+
+    def signal_stats(self) -> Dict[str, SignalStats]:
+        # a code without any change has no trace entry
+        never = SignalStats(0, -1, -1, 0, 0, NO_VALUE)
+        return {code: SignalStats(*self._meta[code][12:18]) if code in self._meta else never for code in self._codes}
+
+    def pyramid(self, name: str) -> Pyramid:
+        entry = self._meta.get(self.header.vars[name].code)
+        if entry is None:
+            return Pyramid(self._pyramid_width, 0, [tuple(array("I") for _ in range(5))], self._strings)
+        off = entry[11]
+        count = self._mv[off:off + 4].cast("I")[0]
+        sizes = self._mv[off + 4:off + 4 * (count + 1)].cast("I")
+        levels = []
+        pos = off + 4 * (count + 1)
+        for n in sizes:
+            cols = []
+            for _ in range(5):
+                cols.append(self._mv[pos:pos + 4 * n].cast("I"))
+                pos += 4 * n
+            levels.append(tuple(cols))
+        return Pyramid(self._pyramid_width, 0, levels, self._strings)
+
+    def run_summary(self, name: str) -> Optional[Tuple[Sequence[int], int, int]]:
+        entry = self._meta.get(self.header.vars[name].code)
+        if entry is None:
+            return array("I"), 0, 0
+        r, r_off, shortest, longest = entry[4:8]
+        return self._mv[r_off:r_off + 4 * r].cast("I"), shortest, longest
+
+    def nbytes(self) -> int:
+        # Trace data lives in the page cache, only the metadata is resident
+        return 200 * len(self._meta) + _header_nbytes(self.header)
+
+
+# ── Loaders ────────────────────────────────────────────────────────────────────
+
+def _header_nbytes(hdr: VcdHeader) -> int:
+    return 400 * len(hdr.vars) + 200 * len(hdr.scopes) + 1024
+
+
+def load_header(path: str) -> VcdHeader:
+    """Cached `scan_header` for `path`."""
+    return CACHE.get_or_load(file_key(path) + ("header",), lambda: scan_header(path), _header_nbytes)
+
+
+def _load_sidecar(path: str) -> Optional[IndexWaveform]:
+    meta = _fresh_sidecar_meta(path)
+    return IndexWaveform(sidecar_path(path), meta) if meta is not None else None
+
+
+def load_waveform(path: str) -> Waveform:
+    """
+    Waveform for `path`, shared across tool calls.
+
+    A fresh `.ftidx` sidecar is memory-mapped; otherwise signals are parsed
+    from the VCD text on demand.  Either way the result is cached.
+    """
+    key = file_key(path)
+    side = sidecar_path(path)
+    if os.path.exists(side):
+        side_key = key + ("ftidx", os.stat(side).st_mtime_ns)
+        wf = CACHE.get_or_load(side_key, lambda: _load_sidecar(path), lambda w: w.nbytes() if w else 0)
+        if wf is not None:
+            return wf
+    text_key = key + ("vcd",)
+    return CACHE.get_or_load(text_key, lambda: _TextWaveform(path, load_header(path), text_key), lambda w: w.nbytes())
+
+
+if __name__ == "__main__":
+    # One-time indexer: python vcd_store.py <dump.vcd> [<dump.vcd> ...]
+    for vcd_path in sys.argv[1:]:
+        print(f"{vcd_path} -> {build_index(vcd_path)}")
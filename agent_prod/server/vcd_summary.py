@@ -0,0 +1,247 @@
+"""
+vcd_summary.py
+──────────────
+Size-bounded summaries of signal activity for the window tools of the
+RTL_Toolbox server.
+
+THE PROBLEM
+───────────
+`vcd_get_signal_values_in_timeframe` and `vcd_get_signals_aligned_in_window`
+list every change of the window.  On a busy bus that is megabytes of Python
+lists in the model context, most of it a clock or a counter doing the same
+thing thousands of times, and the few transitions that matter drown in it.
+
+THIS SOLUTION
+─────────────
+The changes of the window are read as zero-copy array views of the trace (a
+slice of the sidecar when there is one) and repeated writes of a value are
+merged.  One array pass per pattern cuts the changes into segments:
+
+  periodic    the same p values (p <= 4) in the same order with the same
+              spacing: "0/1 repeating every 10 (0 for 5, 1 for 5), 12000 changes"
+  regular     a new value at a constant spacing (a counter, a data bus on
+              every beat): "1000 changes every 10, 00 .. 3e7"
+  irregular   anything else
+
+A periodic or regular segment is one line whatever its length.  An irregular
+segment is listed change by change when it fits; otherwise only the changes
+around an anomaly are kept -- the break of a pattern, an x/z value, a run much
+shorter than the typical one (a glitch) -- and the rest is counted.  Only the
+values that are printed are turned into text.
+
+BUDGET
+──────
+The summary stays under `max_chars`: the context kept around anomalies
+shrinks first (8, 3, 1, then 0 changes), then long segments are cut and the last
+ones dropped with a '... N more' line.
+
+CONFIGURATION
+─────────────
+  FAULTTRACE_VCD_MAX_CHARS   default max_chars of the window tools: a listing
+                             that would be longer is summarized instead
+                             (default: 0, always list)
+"""
+
+from __future__ import annotations
+
+import os
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from vcd_analysis import trace_arrays
+from vcd_store import SignalTrace
+
+
+MAX_CHARS = int(os.getenv("FAULTTRACE_VCD_MAX_CHARS", "0"))
+
+_MIN_SEGMENT = 8        # changes a pattern must hold to become one line
+_MAX_PERIOD = 4
+_GLITCH = 4             # a run this many times shorter than the median run is a glitch
+_CONTEXT = (8, 3, 1, 0) # changes kept around each anomaly, tried in order
+_VALUES = 8             # distinct values listed for an irregular segment
+
+IRREGULAR, REGULAR = 0, -1      # segment kinds; a periodic segment has kind p > 0
+
+
+@dataclass
+class Segment:
+    kind: int
+    lo:   int           # change positions [lo, hi) of the window arrays
+    hi:   int
+
+
+# ── Window arrays ─────────────────────────────────────────────────────────────
+
+def window_arrays(trace: SignalTrace, start: Optional[int], end: Optional[int],
+                  lead: bool = True) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (times, value ids) of the value changes in [start, end], with the settled
+    value of each tick and repeated writes merged; with `lead`, the value in effect at start is the first change (at start).
+    """
+    times, ids = trace_arrays(trace)
+    lo = 0 if start is None else int(np.searchsorted(times, start, side="left"))
+    hi = len(times) if end is None else int(np.searchsorted(times, end, side="right"))
+    t, v = times[lo:max(lo, hi)], ids[lo:max(lo, hi)].astype(np.int64)
+    if lead and start is not None and lo > 0 and (not len(t) or t[0] != start):
+        t = np.concatenate(([start], t))
+        v = np.concatenate(([int(ids[lo - 1])], v))
+    if len(v) > 1:
+        settled = np.ones(len(v), dtype=bool)
+        np.not_equal(t[1:], t[:-1], out=settled[:-1])
+        t, v = t[settled], v[settled]
+        keep = np.ones(len(v), dtype=bool)
+        np.not_equal(v[1:], v[:-1], out=keep[1:])
+        t, v = t[keep], v[keep]
+    return t, v
+
+
+# ── Segmentation ──────────────────────────────────────────────────────────────
+
+def _label_runs(label: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    starts = np.flatnonzero(np.concatenate(([True], label[1:] != label[:-1])))
+    return starts, np.diff(np.append(starts, len(label)))
+
+
+def segments(times: np.ndarray, ids: np.ndarray) -> List[Segment]:
+    """Cut merged changes into periodic, regular and irregular segments, in time order."""
+    n = len(times)
+    if n < _MIN_SEGMENT:
+        return [Segment(IRREGULAR, 0, n)] if n else []
+    gap = np.diff(times)
+    # change i continues a pattern of p values when it repeats change i-p and is held as long
+    label = np.zeros(n, dtype=np.int64)
+    for p in range(_MAX_PERIOD, 1, -1):            # the shortest period wins
+        ok = ids[p:] == ids[:-p]
+        ok[:-1] &= gap[p:] == gap[:-p]
+        label[p:][ok] = p
+    ok = np.zeros(n, dtype=bool)
+    ok[2:] = gap[1:] == gap[:-1]
+    label[ok & (label == IRREGULAR)] = REGULAR
+
+    # a pattern that does not hold for long is just irregular activity
+    starts, lengths = _label_runs(label)
+    label[np.repeat(lengths < _MIN_SEGMENT, lengths)] = IRREGULAR
+    starts, lengths = _label_runs(label)
+
+    out: List[Segment] = []
+    for s, ln, kind in zip(starts.tolist(), lengths.tolist(), label[starts].tolist()):
+        if kind == IRREGULAR:
+            out.append(Segment(kind, s, s + ln))
+            continue
+        # the changes that define the pattern come before its first matching change
+        lo = max(s - (kind if kind > 0 else 2), out[-1].lo if out else 0)
+        if out and out[-1].kind != IRREGULAR:
+            lo = max(lo, out[-1].hi)
+        if out and out[-1].kind == IRREGULAR:
+            out[-1].hi = lo
+            if out[-1].hi <= out[-1].lo:
+                out.pop()
+        out.append(Segment(kind, lo, s + ln))
+    return out
+
+
+def anomalies(times: np.ndarray, ids: np.ndarray, strings: Sequence[str], end: int) -> np.ndarray:
+    """Mask of the changes that stand out: x/z values and glitches (runs far below the median run)."""
+    uniq, inv = np.unique(ids, return_inverse=True)
+    xz = np.array([any(ch in "xXzZ" for ch in strings[u]) for u in uniq.tolist()], dtype=bool)
+    mask = xz[inv]
+    if len(times) > 2:
+        runs = np.diff(np.append(times, max(end, int(times[-1]))))
+        mask = mask | (runs * _GLITCH < np.median(runs[:-1]))
+    return mask
+
+
+# ── Rendering ─────────────────────────────────────────────────────────────────
+
+class _Renderer:
+    def __init__(self, times: np.ndarray, ids: np.ndarray, text: Callable[[int], str], odd: np.ndarray) -> None:
+        self.times, self.ids, self.text, self.odd = times, ids, text, odd
+
+    def change(self, i: int) -> str:
+        return f"({int(self.times[i])}, {self.text(int(self.ids[i]))})"
+
+    def line(self, seg: Segment, ctx: int, room: int) -> str:
+        t, ids = self.times, self.ids
+        n = seg.hi - seg.lo
+        span = f"  {int(t[seg.lo])}-{int(t[seg.hi - 1])}\t"
+        if seg.kind > 0:
+            p = seg.kind
+            vals = [self.text(int(v)) for v in ids[seg.lo:seg.lo + p]]
+            gaps = np.diff(t[seg.lo:seg.lo + p + 1]).tolist()
+            held = ", ".join(f"{v} for {g}" for v, g in zip(vals, gaps))
+            return span + f"{'/'.join(vals)} repeating every {sum(gaps)} ({held}), {n} changes"
+        if seg.kind == REGULAR:
+            return (span + f"{n} changes every {int(t[seg.lo + 1] - t[seg.lo])}, "
+                    f"{self.text(int(ids[seg.lo]))} .. {self.text(int(ids[seg.hi - 1]))}")
+
+        # irregular: the boundaries and every anomaly, with ctx changes around each
+        keep = self.odd[seg.lo:seg.hi].copy()
+        keep[0] = keep[-1] = True
+        if ctx:
+            near = np.flatnonzero(keep)
+            keep[np.clip((near[:, None] + np.arange(-ctx, ctx + 1)).ravel(), 0, n - 1)] = True
+        seg_ids = ids[seg.lo:seg.hi]
+        uniq = np.unique(seg_ids)
+        runs = np.diff(t[seg.lo:seg.hi])
+        head = span + (f"{n} changes, {len(uniq)} values" if n > 1 else "1 change")
+        if len(uniq) <= _VALUES and n > 1:
+            head = head + f" ({', '.join(self.text(int(v)) for v in uniq)})"
+        if len(runs):
+            head = head + f", held {int(runs.min())}-{int(runs.max())}"
+        head = head + " : "
+        parts: List[str] = []
+        used, prev = len(head), -1
+        for k in np.flatnonzero(keep).tolist():
+            gap = f"... {k - prev - 1} changes ..." if k - prev > 1 else ""
+            item = self.change(seg.lo + k)
+            if used + len(gap) + len(item) + 40 > room and parts:
+                parts.append(f"... {n - prev - 1} more changes not shown (raise max_chars)")
+                break
+            if gap:
+                parts.append(gap)
+            parts.append(item)
+            used += len(gap) + len(item) + 2
+            prev = k
+        return head + ", ".join(parts)
+
+
+def summarize(times: np.ndarray, ids: np.ndarray, strings: Sequence[str], end: int, max_chars: int,
+              decode: Optional[Callable[[str], str]] = None) -> List[str]:
+    """
+    Summary lines of merged changes (see `window_arrays`) of a signal whose
+    last value lasts until `end`, at most about max_chars long.  `decode`
+    turns a printed value into its display form (LABEL(bits)).
+    """
+    text = (lambda vid: decode(strings[vid])) if decode else (lambda vid: strings[vid])
+    segs = segments(times, ids)
+    r = _Renderer(times, ids, text, anomalies(times, ids, strings, end))
+    for ctx in _CONTEXT:
+        lines: List[str] = []
+        used = 0
+        for s in segs:
+            lines.append(r.line(s, ctx, max_chars))
+            used += len(lines[-1]) + 1
+            if used > max_chars:
+                break
+        else:
+            return lines
+    # still too long: cut each segment to what is left, then drop the rest
+    out: List[str] = []
+    room = max_chars
+    for k, s in enumerate(segs):
+        line = r.line(s, 0, room)
+        if len(line) + 1 > room and out:
+            rest = segs[k:]
+            out.append(f"  ... {len(rest)} more segments ({sum(x.hi - x.lo for x in rest)} changes) "
+                       f"not shown (raise max_chars)")
+            break
+        out.append(line)
+        room -= len(line) + 1
+    return out
+
+
+def listing_chars(times_count: int, last_time: int, value_chars: int) -> int:
+    """Estimated length of a '[(t, v), ...]' listing, to decide whether to summarize."""
+    return times_count * (len(str(last_time)) + value_chars + 6)
@@ -0,0 +1,283 @@
+"""
+vcd_sva.py
+──────────
+Clocked temporal properties (a SystemVerilog Assertions subset) checked over
+a dump for the `vcd_*` tools of the RTL_Toolbox server.
+
+THE PROBLEM
+───────────
+"Is every req answered by an ack within 4 cycles?" meant dumping req and ack
+as value lists and having the agent line them up cycle by cycle, for one
+hypothesis at a time.
+
+THIS SOLUTION
+─────────────
+A property is parsed once into boolean leaves (the expression language of
+`vcd_find_when`) joined by cycle delays.  Every signal of every property is
+read in one pass over the dump and sampled once per edge of its clock, the way
+an assertion samples: the value just before the edge.  A property is then a
+few array operations over the cycles: each `##[m:n]` is a sliding-window OR
+over prefix sums, which follows every attempt of the property at once, the
+same as running its automaton from every cycle.  Properties on one clock
+share the samples.
+
+SUBSET
+──────
+  [@(posedge clk)] [disable iff (expr)] seq [|-> | |=>] seq
+  seq       expr  |  expr ##N seq  |  expr ##[M:N] seq  |  ##[M:N] seq   ($ for an open end)
+  expr      the vcd_find_when expressions, plus $rose(e), $fell(e),
+            $stable(e), $changed(e) and $past(e[, n]) on the sampled values
+
+Without an implication the property is checked at every cycle.  As in SVA an
+x/z value makes a boolean false, so `disable iff (rst)` is the way to skip
+reset.  An attempt whose window runs past the end of the dump is pending, not
+failed; an open-ended `##[M:$]` is never failed.
+"""
+
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from vcd_analysis import evaluate, parse_expression, parse_number
+
+
+# ── Parsing ───────────────────────────────────────────────────────────────────
+
+_CLOCKING = re.compile(r"@\s*\(\s*(posedge|negedge)\s+([^)]+?)\s*\)\s*")
+_DISABLE = re.compile(r"disable\s+iff\s*\(")
+_DELAY = re.compile(r"##\s*(?:\[\s*(\d+)\s*:\s*(\d+|\$)\s*\]|(\d+))")
+_FUNCTION = re.compile(r"\$(rose|fell|stable|changed|past)\s*\(")
+
+
+def _closing(text: str, open_pos: int) -> int:
+    """Position of the ')' matching the '(' at open_pos."""
+    depth = 0
+    for i in range(open_pos, len(text)):
+        if text[i] == "(":
+            depth += 1
+        elif text[i] == ")":
+            depth -= 1
+            if depth == 0:
+                return i
+    raise ValueError(f"Missing ')' in '{text}'")
+
+
+@dataclass
+class Expr:
+    """A boolean leaf: parsed tree, its identifiers, and the sampled-value functions standing in for some of them."""
+    text:  str
+    tree:  tuple
+    idents: List[str]
+    functions: Dict[str, Tuple[str, "Expr", int]] = field(default_factory=dict)     # placeholder -> (name, arg, n)
+
+    def signals(self) -> List[str]:
+        out = [i for i in self.idents if i not in self.functions]
+        for _, arg, _ in self.functions.values():
+            out.extend(s for s in arg.signals() if s not in out)
+        return out
+
+
+def parse_expr(text: str) -> Expr:
+    """Boolean expression with $rose / $fell / $stable / $changed / $past calls."""
+    functions: Dict[str, Tuple[str, Expr, int]] = {}
+    out, pos = "", 0
+    for m in _FUNCTION.finditer(text):
+        if m.start() < pos:
+            continue                        # inside the argument of an earlier call
+        close = _closing(text, m.end() - 1)
+        arg, _, n = text[m.end():close].partition(",")
+        if n.strip() and m.group(1) != "past":
+            raise ValueError(f"${m.group(1)} takes one argument")
+        depth = int(parse_number(n.strip())) if n.strip() else 1
+        if depth < 1:
+            raise ValueError(f"$past needs a depth of at least 1, not {depth}")
+        name = f"__f{len(functions)}"
+        functions[name] = (m.group(1), parse_expr(arg), depth)
+        out, pos = out + text[pos:m.start()] + f" {name} ", close + 1
+    tree, idents = parse_expression(out + text[pos:])
+    return Expr(text.strip(), tree, idents, functions)
+
+
+Delay = Tuple[int, Optional[int]]           # cycles [lo, hi], hi None for $
+
+
+def parse_sequence(text: str) -> List[Tuple[Delay, Expr]]:
+    """'a ##[1:4] b ##1 c' -> [((0, 0), a), ((1, 4), b), ((1, 1), c)]; a leading delay is allowed."""
+    parts = _DELAY.split(text)              # body, lo, hi, n, body, lo, hi, n, ..., body
+    bodies = [p.strip() for p in parts[0::4]]
+    if any(not b for b in bodies[1:]):
+        raise ValueError(f"'{text.strip()}' needs an expression after every ## delay")
+    if len(bodies) == 1 and not bodies[0]:
+        raise ValueError("Empty sequence")
+    chain: List[Tuple[Delay, Expr]] = []
+    delay: Delay = (0, 0)
+    for k, body in enumerate(bodies):
+        if body:
+            chain.append((delay, parse_expr(body)))
+        if k + 1 < len(bodies):
+            lo, hi, n = parts[4 * k + 1:4 * k + 4]
+            delay = (int(n), int(n)) if n is not None else (int(lo), None if hi == "$" else int(hi))
+            if delay[1] is not None and delay[1] < delay[0]:
+                raise ValueError(f"Empty delay range ##[{lo}:{hi}]")
+    return chain
+
+
+@dataclass
+class Property:
+    text:        str
+    clock:       Optional[str]               # as written in @(...), None for the default clock
+    edge:        str                         # rising / falling
+    disable:     Optional[Expr]
+    antecedent:  Optional[List[Tuple[Delay, Expr]]]
+    implication: Optional[str]               # '|->', '|=>' or None
+    consequent:  List[Tuple[Delay, Expr]]
+
+    def exprs(self) -> List[Expr]:
+        out = [e for _, e in (self.antecedent or []) + self.consequent]
+        return out + ([self.disable] if self.disable else [])
+
+    def signals(self) -> List[str]:
+        out: List[str] = []
+        for e in self.exprs():
+            out.extend(s for s in e.signals() if s not in out)
+        return out
+
+
+def parse_property(text: str) -> Property:
+    body = text.strip().rstrip(";").strip()
+    clock, edge = None, "rising"
+    m = _CLOCKING.match(body)
+    if m:
+        clock, edge = m.group(2), "rising" if m.group(1) == "posedge" else "falling"
+        body = body[m.end():]
+    disable = None
+    m = _DISABLE.match(body)
+    if m:
+        close = _closing(body, m.end() - 1)
+        disable = parse_expr(body[m.end():close])
+        body = body[close + 1:]
+    sides = re.split(r"(\|->|\|=>)", body)
+    if len(sides) > 3:
+        raise ValueError("Only one implication per property")
+    if len(sides) == 3:
+        return Property(text.strip(), clock, edge, disable, parse_sequence(sides[0]), sides[1], parse_sequence(sides[2]))
+    return Property(text.strip(), clock, edge, disable, None, None, parse_sequence(body))
+
+
+# ── Checking ──────────────────────────────────────────────────────────────────
+
+Sampled = Tuple[np.ndarray, np.ndarray, int]                # (values, known, width) per cycle
+
+
+def _shift(a: np.ndarray, n: int, fill: Any) -> np.ndarray:
+    """a delayed by n cycles, `fill` for the first n."""
+    out = np.empty_like(a)
+    out[:n] = fill
+    out[n:] = a[:len(a) - n]
+    return out
+
+
+def _value(e: Expr, sample: Callable[[str], Sampled], n: int) -> Sampled:
+    operands = []
+    for ident in e.idents:
+        if ident not in e.functions:
+            operands.append(sample(ident))
+            continue
+        fn, arg, depth = e.functions[ident]
+        v, k, w = _value(arg, sample, n)
+        v, k = np.broadcast_to(v, (n,)), np.broadcast_to(k, (n,))
+        if fn == "past":
+            operands.append((_shift(v, min(depth, n), 0), _shift(k, min(depth, n), False), w))
+            continue
+        pv, pk = _shift(v, min(1, n), 0), _shift(k, min(1, n), False)
+        if fn in ("rose", "fell"):
+            bit, pbit = (v & 1) != 0, (pv & 1) != 0
+            now = k & (bit if fn == "rose" else ~bit)
+            was = pk & (pbit if fn == "rose" else ~pbit)
+            operands.append((now & ~was, np.ones(n, dtype=bool), 1))
+        else:
+            same = k & pk & (v == pv)
+            operands.append((same if fn == "stable" else ~same & (k | pk), np.ones(n, dtype=bool), 1))
+    return evaluate(e.tree, operands)
+
+
+def truth(e: Expr, sample: Callable[[str], Sampled], n: int) -> np.ndarray:
+    """Cycles where an expression is true (known and non-zero)."""
+    v, k, _ = _value(e, sample, n)
+    return np.broadcast_to(k & (np.asarray(v) != 0), (n,))
+
+
+def _window(x: np.ndarray, lo: np.ndarray, hi: np.ndarray) -> np.ndarray:
+    """any(x[lo[k]:hi[k]]) for every k (bounds clipped to the array)."""
+    c = np.concatenate(([0], np.cumsum(x, dtype=np.int64)))
+    lo, hi = np.clip(lo, 0, len(x)), np.clip(hi, 0, len(x))
+    return (hi > lo) & (c[hi] - c[np.minimum(lo, hi)] > 0)
+
+
+def _ahead(x: np.ndarray, d: Delay, pad: bool) -> np.ndarray:
+    """x somewhere in [k+lo, k+hi]; with pad, cycles past the end of the dump count as true."""
+    k = np.arange(len(x))
+    lo, hi = d
+    hit = _window(x, k + lo, k + (len(x) if hi is None else hi + 1))
+    if pad:
+        hit = hit | (True if hi is None else (k + hi >= len(x)))
+    return hit
+
+
+def _behind(x: np.ndarray, d: Delay) -> np.ndarray:
+    """x somewhere in [k-hi, k-lo]."""
+    k = np.arange(len(x))
+    lo, hi = d
+    return _window(x, np.zeros_like(k) if hi is None else k - hi, k - lo + 1)
+
+
+@dataclass
+class PropertyResult:
+    attempts: int
+    passed:   int
+    failed:   int
+    pending:  int
+    disabled: int
+    failures: List[Tuple[int, int]]          # (cycle of the attempt, last cycle of its window)
+
+
+def check_property(prop: Property, sample: Callable[[str], Sampled], n: int, max_failures: int) -> PropertyResult:
+    """Check a property over n sampled cycles; sample(ident) gives the per-cycle values of a signal."""
+    # forwards over the antecedent: cycles where a match of it ends (every cycle without one)
+    trig = np.ones(n, dtype=bool)
+    if prop.antecedent is not None:
+        for d, e in prop.antecedent:
+            trig = truth(e, sample, n) & (trig if d == (0, 0) else _behind(trig, d))
+
+    # backwards over the consequent: ok = matched inside the dump, maybe = not ruled out by it
+    ok, maybe = np.ones(n, dtype=bool), np.ones(n, dtype=bool)
+    chain = prop.consequent
+    for i in range(len(chain) - 1, -1, -1):
+        t = truth(chain[i][1], sample, n)
+        if i + 1 < len(chain):
+            ok, maybe = t & _ahead(ok, chain[i + 1][0], False), t & _ahead(maybe, chain[i + 1][0], True)
+        else:
+            ok, maybe = t, t.copy()
+    ok, maybe = _ahead(ok, chain[0][0], False), _ahead(maybe, chain[0][0], True)
+    lag = 1 if prop.implication == "|=>" else 0
+    if lag:
+        ok, maybe = _shift(ok[::-1], min(1, n), False)[::-1], _shift(maybe[::-1], min(1, n), True)[::-1]
+
+    spans = [d[1] for d, _ in chain]
+    reach = None if None in spans else lag + sum(spans)
+    k = np.arange(n)
+    last = np.full(n, n - 1) if reach is None else np.minimum(k + reach, n - 1)
+    off = np.zeros(n, dtype=bool)
+    if prop.disable is not None:
+        off = _window(truth(prop.disable, sample, n), k, last + 1)
+
+    live = trig & ~off
+    fail = live & ~maybe
+    first = np.flatnonzero(fail)[:max_failures]
+    return PropertyResult(int(trig.sum()), int((live & ok).sum()), int(fail.sum()),
+                          int((live & ~ok & maybe).sum()), int((trig & off).sum()),
+                          [(int(c), int(last[c])) for c in first])
@@ -120,6 +120,8 @@ def main():
 		#print(f"\n[TEST] - Signal top.dut.shift_reg[7:0] bit 2 count for {val_count} rising edge in timewindow 0-40000{timescale_unit} \n")
 		print(" TEST - vcd_count_signal_all_transitions : ")
 		print(mcp_server.vcd_count_signal_all_transitions(vcd_path, "top.dut.shift_reg[7:0]", "rising", 0, 40000))
+		print(" TEST - vcd_count_signal_all_transitions (any edge) : ")
+		print(mcp_server.vcd_count_signal_all_transitions(vcd_path, "top.intf.scl", "any", 0, 40000))
 		#print(f"\n[TEST] - Signal top.dut.shift_reg[7:0] bit 2 count for {val_count} falling edge in timewindow 0-40000{timescale_unit} \n")
 
 		print(f"##################################################################################################")
@@ -134,6 +136,109 @@ def main():
 		#print("Times:", times)
 		#for s, vals in aligned.items():
 		#		print(s, vals)
+
+		print(f"##################################################################################################")
+		print(" TEST - vcd_batch_query : ")
+		print(mcp_server.vcd_batch_query(vcd_path, [
+			{"id": "val", "op": "value_at", "signal": "top.dut.shift_reg[7:0]", "time": 200},
+			{"id": "next", "op": "next_change", "signal": "top.intf.scl", "time": 40000},
+			{"id": "prev", "op": "prev_change", "signal": "top.intf.scl", "time": 40000},
+			{"id": "edges", "op": "count_edges", "signal": "top.intf.scl", "edge": "rising", "start": 0, "end": 40000},
+			{"id": "win", "op": "window", "signal": "top.intf.sda", "start": 100, "end": 1000},
+		]))
+
+		print(f"##################################################################################################")
+		print(" TEST - vcd_find_when : ")
+		print(mcp_server.vcd_find_when(vcd_path, "top.intf.scl && !top.intf.sda", 0, 40000))
+
+		print(f"##################################################################################################")
+		print(" TEST - vcd_stable_intervals : ")
+		print(mcp_server.vcd_stable_intervals(vcd_path, "top.intf.*", max_duration=1000))
+
+		print(f"##################################################################################################")
+		print(" TEST - vcd_edge_order : ")
+		print(mcp_server.vcd_edge_order(vcd_path, "top.intf.scl", "top.intf.sda", "rising", "any", 0, 40000))
+
+		print(f"##################################################################################################")
+		print(" TEST - vcd_list_scope : ")
+		print(mcp_server.vcd_list_scope(vcd_path, "top"))
+		print(" TEST - vcd_list_sibling_signals : ")
+		print(mcp_server.vcd_list_sibling_signals(vcd_path, "top.intf.scl"))
+		print(" TEST - vcd_match_signals : ")
+		print(mcp_server.vcd_match_signals(vcd_path, "top.dut.*"))
+
+		print(f"##################################################################################################")
+		print(" TEST - vcd_signal_stats : ")
+		print(mcp_server.vcd_signal_stats(vcd_path, scope="top", max_results=20))
+		print(mcp_server.vcd_signal_stats(vcd_path, where="changes=0"))
+		print(mcp_server.vcd_signal_stats(vcd_path, sort="-last", where="xz>0,values>=2"))
+
+		print(f"##################################################################################################")
+		print(" TEST - vcd_check_properties : ")
+		print(mcp_server.vcd_check_properties(vcd_path, ["@(posedge top.intf.scl) top.intf.sda |-> ##[1:8] !top.intf.sda", "@(negedge top.intf.scl) $stable(top.intf.sda) |=> ##[0:$] $changed(top.intf.sda)"]))
+		print(mcp_server.vcd_check_properties(vcd_path, ["$fell(top.intf.sda) && top.intf.scl |-> ##1 !top.intf.scl"], clock="top.intf.scl", start=0, end=40000, max_failures=5))
+
+		print(f"##################################################################################################")
+		print(" TEST - vcd_cache_line_history : ")
+		print(mcp_server.vcd_cache_line_history("simulation/cache/simout/sim.vcd", "0x44", scope="tb_top.dut"))
+		print(mcp_server.vcd_transactions("simulation/cache/simout/sim.vcd", "mesi", scope="tb_top.dut", where="event=BusInv"))
+
+		print(f"##################################################################################################")
+		print(" TEST - vcd_transactions : ")
+		print(mcp_server.vcd_transactions(vcd_path, "i2c", scope="top.intf", max_results=10))
+		print(mcp_server.vcd_transactions(vcd_path, "i2c", {"scl": "top.intf.scl", "sda": "top.intf.sda"}, where="nack=yes"))
+
+		print(f"##################################################################################################")
+		print(" TEST - vcd_activity_heatmap : ")
+		print(mcp_server.vcd_activity_heatmap(vcd_path, "top", buckets=16))
+		print(mcp_server.vcd_activity_heatmap(vcd_path, "top.dut.shift_reg[7:0]", 0, 40000, buckets=8))
+
+		print(f"##################################################################################################")
+		print(" TEST - vcd_get_signal_values_in_timeframe (summarized) : ")
+		print(mcp_server.vcd_get_signal_values_in_timeframe(vcd_path, "top.clk", None, None, max_chars=1000))
+		print(mcp_server.vcd_get_signals_aligned_in_window(vcd_path, ["top.clk", "top.dut.shift_reg[7:0]", "top.intf.sda"], 0, 40000, max_chars=1500))
+
+		print(f"##################################################################################################")
+		print(" TEST - vcd_list_clocks : ")
+		print(mcp_server.vcd_list_clocks(vcd_path))
+		print(mcp_server.vcd_time_to_cycle(vcd_path, "top.clk", [200, "1ns", "top.clk@3+100"]))
+		print(mcp_server.vcd_sample_on_clock(vcd_path, "top.clk", ["top.dut.shift_reg[7:0]", "top.intf.sda_drive_out"], "top.clk@2", "top.clk@10"))
+		print(mcp_server.vcd_get_signal_values_in_timeframe(vcd_path, "top.dut.shift_reg[7:0]", "top.clk@2", "top.clk@10"))
+
+		print(f"##################################################################################################")
+		print(" TEST - vcd_first_xz : ")
+		print(mcp_server.vcd_first_xz(vcd_path))
+		print(mcp_server.vcd_first_xz(vcd_path, scope="top.dut", after=2000))
+
+		print(f"##################################################################################################")
+		print(" TEST - vcd_diff : ")
+		print(mcp_server.vcd_diff(vcd_path, vcd_path))
+
+		print(f"##################################################################################################")
+		print(" TEST - vcd_events_around : ")
+		print(mcp_server.vcd_events_around(vcd_path, 40000, 5000, 1000))
+		print(mcp_server.vcd_events_around(vcd_path, 40000, 5000, 0, scope="top.dut"))
+
+		print(f"##################################################################################################")
+		print(" TEST - rtl_list_enums : ")
+		print(mcp_server.rtl_list_enums("simulation/cache/rtl"))
+		# shift_reg[6:0] == SLAVE_ADDR is a part-select: shift_reg must not be listed
+		print(mcp_server.rtl_list_enums("simulation/i2c/rtl"))
+		print(mcp_server.vcd_get_signals_aligned_in_window(vcd_path, ["top.dut.shift_reg"], 0, 40000, rtl_path="simulation/i2c/rtl"))
+		print(mcp_server.vcd_get_signals_aligned_in_window(vcd_path, ["top.dut.state"], 0, 40000, rtl_path="simulation/i2c/rtl"))
+
+		print(f"##################################################################################################")
+		print(" TEST - vcd_build_index : ")
+		print(mcp_server.vcd_build_index(vcd_path))
+		print(mcp_server.vcd_get_signal_value_at_timestamp(vcd_path, "top.dut.shift_reg[7:0]", 200))
+
+		print(f"##################################################################################################")
+		print(" TEST - vcd_get_scope_values_at_timestamp : ")
+		print(mcp_server.vcd_get_scope_values_at_timestamp(vcd_path, "top.dut", 40000))
+
+		print(f"##################################################################################################")
+		print(" TEST - vcd_cache_stats : ")
+		print(mcp_server.vcd_cache_stats())
     
 if __name__ == "__main__":
 	main()
@@ -0,0 +1,525 @@
+"""
+vcd_analysis.py
+───────────────
+Vectorized waveform kernels used by the `vcd_*` tools of the RTL_Toolbox server.
+
+THE PROBLEM
+───────────
+Edge counting walked the value changes of a signal in a Python loop, calling a
+string-classifying helper on every sample.  A clock with tens of millions of
+edges took seconds per question, and duty cycle or X/Z time needed another
+pass each.
+
+THIS SOLUTION
+─────────────
+A `SignalTrace` is already two flat arrays (int64 times, value ids into a
+shared string table), so NumPy can view them without copying.  Each distinct
+value id is classified once into a small-int level, the levels of the whole
+trace are one table lookup, and edges, durations and fractions are array
+diffs and masked sums.
+
+LEVELS
+──────
+  0 / 1   logic value of the signal (or of the selected bit of a bus)
+  X       'x' or 'z' on the signal / selected bit, or anywhere in a whole bus
+  OTHER   not a single logic level (a multi-bit value without bit_index, a
+          real, a bit index past the dumped value)
+Edges are counted between consecutive changes only when both sides are 0/1;
+X and OTHER break an edge, like the scalar loop they replace.
+
+EXPRESSION SEARCH
+─────────────────
+`parse_expression` turns 'valid && !ready && state == 3' into a small tree
+with Verilog operator precedence; the caller resolves its identifiers to
+`Operand`s.  `find_when` merges the change times of the operands and
+evaluates the tree once over those change points as NumPy arrays, so the cost
+follows the number of transitions, not the simulation length.  An x/z operand
+makes a sub-expression unknown, and an unknown expression does not hold.
+
+EDGE ORDERING
+─────────────
+`edge_times` extracts the edge times of a signal as one array and
+`match_edges` pairs the edges of two signals with a sorted merge, so req/ack
+ordering and latency over millions of handshakes is a few array passes.
+
+STABLE INTERVALS
+────────────────
+A run is a stretch where a signal kept one value; `stable_runs` filters runs
+by length (setup/hold windows, glitches) with array masks.  Run starts come
+from the sidecar when it has them, otherwise from one vectorized diff.
+
+EVENT WINDOWS
+─────────────
+A time range of the global change stream is ranked per signal (change count,
+then latest change) with one `np.unique` pass, and the changes nearest to a
+point of interest are picked from the sorted times without a full sort.
+"""
+
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from vcd_store import EventSlice, SignalTrace
+
+
+LOW, HIGH, X, OTHER = 0, 1, 2, 3
+
+
+# ── Array views ───────────────────────────────────────────────────────────────
+
+def trace_arrays(trace: SignalTrace) -> Tuple[np.ndarray, np.ndarray]:
+    """Zero-copy (times int64, value ids) views of a trace."""
+    return np.asarray(trace.times, dtype=np.int64), np.asarray(trace.ids)
+
+
+def _level(value: str, bit_index: Optional[int]) -> int:
+    v = value.lower()
+    if v in ("0", "1"):
+        return int(v)
+    if v in ("x", "z"):
+        return X
+    if not v or not all(ch in "01xz" for ch in v):
+        return OTHER
+    if bit_index is None:
+        return X if ("x" in v or "z" in v) else OTHER
+    if bit_index < 0 or bit_index >= len(v):
+        return OTHER
+    ch = v[-1 - bit_index]
+    return int(ch) if ch in "01" else X
+
+
+def trace_levels(trace: SignalTrace, bit_index: Optional[int] = None, lo: int = 0, hi: Optional[int] = None) -> np.ndarray:
+    """int8 level (LOW/HIGH/X/OTHER) of changes [lo, hi) of a trace, one classification per distinct value."""
+    ids = trace_arrays(trace)[1][lo:hi]
+    if not len(ids):
+        return np.zeros(0, dtype=np.int8)
+    present = np.zeros(int(ids.max()) + 1, dtype=bool)
+    present[ids] = True
+    lut = np.full(len(present), OTHER, dtype=np.int8)
+    for vid in np.flatnonzero(present):
+        lut[vid] = _level(trace.strings[int(vid)], bit_index)
+    return lut[ids]
+
+
+# ── Edges and transition statistics ───────────────────────────────────────────
+
+def edge_counts(levels: np.ndarray) -> Tuple[int, int]:
+    """(rising, falling) 0<->1 edges between consecutive levels."""
+    if len(levels) < 2:
+        return 0, 0
+    a, b = levels[:-1], levels[1:]
+    rising = int(np.count_nonzero((a == LOW) & (b == HIGH)))
+    falling = int(np.count_nonzero((a == HIGH) & (b == LOW)))
+    return rising, falling
+
+
+def _durations(times: np.ndarray, levels: np.ndarray, start: int, end: int) -> np.ndarray:
+    """Ticks per level over [start, end] for changes `times` (led by the change in effect at start)."""
+    # times are sorted and times[1:] <= end, so only the lead change needs clamping
+    dur = np.empty(len(times), dtype=np.int64)
+    np.subtract(times[1:], times[:-1], out=dur[:-1])
+    dur[-1] = end - times[-1]
+    dur[0] -= max(start - int(times[0]), 0)
+    return np.bincount(levels, weights=dur, minlength=4).astype(np.int64)
+
+
+def level_durations(trace: SignalTrace, start: int, end: int, bit_index: Optional[int] = None) -> Dict[int, int]:
+    """
+    Ticks spent at each level over [start, end], step/hold between changes.
+    The time before the first change of the trace counts as X.
+    """
+    times = trace_arrays(trace)[0]
+    lo = int(np.searchsorted(times, start, side="right")) - 1
+    hi = int(np.searchsorted(times, end, side="right"))
+    return _window_durations(trace, times, lo, hi, start, end, trace_levels(trace, bit_index, max(lo, 0), hi))
+
+
+def _window_durations(trace: SignalTrace, times: np.ndarray, lo: int, hi: int, start: int, end: int, levels: np.ndarray) -> Dict[int, int]:
+    out = {LOW: 0, HIGH: 0, X: 0, OTHER: 0}
+    if end <= start:
+        return out
+    if lo < 0:
+        first = int(times[0]) if len(times) else end
+        out[X] += min(first, end) - start
+        lo = 0
+    if hi > lo:
+        for lvl, d in enumerate(_durations(times[lo:hi], levels, start, end)):
+            out[lvl] += int(d)
+    return out
+
+
+def transition_stats(trace: SignalTrace, start: int, end: int, bit_index: Optional[int] = None) -> Dict[str, float]:
+    """Edges of the changes inside [start, end] plus duty cycle and X/Z time over the window."""
+    times = trace_arrays(trace)[0]
+    lead = int(np.searchsorted(times, start, side="right")) - 1
+    lo = int(np.searchsorted(times, start, side="left"))
+    hi = int(np.searchsorted(times, end, side="right"))
+    # one classification for both: the edges use [lo, hi), the durations [lead, hi)
+    first = max(min(lead, lo), 0)
+    levels = trace_levels(trace, bit_index, first, hi)
+    rising, falling = edge_counts(levels[lo - first:]) if hi > lo else (0, 0)
+    dur = _window_durations(trace, times, lead, hi, start, end, levels[max(lead, 0) - first:])
+    span = max(end - start, 0)
+    known = dur[LOW] + dur[HIGH]
+    return {
+        "rising":    rising,
+        "falling":   falling,
+        "toggles":   rising + falling,
+        "span":      span,
+        "high":      dur[HIGH],
+        "low":       dur[LOW],
+        "xz":        dur[X],
+        "duty":      dur[HIGH] / known if known else 0.0,
+        "xz_frac":   dur[X] / span if span else 0.0,
+    }
+
+
+def edge_times(trace: SignalTrace, start: int, end: int, edge: str = "rising", bit_index: Optional[int] = None) -> np.ndarray:
+    """
+    Times of the edges inside [start, end]: 'rising' / 'falling' / 'any' 0<->1 edges
+    (against the value in effect before each change), or 'change' for every change of value.
+    """
+    times, ids = trace_arrays(trace)
+    lo = int(np.searchsorted(times, start, side="left"))
+    hi = int(np.searchsorted(times, end, side="right"))
+    first = max(lo - 1, 0)
+    if hi <= lo:
+        return np.zeros(0, dtype=np.int64)
+    if edge == "change":
+        seg = ids[first:hi]
+        changed = seg[1:] != seg[:-1]
+        if first == lo:
+            changed = np.concatenate(([False], changed))
+        return times[lo:hi][changed[-(hi - lo):]]
+    levels = trace_levels(trace, bit_index, first, hi)
+    a, b = levels[:-1], levels[1:]
+    mask = np.zeros(len(b), dtype=bool)
+    if edge in ("rising", "any"):
+        mask |= (a == LOW) & (b == HIGH)
+    if edge in ("falling", "any"):
+        mask |= (a == HIGH) & (b == LOW)
+    t = times[first + 1:hi][mask]
+    return t[t >= start]
+
+
+def match_edges(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """
+    Index into `b` of the edge matching each edge of `a` (-1 when none), one-to-one and in order:
+    the first b at or after a[i] if it comes before a[i + 1], else the last b after a[i - 1]
+    that the previous a edge did not take.  Both inputs are sorted, so this is a merge
+    expressed as two searchsorted passes.
+    """
+    n = len(a)
+    out = np.full(n, -1, dtype=np.int64)
+    if not n or not len(b):
+        return out
+    nxt = np.append(a[1:], np.iinfo(np.int64).max)
+    prv = np.concatenate(([np.iinfo(np.int64).min], a[:-1]))
+    j = np.searchsorted(b, a, side="left")
+    fwd = (j < len(b)) & (b[np.minimum(j, len(b) - 1)] < nxt)
+    out[fwd] = j[fwd]
+    k = j - 1
+    taken_by_prev = np.concatenate(([False], fwd[:-1] & (j[:-1] == k[1:])))
+    back = ~fwd & (k >= 0) & (b[np.maximum(k, 0)] > prv) & ~taken_by_prev
+    out[back] = k[back]
+    return out
+
+
+# ── Stable intervals (runs of equal values) ───────────────────────────────────
+
+def run_starts(trace: SignalTrace, positions: Optional[Sequence[int]] = None) -> np.ndarray:
+    """Positions of the changes that start a new value (repeated writes of a value are not a run)."""
+    if positions is not None:
+        return np.asarray(positions, dtype=np.int64)
+    ids = trace_arrays(trace)[1]
+    if not len(ids):
+        return np.zeros(0, dtype=np.int64)
+    change = np.empty(len(ids), dtype=bool)
+    change[0] = True
+    np.not_equal(ids[1:], ids[:-1], out=change[1:])
+    return np.flatnonzero(change)
+
+
+def stable_runs(trace: SignalTrace, end_time: int, start: int, end: int,
+                min_len: Optional[int] = None, max_len: Optional[int] = None,
+                positions: Optional[Sequence[int]] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    (positions, start times, lengths) of the runs overlapping [start, end] whose full length is
+    within [min_len, max_len].  The last run lasts until `end_time`.
+    """
+    pos = run_starts(trace, positions)
+    times = trace_arrays(trace)[0]
+    begins = times[pos]
+    lengths = np.diff(np.append(begins, max(end_time, int(begins[-1]) if len(begins) else 0)))
+    keep = (begins <= end) & (begins + lengths > start)
+    if start == end:
+        keep |= (begins <= end) & (begins + lengths >= start)
+    if min_len is not None:
+        keep &= lengths >= min_len
+    if max_len is not None:
+        keep &= lengths <= max_len
+    return pos[keep], begins[keep], lengths[keep]
+
+
+# ── Boolean expressions over signals ──────────────────────────────────────────
+
+_EXPR_TOKEN = re.compile(r"""\s*(?:
+    (?P<num>\d*'[sS]?[bBoOdDhH][0-9a-fA-F_xXzZ]+|0[xX][0-9a-fA-F_]+|\d+\.\d*(?:[eE][-+]?\d+)?|\d+)
+  | (?P<ident>[A-Za-z_$][\w$]*(?:\[\d+(?::\d+)?\])?(?:\.[A-Za-z_$][\w$]*(?:\[\d+(?::\d+)?\])?)*)
+  | (?P<op>===|!==|&&|\|\||==|!=|<=|>=|[<>!~&|^()])
+)""", re.X)
+
+# binary operators, loosest first
+_BINARY_PREC = {"||": 1, "&&": 2, "|": 3, "^": 4, "&": 5,
+                "==": 6, "!=": 6, "===": 6, "!==": 6,
+                "<": 7, "<=": 7, ">": 7, ">=": 7}
+_RADIX = {"b": 2, "o": 8, "d": 10, "h": 16}
+
+
+def parse_number(text: str) -> Union[int, float]:
+    """Verilog literal (42, 'h2a, 8'b0010_1010, 0x2a, 0.5) -> number; ValueError for x/z digits."""
+    t = text.replace("_", "").lower()
+    if "." in t:
+        return float(t)
+    if "'" in t:
+        digits = t.split("'", 1)[1].lstrip("s")
+        if any(ch in "xz" for ch in digits[1:]):
+            raise ValueError(f"x/z literals are not supported in expressions: '{text}'")
+        if digits[:1] not in _RADIX:
+            raise ValueError(f"Bad number literal: '{text}'")
+        return int(digits[1:], _RADIX[digits[0]])
+    return int(t, 16) if t.startswith("0x") else int(t)
+
+
+def parse_expression(text: str) -> Tuple[tuple, List[str]]:
+    """
+    Parse a boolean expression into a tree and the list of its identifiers.
+    Nodes: ("sig", i) | ("const", n) | (unary_op, node) | (binary_op, lhs, rhs).
+    """
+    tokens: List[Tuple[str, str]] = []
+    pos, text = 0, text.strip()
+    while pos < len(text):
+        m = _EXPR_TOKEN.match(text, pos)
+        if not m or m.end() == pos:
+            raise ValueError(f"Unexpected character in expression at {pos}: '{text[pos:pos + 10]}'")
+        kind = m.lastgroup
+        tokens.append((kind, m.group(kind)))
+        pos = m.end()
+        while pos < len(text) and text[pos].isspace():
+            pos += 1
+
+    idents: List[str] = []
+    i = 0
+
+    def primary() -> tuple:
+        nonlocal i
+        if i >= len(tokens):
+            raise ValueError("Unexpected end of expression")
+        kind, tok = tokens[i]
+        i += 1
+        if kind == "num":
+            return ("const", parse_number(tok))
+        if kind == "ident":
+            if tok not in idents:
+                idents.append(tok)
+            return ("sig", idents.index(tok))
+        if tok in ("!", "~"):
+            return (tok, primary())
+        if tok == "(":
+            node = binary(1)
+            if i >= len(tokens) or tokens[i][1] != ")":
+                raise ValueError("Missing ')' in expression")
+            i += 1
+            return node
+        raise ValueError(f"Unexpected '{tok}' in expression")
+
+    def binary(min_prec: int) -> tuple:
+        nonlocal i
+        lhs = primary()
+        while i < len(tokens) and tokens[i][0] == "op" and _BINARY_PREC.get(tokens[i][1], 0) >= min_prec:
+            op = tokens[i][1]
+            i += 1
+            lhs = (op, lhs, binary(_BINARY_PREC[op] + 1))
+        return lhs
+
+    if not tokens:
+        raise ValueError("Empty expression")
+    tree = binary(1)
+    if i != len(tokens):
+        raise ValueError(f"Unexpected '{tokens[i][1]}' in expression")
+    return tree, idents
+
+
+@dataclass
+class Operand:
+    """One resolved expression identifier: a trace, optionally one bit of it."""
+    trace: SignalTrace
+    bit:   Optional[int] = None        # position from the LSB for a bit-select
+    real:  bool = False
+
+
+def _decode(value: str, bit: Optional[int], real: bool) -> Optional[Union[int, float]]:
+    """Numeric value of a dumped value, None when it is (or the selected bit is) x/z."""
+    v = value.lower()
+    if real:
+        try:
+            return float(v)
+        except ValueError:
+            return None
+    if bit is not None:
+        # VCD drops the leading zeros of vectors; x/z left-extend as themselves
+        ch = v[-1 - bit] if bit < len(v) else (v[0] if v[:1] in ("x", "z") else "0")
+        return int(ch) if ch in "01" else None
+    if v and all(ch in "01" for ch in v):
+        return int(v, 2)
+    return None
+
+
+def _operand_at(op: Operand, points: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """(values, known) of an operand at each change point, through one decode per distinct value."""
+    times, ids = trace_arrays(op.trace)
+    idx = np.searchsorted(times, points, side="right") - 1
+    known = idx >= 0
+    sel = ids[np.maximum(idx, 0)]
+    uniq, inv = np.unique(sel, return_inverse=True)
+    decoded = [_decode(op.trace.strings[int(v)], op.bit, op.real) for v in uniq]
+    if op.real:
+        dtype = np.float64
+    elif op.bit is None and op.trace.width > 62:
+        dtype = object
+    else:
+        dtype = np.int64
+    vals = np.array([0 if d is None else d for d in decoded], dtype=dtype)[inv]
+    known &= np.array([d is not None for d in decoded], dtype=bool)[inv]
+    return vals, known
+
+
+def _evaluate(node: tuple, operands: List[Tuple[np.ndarray, np.ndarray, int]]) -> Tuple[Any, np.ndarray, Optional[int]]:
+    """(values, known, width) of a tree node; unknown (x/z) operands make a result unknown
+    unless && / || can decide without them."""
+    kind = node[0]
+    if kind == "sig":
+        return operands[node[1]]
+    if kind == "const":
+        return node[1], np.True_, None
+    if kind in ("!", "~"):
+        v, k, w = _evaluate(node[1], operands)
+        if kind == "!":
+            return (v == 0), k, 1
+        if w and w <= 62:
+            return (~v) & ((1 << w) - 1), k, w
+        return ~v, k, w
+    lv, lk, lw = _evaluate(node[1], operands)
+    rv, rk, rw = _evaluate(node[2], operands)
+    if kind in ("&&", "||"):
+        lt, rt = lk & (lv != 0), rk & (rv != 0)
+        if kind == "&&":
+            return lt & rt, (lk & rk) | (lk & ~lt) | (rk & ~rt), 1
+        return lt | rt, (lk & rk) | lt | rt, 1
+    known = lk & rk
+    if kind in ("==", "==="):
+        return lv == rv, known, 1
+    if kind in ("!=", "!=="):
+        return lv != rv, known, 1
+    if kind == "<":
+        return lv < rv, known, 1
+    if kind == "<=":
+        return lv <= rv, known, 1
+    if kind == ">":
+        return lv > rv, known, 1
+    if kind == ">=":
+        return lv >= rv, known, 1
+    width = max(lw or 0, rw or 0) or None
+    if kind == "&":
+        return lv & rv, known, width
+    if kind == "|":
+        return lv | rv, known, width
+    return lv ^ rv, known, width
+
+
+def sample_operand(op: Operand, at: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """(values, known) of an operand just before each tick of `at` (what a flop clocked there samples)."""
+    return _operand_at(op, np.asarray(at, dtype=np.int64) - 1)
+
+
+def evaluate(tree: tuple, operands: List[Tuple[np.ndarray, np.ndarray, int]]) -> Tuple[Any, np.ndarray, Optional[int]]:
+    """(values, known, width) of a parsed expression over operands given as (values, known, width) arrays."""
+    return _evaluate(tree, operands)
+
+
+def find_when(tree: tuple, operands: Sequence[Operand], start: int, end: int) -> List[Tuple[int, int]]:
+    """[from, to) tick intervals inside [start, end] where the expression holds (is known and non-zero)."""
+    if end < start:
+        return []
+    parts = [np.array([start], dtype=np.int64)]
+    for op in operands:
+        times = trace_arrays(op.trace)[0]
+        lo = int(np.searchsorted(times, start, side="right"))
+        hi = int(np.searchsorted(times, end, side="right"))
+        parts.append(times[lo:hi])
+    points = np.unique(np.concatenate(parts))
+    evaluated = [(*_operand_at(op, points), 1 if op.bit is not None else op.trace.width) for op in operands]
+    vals, known, _ = _evaluate(tree, evaluated)
+    hold = np.broadcast_to(known & (np.asarray(vals) != 0), points.shape)
+
+    ends = np.append(points[1:], end)
+    edges = np.diff(np.concatenate(([0], hold.astype(np.int8), [0])))
+    first, last = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1) - 1
+    return [(int(points[a]), int(ends[b])) for a, b in zip(first, last) if ends[b] > points[a] or start == end]
+
+
+# ── Sampling ──────────────────────────────────────────────────────────────────
+
+def sample_ids(trace: SignalTrace, at: np.ndarray, before: bool = True) -> np.ndarray:
+    """
+    Value id of a trace at each tick of `at` (sorted or not): the value just
+    before the tick (what a flop clocked there samples) or, with before=False,
+    the value at it.  -1 where the signal has no value yet.
+    """
+    times, ids = trace_arrays(trace)
+    if not len(ids):
+        return np.full(len(at), -1, dtype=np.int64)
+    pos = np.searchsorted(times, at, side="left" if before else "right") - 1
+    return np.where(pos >= 0, ids[np.maximum(pos, 0)].astype(np.int64), -1)
+
+
+# ── Event windows ─────────────────────────────────────────────────────────────
+
+def event_arrays(events: EventSlice, codes: Optional[Sequence[int]] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(times, code indices, value ids) of an event slice, restricted to `codes` when given."""
+    times = np.asarray(events.times, dtype=np.int64)
+    ev_codes = np.asarray(events.codes, dtype=np.int64)
+    ids = np.asarray(events.ids, dtype=np.int64)
+    if codes is not None:
+        keep = np.isin(ev_codes, np.asarray(codes, dtype=np.int64))
+        times, ev_codes, ids = times[keep], ev_codes[keep], ids[keep]
+    return times, ev_codes, ids
+
+
+def rank_activity(times: np.ndarray, codes: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    (codes, change counts, first position, last position) of every code present,
+    most changes first, ties broken by the latest last change.
+    """
+    if not len(codes):
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, empty, empty
+    uniq, first, counts = np.unique(codes, return_index=True, return_counts=True)
+    last = len(codes) - 1 - np.unique(codes[::-1], return_index=True)[1]
+    order = np.lexsort((-times[last], -counts))
+    return uniq[order], counts[order], first[order], last[order]
+
+
+def nearest_events(times: np.ndarray, t: int, k: int) -> np.ndarray:
+    """Positions of the k changes closest to tick t (sorted times), in time order."""
+    if len(times) <= k:
+        return np.arange(len(times))
+    # the k nearest changes are a contiguous run around t
+    i = int(np.searchsorted(times, t))
+    lo, hi = max(i - k, 0), min(i + k, len(times))
+    near = np.argpartition(np.abs(times[lo:hi] - t), k - 1)[:k]
+    return np.sort(near) + lo
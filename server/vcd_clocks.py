@@ -0,0 +1,155 @@
+"""
+vcd_clocks.py
+─────────────
+Clock-cycle coordinates for the `vcd_*` tools of the RTL_Toolbox server.
+
+THE PROBLEM
+───────────
+Engineers and the agent reason in cycles ("two beats after the request"), the
+dump in ticks.  Every question meant converting by hand through the clock
+period, which breaks as soon as the clock is gated, stretched or has a
+startup offset, and sampling a bus once per cycle cost one query per cycle.
+
+THIS SOLUTION
+─────────────
+The rising-edge times of a clock are extracted once, as one int64 array, with
+the vectorized edge kernel, and kept with the cached waveform.  Cycle n of a
+clock is its n-th rising edge (0-based):
+
+  clk@12         the time of rising edge 12 of clk
+  clk@12+300     300 ticks after it ('clk@12+1.5ns' with a unit)
+
+Time -> cycle is one binary search over the edge array, and sampling any
+number of signals on every edge of a window is one `searchsorted` gather per
+signal.
+
+DETECTION
+─────────
+A 1-bit signal is taken as a clock when it has at least 16 rising edges and
+one edge-to-edge period covers 90% of its cycles.  Signals the detection
+misses (heavily gated clocks) can be listed in FAULTTRACE_VCD_CLOCKS; any
+1-bit signal can be used as a clock in a coordinate either way.
+
+CONFIGURATION
+─────────────
+  FAULTTRACE_VCD_CLOCKS   comma separated clock names or globs added to the
+                          detected clocks (default: none)
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from vcd_analysis import edge_times
+from vcd_hierarchy import glob_regex
+from vcd_store import Waveform
+
+
+VCD_CLOCKS = [c.strip() for c in os.getenv("FAULTTRACE_VCD_CLOCKS", "").split(",") if c.strip()]
+
+_MIN_EDGES = 16
+_REGULAR = 0.9
+
+
+def clock_period(edges: np.ndarray) -> Optional[int]:
+    """Edge-to-edge period shared by 90% of the cycles, None when the signal is not clock-like."""
+    if len(edges) < _MIN_EDGES:
+        return None
+    periods, counts = np.unique(np.diff(edges), return_counts=True)
+    top = int(np.argmax(counts))
+    return int(periods[top]) if counts[top] >= _REGULAR * (len(edges) - 1) else None
+
+
+def _rising_edges(wf: Waveform, name: str) -> np.ndarray:
+    tr = wf[name]
+    return edge_times(tr, 0, int(tr.times[-1]) if len(tr) else 0, "rising")
+
+
+class ClockIndex:
+    """Rising-edge arrays of the clocks of one dump, each built on first use."""
+
+    def __init__(self, wf: Waveform) -> None:
+        self._wf = wf
+        self._edges: Dict[str, np.ndarray] = {}        # by identifier code
+        self._clocks: Optional[Dict[str, int]] = None
+        self._lock = threading.Lock()
+
+    def edges(self, name: str) -> np.ndarray:
+        """Rising-edge times of a 1-bit signal (full name)."""
+        var = self._wf.header.vars.get(name)
+        if var is None:
+            raise KeyError(name)
+        if var.width != 1:
+            raise ValueError(f"'{name}' is {var.width} bits wide, a clock must be a 1-bit signal")
+        with self._lock:
+            e = self._edges.get(var.code)
+        if e is None:
+            e = _rising_edges(self._wf, name)
+            with self._lock:
+                self._edges[var.code] = e
+        return e
+
+    def cycle_time(self, name: str, cycle: int) -> int:
+        """Tick of rising edge `cycle` of a clock."""
+        e = self.edges(name)
+        if not 0 <= cycle < len(e):
+            raise ValueError(f"{name} has {len(e)} rising edges, there is no cycle {cycle}")
+        return int(e[cycle])
+
+    def cycles_of(self, name: str, times: Sequence[int]) -> Tuple[np.ndarray, np.ndarray]:
+        """(cycle, ticks after its rising edge) of each time; cycle -1 before the first edge."""
+        e = self.edges(name)
+        t = np.asarray(times, dtype=np.int64)
+        c = np.searchsorted(e, t, side="right") - 1
+        base = np.where(c >= 0, e[np.maximum(c, 0)] if len(e) else 0, 0)
+        return c, np.where(c >= 0, t - base, t)
+
+    def clocks(self) -> Dict[str, int]:
+        """{name: period} of the detected and configured clocks (one name per net)."""
+        if self._clocks is None:
+            wf = self._wf
+            names: Dict[str, str] = {}
+            for n in wf.signals:
+                var = wf.header.vars[n]
+                if var.width == 1 and var.kind != "real":
+                    names.setdefault(var.code, n)
+            forced = {n for p in VCD_CLOCKS for n in names.values() if glob_regex(p).fullmatch(n)}
+            wf.prefetch(names.values())
+            found: Dict[str, int] = {}
+            for code, n in names.items():
+                e = _rising_edges(wf, n)
+                period = clock_period(e)
+                if period is None and n in forced and len(e) > 1:
+                    period = int(np.median(np.diff(e)))
+                if period is not None:
+                    found[n] = period
+                    with self._lock:
+                        self._edges.setdefault(code, e)     # edges of non-clocks are not kept
+            with self._lock:
+                self._clocks = found
+        return self._clocks
+
+    def format(self, name: str, times: Sequence[int], label: Optional[str] = None) -> List[str]:
+        """'clk@12' / 'clk@12+300' coordinates of ticks on a clock ('clk@0-300' before its first edge)."""
+        leaf = label or name
+        e = self.edges(name)
+        cycles, offsets = self.cycles_of(name, times)
+        out = []
+        for t, c, o in zip(np.asarray(times).tolist(), cycles.tolist(), offsets.tolist()):
+            if c >= 0:
+                out.append(f"{leaf}@{c}" + (f"+{o}" if o else ""))
+            else:
+                out.append(f"{leaf}@0-{int(e[0]) - t}" if len(e) else str(t))
+        return out
+
+
+def clock_index(wf: Waveform) -> ClockIndex:
+    """The `ClockIndex` kept with a cached waveform."""
+    ci = wf.memo.get("clocks")
+    if ci is None:
+        ci = wf.memo.setdefault("clocks", ClockIndex(wf))
+    return ci
@@ -0,0 +1,161 @@
+"""
+vcd_hierarchy.py
+────────────────
+Scope hierarchy of a dump for the navigation tools of the RTL_Toolbox server.
+
+THE PROBLEM
+───────────
+Signal lookups scanned the flat list of every signal name on every call.  In
+a design with hundreds of thousands of signals, "what is inside top.dut.u_fifo"
+or "which signals sit next to top.dut.valid" cost a pass over the whole design.
+
+THIS SOLUTION
+─────────────
+A prefix trie over the `$scope` hierarchy, one node per scope holding its
+sub-scopes and the signals declared directly in it.  It is built once from the
+(cached) header and kept in the shared waveform cache, so:
+
+  children of a scope     O(depth + results)
+  siblings of a signal    O(depth + results)
+  glob / regex match      O(depth + size of the subtree searched)
+
+A glob is matched against full signal names: `*` matches any run of characters
+(across scope levels), `?` one character, everything else is literal (brackets
+included, so `shift_reg[7:0]` needs no escaping).  The literal prefix of the
+pattern picks the deepest scope to search from.
+"""
+
+from __future__ import annotations
+
+import re
+from typing import Dict, Iterator, List, Optional, Pattern
+
+from vcd_store import CACHE, VcdHeader, file_key, load_header
+
+
+# ── Trie ──────────────────────────────────────────────────────────────────────
+
+class ScopeNode:
+    """One scope: sub-scopes by local name and the signals declared directly in it."""
+
+    __slots__ = ("name", "full", "kind", "children", "signals", "count")
+
+    def __init__(self, name: str, full: str, kind: str = "") -> None:
+        self.name     = name
+        self.full     = full
+        self.kind     = kind
+        self.children: Dict[str, ScopeNode] = {}
+        self.signals:  List[str] = []
+        self.count    = 0                 # signals in the whole subtree
+
+
+class ScopeTree:
+    """Prefix trie over the scope hierarchy of one dump."""
+
+    def __init__(self, header: VcdHeader) -> None:
+        self.root = ScopeNode("", "", "root")
+        self._n_nodes = 1
+        for full, kind in header.scopes.items():
+            self._ensure(full).kind = kind
+        for name in header.vars:
+            self._ensure(self._scope_name(header, name)).signals.append(name)
+        self._count(self.root)
+
+    @staticmethod
+    def _scope_name(header: VcdHeader, signal: str) -> str:
+        scope = signal.rpartition(".")[0]
+        # a reference holding a '.' (escaped identifier): fall back to the longest declared scope
+        while scope and scope not in header.scopes:
+            scope = scope.rpartition(".")[0]
+        return scope
+
+    def _ensure(self, full: str) -> ScopeNode:
+        node = self.root
+        if not full:
+            return node
+        for part in full.split("."):
+            child = node.children.get(part)
+            if child is None:
+                child = node.children[part] = ScopeNode(part, f"{node.full}.{part}" if node.full else part)
+                self._n_nodes += 1
+            node = child
+        return node
+
+    def _count(self, node: ScopeNode) -> int:
+        node.count = len(node.signals) + sum(self._count(c) for c in node.children.values())
+        return node.count
+
+    def node(self, scope: str) -> Optional[ScopeNode]:
+        """Node of a full scope name ('' or '.' for the root), None if there is no such scope."""
+        node = self.root
+        scope = scope.strip(".")
+        if not scope:
+            return node
+        for part in scope.split("."):
+            node = node.children.get(part)
+            if node is None:
+                return None
+        return node
+
+    def scope_of(self, signal: str) -> Optional[ScopeNode]:
+        """Scope a signal is declared in."""
+        scope, _, _ = signal.rpartition(".")
+        while True:
+            node = self.node(scope)
+            if node is not None and signal in node.signals:
+                return node
+            if not scope:
+                return None
+            scope = scope.rpartition(".")[0]
+
+    def iter_signals(self, node: ScopeNode) -> Iterator[str]:
+        """Every signal of a subtree, depth first."""
+        stack = [node]
+        while stack:
+            n = stack.pop()
+            yield from n.signals
+            stack.extend(reversed(list(n.children.values())))
+
+    def match(self, pattern: str, scope: str = "", regex: bool = False) -> Iterator[str]:
+        """Signals under `scope` whose full name matches a glob, or contains a match of a regex (regex=True)."""
+        if regex:
+            rx, start = re.compile(pattern), self.node(scope)
+        else:
+            rx, start = glob_regex(pattern), self._glob_start(pattern, scope)
+        if start is None:
+            return
+        for name in self.iter_signals(start):
+            if (rx.search(name) if regex else rx.fullmatch(name)):
+                yield name
+
+    def _glob_start(self, pattern: str, scope: str) -> Optional[ScopeNode]:
+        """Deepest scope that contains every possible match of the glob."""
+        node = self.node(scope)
+        literal = re.split(r"[*?]", pattern, maxsplit=1)[0]
+        parts = literal.split(".")[:-1]      # the last part may be a partial name
+        if scope.strip("."):
+            head = scope.strip(".").split(".")
+            if parts[:len(head)] != head:
+                return node
+            parts = parts[len(head):]
+        for part in parts:
+            child = node.children.get(part) if node is not None else None
+            if child is None:
+                return node
+            node = child
+        return node
+
+    def nbytes(self) -> int:
+        return 300 * self._n_nodes + 100 * self.root.count
+
+
+def glob_regex(pattern: str) -> Pattern[str]:
+    """Compile a signal glob: '*' any characters, '?' one character, the rest literal."""
+    return re.compile("".join(".*" if ch == "*" else "." if ch == "?" else re.escape(ch) for ch in pattern))
+
+
+# ── Loader ────────────────────────────────────────────────────────────────────
+
+def load_scope_tree(path: str) -> ScopeTree:
+    """Cached `ScopeTree` of the dump at `path`."""
+    return CACHE.get_or_load(file_key(path) + ("tree",), lambda: ScopeTree(load_header(path)), lambda t: t.nbytes())